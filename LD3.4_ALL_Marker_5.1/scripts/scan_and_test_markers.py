@@ -3,11 +3,16 @@ import os
 import re
 import json
 import glob
+import sys
 import yaml
+from functools import lru_cache
 from typing import Any, Dict, List, Tuple
 
 REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
 REPO_ROOT = os.path.dirname(REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'spiral_persona'))
+from ato_matcher import AtoMatcher  # noqa: E402
+from message_view import MessageView, message_view  # noqa: E402
 MARKERS_ROOT = os.path.join(REPO_ROOT, 'ALL_Marker_5.1')
 FAM_FILE = os.path.join(REPO_ROOT, 'markers', 'families.json')
 OUT_DOC = os.path.join(REPO_ROOT, 'Test_docu.md')
@@ -42,27 +47,31 @@ def sentence_matches(pattern: str, sent: str) -> bool:
         return False
 
 
-def proximity_negated(sent: str, guard_regex: str, signals: List[str], window_tokens: int = 3) -> bool:
+@lru_cache(maxsize=None)
+def _compiled(pattern: str):
     try:
-        g = re.compile(guard_regex, re.I)
+        return re.compile(pattern, re.I)
     except re.error:
+        return None
+
+
+def proximity_negated(sent, guard_regex: str, signals: List[str], window_tokens: int = 3) -> bool:
+    """True, wenn ein Negator höchstens ``window_tokens`` Tokens von einem Signal entfernt steht."""
+    g = _compiled(guard_regex)
+    if g is None:
         return False
-    s_low = sent.lower()
-    if not g.search(s_low):
+    view = message_view(sent)
+    negators = [view.token_index(m.start()) for m in g.finditer(view.lower)]
+    if not negators:
         return False
-    # Approximation: Fenster = window_tokens*10 Zeichen
-    approx = window_tokens * 10
-    idxN = g.search(s_low).start()
     for sig in signals or []:
-        try:
-            rg = re.compile(rf"\b{sig}\b", re.I)
-        except re.error:
+        rg = _compiled(rf"\b{sig}\b")
+        if rg is None:
             continue
-        m = rg.search(s_low)
-        if not m:
-            continue
-        if abs(idxN - m.start()) <= approx:
-            return True
+        for m in rg.finditer(view.lower):
+            pos = view.token_index(m.start())
+            if any(abs(pos - n) <= window_tokens for n in negators):
+                return True
     return False
 
 
@@ -79,6 +88,14 @@ def main() -> int:
         if isinstance(mid, str):
             by_id[mid] = d
 
+    # Ein Matcher über alle ATO-Regexe; SEM-Beispiele werden je einmal gescannt
+    ato_matcher = AtoMatcher(
+        (mid, ((d.get('pattern') or {}).get('regex')))
+        for mid, d in by_id.items()
+        if d.get('type') == 'ATO' and isinstance(d.get('pattern'), dict)
+        and isinstance(d['pattern'].get('regex'), str)
+    )
+
     # Scans
     ato_results = []
     sem_results = []
@@ -128,18 +145,10 @@ def main() -> int:
                 errors.append(f"{p}::{mid}: composed_of referenziert unbekannt: {missing}")
             # Beispiele bewerten: zähle ATO‑Treffer der referenzierten ATOs
             examples = d.get('examples') or []
-            ato_pat = {}
-            for aid in comp:
-                a = by_id.get(aid) or {}
-                rg = ((a.get('pattern') or {}).get('regex'))
-                if isinstance(rg, str):
-                    ato_pat[aid] = re.compile(rg, re.I)
+            comp_ids = set(comp)
             sem_ok = []
             for s in examples:
-                cnt = 0
-                for aid, rg in ato_pat.items():
-                    if rg.search(s):
-                        cnt += 1
+                cnt = len(ato_matcher.hit_ids(s) & comp_ids)
                 sem_ok.append({'text': s, 'ato_hits': cnt})
             sem_results.append({'id': mid, 'path': p, 'examples': sem_ok, 'need': max(1, min(2, len(comp)))})
 
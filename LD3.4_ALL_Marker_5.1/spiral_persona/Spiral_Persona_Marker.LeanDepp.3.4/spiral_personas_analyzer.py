@@ -14,10 +14,19 @@ from collections import defaultdict, deque
 from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional, Any
 import re
+import sys
+from pathlib import Path
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ato_matcher import MatchRecords
+from language_router import RoutedAtoMatcher
+from markers_loader import lang_of
+from message_view import message_view
+from negation_guard import NegationGuard
+
 @dataclass
 class PersonaActivation:
     """Repräsentiert eine aktive Spiral Persona"""
@@ -83,6 +92,15 @@ class SpiralPersonaAnalyzer:
             if marker_id.startswith('ATO_') and 'pattern' in marker_data:
                 pattern = marker_data['pattern']
                 self.compiled_patterns[marker_id] = re.compile(pattern, re.IGNORECASE | re.UNICODE)
+
+        # Ein kombinierter Matcher für alle ATOs, partitioniert nach Marker-Sprache
+        self.ato_matcher = RoutedAtoMatcher(
+            (marker_id, rx.pattern, lang_of(self.markers[marker_id]))
+            for marker_id, rx in self.compiled_patterns.items()
+        )
+        self.negation_guard = NegationGuard.from_markers(
+            {mid: m for mid, m in self.markers.items() if mid.startswith('ATO_') and isinstance(m, dict)}
+        )
     
     def analyze_message(self, text: str, speaker: str = "unknown", timestamp: Optional[datetime] = None) -> Dict[str, Any]:
         """
@@ -92,7 +110,7 @@ class SpiralPersonaAnalyzer:
             timestamp = datetime.now()
             
         # Schritt 1: ATO Marker Matching
-        ato_matches = self._match_ato_markers(text)
+        ato_matches, ato_records = self._match_ato_markers(text)
         
         # Schritt 2: SEM Marker Activation
         sem_activations = self._activate_sem_markers(ato_matches, text)
@@ -111,6 +129,7 @@ class SpiralPersonaAnalyzer:
             'speaker': speaker,
             'text': text,
             'ato_matches': ato_matches,
+            'ato_records': ato_records,
             'sem_activations': sem_activations,
             'persona_activations': persona_activations,
             'drift_analysis': drift_analysis,
@@ -124,18 +143,19 @@ class SpiralPersonaAnalyzer:
         
         return result
     
-    def _match_ato_markers(self, text: str) -> Dict[str, int]:
-        """Match atomic markers in text"""
+    def _match_ato_markers(self, text: str) -> Tuple[Dict[str, float], MatchRecords]:
+        """Match atomic markers in text; returns weighted counts and the span records"""
         matches = {}
         
-        for marker_id, pattern in self.compiled_patterns.items():
-            if marker_id.startswith('ATO_'):
-                count = len(pattern.findall(text))
-                if count > 0:
-                    weight = self.weights['marker_weights']['ATO_MARKERS'].get(marker_id, 1.0)
-                    matches[marker_id] = count * weight
-                    
-        return matches
+        view = message_view(text)
+        hits = self.negation_guard.filter(view, self.ato_matcher.match(view))
+        for marker_id, spans in hits.items():
+            weight = self.weights['marker_weights']['ATO_MARKERS'].get(marker_id, 1.0)
+            matches[marker_id] = len(spans) * weight
+
+        # Spans für Erklärungen/Highlighting, ohne zweiten Regex-Durchlauf
+        records = MatchRecords.from_hits(view, hits, self.ato_matcher.all.index, self.ato_matcher.all.names)
+        return matches, records
     
     def _activate_sem_markers(self, ato_matches: Dict[str, int], text: str) -> Dict[str, float]:
         """Activate semantic markers based on ATO matches"""
@@ -484,7 +504,8 @@ class SpiralPersonaAnalyzer:
                     'timestamp': results[i]['timestamp'],
                     'context': {
                         'before_persona': results[i-1]['dominant_persona'],
-                        'after_persona': results[i]['dominant_persona']
+                        'after_persona': results[i]['dominant_persona'],
+                        'evidence': results[i]['ato_records'].highlight()
                     }
                 })
         
@@ -0,0 +1,347 @@
+from __future__ import annotations
+from array import array
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Sequence, Set, Tuple
+import re
+
+from markers_loader import intern_pattern
+from message_view import MessageView
+
+try:  # Python ≥ 3.11
+    from re import _parser as sre_parse
+    from re import _casefix
+except ImportError:  # pragma: no cover - ältere Interpreter
+    import sre_parse
+    _casefix = None
+
+# -------- Kombinierter ATO-Matcher --------
+# Statt jedes Pattern einzeln über den Text laufen zu lassen, werden die
+# ATO-Patterns beim Kompilieren blockweise zu Alternationen verschmolzen. Eine
+# Alternation trifft genau dann, wenn eines ihrer Patterns irgendwo trifft; ein
+# Block ohne Treffer ist damit nach einem Scan erledigt. Nur in Blöcken mit
+# Treffer werden die einzelnen Patterns geprüft und ihre Spans gesammelt
+# (Semantik von ``finditer`` je Pattern, also exakt wie die Einzelscans).
+
+BLOCK_SIZE = 16  # Patterns je Alternation: Scan-Kosten ohne Treffer vs. Nachprüfung je Treffer
+# Rückverweise und benannte Gruppen vertragen kein Zusammenfügen
+_SOLO = re.compile(r"\\[1-9]|\(\?P[<=]|\\g<")
+
+Span = Tuple[int, int]
+
+def _scoped(rx: re.Pattern) -> str:
+    """Pattern als Gruppe mit seinen Flags als lokale Flags ``(?i:…)``."""
+    flags = "".join(c for c, bit in (("i", re.I), ("m", re.M), ("s", re.S), ("x", re.X)) if rx.flags & bit)
+    return f"(?{flags}:{rx.pattern})" if flags else f"(?:{rx.pattern})"
+
+# -------- Pflicht-Literale und Keyword-Automat --------
+# Die meisten ATO-Patterns enthalten Literale, ohne die sie nicht treffen können
+# (``\bimmer\b`` -> "immer", ``\b(später|morgen)\b`` -> "später" oder "morgen").
+# Diese werden beim Kompilieren aus dem Parse-Baum gezogen; ein Aho-Corasick-
+# Automat über alle Literale findet in einem Durchlauf, welche davon in der
+# Nachricht vorkommen, und nur deren Patterns laufen durch die Regex-Engine.
+# Verglichen wird in Kleinschreibung mit denselben Sonderfällen, die ``re`` bei
+# IGNORECASE gleichsetzt (ſ/s, ı/i, µ/μ …), damit der Filter nie zu streng ist.
+
+def _fold_table() -> Dict[int, str]:
+    table: Dict[int, str] = {0x130: "i"}  # İ: str.lower() liefert zwei Zeichen, re nur "i"
+    for k, vs in (getattr(_casefix, "_EXTRA_CASES", {}) or {}).items():
+        canon = chr(min((k,) + tuple(vs)))
+        for c in (k,) + tuple(vs):
+            if chr(c) != canon:
+                table[c] = canon
+    return table
+
+_FOLD = _fold_table()
+
+def fold(text: str) -> str:
+    """Normalform für den Literal-Vergleich (Kleinschreibung + re-Sonderfälle)."""
+    return text.translate(_FOLD).lower().translate(_FOLD)
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+def _better(a: FrozenSet[str] | None, b: FrozenSet[str] | None) -> FrozenSet[str] | None:
+    # selektiver = längstes kürzestes Literal, bei Gleichstand weniger Alternativen
+    if b is None:
+        return a
+    if a is None:
+        return b
+    ka, kb = (min(map(len, a)), -len(a)), (min(map(len, b)), -len(b))
+    return b if kb > ka else a
+
+def _required(seq) -> FrozenSet[str] | None:
+    best: FrozenSet[str] | None = None
+    run: List[str] = []
+    for op, av in seq:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_parse.AT:
+            continue  # Nullbreite (\b, ^) unterbricht keine Literalfolge
+        if run:
+            best = _better(best, frozenset(("".join(run),)))
+            run = []
+        if op is sre_parse.SUBPATTERN:
+            best = _better(best, _required(av[-1]))
+        elif op is sre_parse.BRANCH:
+            alts = [_required(b) for b in av[1]]
+            if all(alts):
+                best = _better(best, frozenset().union(*alts))
+        elif op in _REPEATS:
+            lo, _, item = av
+            if lo >= 1:
+                best = _better(best, _required(item))
+        elif getattr(sre_parse, "ATOMIC_GROUP", None) is op:
+            best = _better(best, _required(av))
+        # alles andere (Klassen, ., Lookarounds, Rückverweise) trägt nichts bei
+    if run:
+        best = _better(best, frozenset(("".join(run),)))
+    return best
+
+def required_literals(source: str, flags: int = 0) -> FrozenSet[str] | None:
+    """Literale (gefaltet), von denen jeder Treffer mindestens eines enthält; None = keine Garantie."""
+    try:
+        tree = sre_parse.parse(source, flags)
+    except (re.error, RecursionError, OverflowError):
+        return None
+    found = _required(tree)
+    return frozenset(fold(lit) for lit in found) if found else None
+
+class KeywordAutomaton:
+    """Aho-Corasick über eine Wortliste; ``find`` liefert die Indizes der enthaltenen Wörter."""
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self.words = list(words)
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for wi, word in enumerate(self.words):
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(wi)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != nxt else 0
+                out[nxt].extend(out[fail[nxt]])
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+
+    def find(self, text: str) -> Set[int]:
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        found: Set[int] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0) if state else root.get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+# -------- Treffer-Records --------
+# Statt Zählern oder Teilstrings liefert der Matcher kompakte Records
+# (Marker-Int-ID, Start, Ende) in drei parallelen Arrays, nach Start sortiert.
+# Der Puffer hält nur eine Referenz auf den durchsuchten Text; Ausschnitte für
+# Erklärungen, Highlighting und Review-Exporte entstehen erst bei Bedarf.
+
+class MatchRecords:
+    __slots__ = ("text", "names", "ids", "starts", "ends")
+
+    def __init__(self, text: str, names: Sequence[str]) -> None:
+        self.text = text
+        self.names = names      # Int-ID -> Marker-ID
+        self.ids = array("I")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    @classmethod
+    def from_hits(cls, text: str | MessageView, hits: Dict[str, List[Span]],
+                  index: Dict[str, int], names: Sequence[str]) -> "MatchRecords":
+        """Aus ``AtoMatcher.match``-Ergebnissen (z. B. nach dem Negations-Guard).
+
+        Bei einer ``MessageView`` beziehen sich die Offsets auf die Originalnachricht.
+        """
+        if isinstance(text, MessageView):
+            view, text = text, text.raw
+            rows = sorted((*view.raw_span(s, e), index[mid])
+                          for mid, spans in hits.items() if mid in index for s, e in spans)
+        else:
+            rows = sorted((s, e, index[mid]) for mid, spans in hits.items() if mid in index for s, e in spans)
+        rec = cls(text, names)
+        for s, e, mid in rows:
+            rec.ids.append(mid)
+            rec.starts.append(s)
+            rec.ends.append(e)
+        return rec
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        return zip(self.ids, self.starts, self.ends)
+
+    def marker(self, i: int) -> str:
+        return self.names[self.ids[i]]
+
+    def snippet(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def spans(self, mid: str) -> List[Span]:
+        return [(s, e) for m, s, e in self if self.names[m] == mid]
+
+    def counts(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        names = self.names
+        for m in self.ids:
+            out[names[m]] = out.get(names[m], 0) + 1
+        return out
+
+    def highlight(self, open_tag: str = "[", close_tag: str = "]") -> str:
+        """Text mit markierten Treffern; überlappende Spans werden zusammengefasst."""
+        parts: List[str] = []
+        pos, end = 0, -1
+        for s, e in zip(self.starts, self.ends):
+            if s < end:
+                end = max(end, e)
+                continue
+            if end >= 0:
+                parts.append(self.text[pos:end] + close_tag)
+                pos = end
+            parts.append(self.text[pos:s] + open_tag)
+            pos, end = s, e
+        if end >= 0:
+            parts.append(self.text[pos:end] + close_tag)
+            pos = end
+        parts.append(self.text[pos:])
+        return "".join(parts)
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Review-Export: ein Dict je Treffer."""
+        return [{"marker": self.names[m], "start": s, "end": e, "text": self.text[s:e]} for m, s, e in self]
+
+class AtoMatcher:
+    def __init__(self, patterns: Iterable[Tuple[str, str | re.Pattern]], flags: int = re.IGNORECASE) -> None:
+        """``patterns``: Paare (Marker-ID, Regex-Quelle oder Pattern); ungültige Regexe werden übersprungen.
+
+        Gleiche Patterns (nach ``canonical_pattern``) werden je Nachricht nur einmal
+        ausgewertet und ihre Treffer an alle Marker verteilt, die sie verwenden.
+        """
+        self.flags = flags
+        self.compiled: List[Tuple[str, re.Pattern]] = []
+        slot: Dict[re.Pattern, int] = {}
+        self.unique: List[re.Pattern] = []
+        owners: List[List[str]] = []
+        for mid, source in patterns:
+            try:
+                rx = intern_pattern(source, flags)
+            except re.error:
+                continue
+            self.compiled.append((mid, rx))
+            i = slot.get(rx)
+            if i is None:
+                i = slot[rx] = len(self.unique)
+                self.unique.append(rx)
+                owners.append([])
+            owners[i].append(mid)
+        # Mehrfachnennung im selben Marker bleibt erhalten (zählt wie Einzelscans)
+        self._owners: List[Tuple[str, ...]] = [tuple(o) for o in owners]
+        # dichte Int-IDs der Marker (Reihenfolge des ersten Auftretens)
+        self.names: List[str] = list(dict.fromkeys(mid for mid, _ in self.compiled))
+        self.index: Dict[str, int] = {mid: i for i, mid in enumerate(self.names)}
+        # Patterns mit Pflicht-Literalen laufen nur, wenn der Automat eines findet
+        literal_ids: Dict[str, int] = {}
+        self._by_literal: List[List[int]] = []
+        self._solo: List[int] = []
+        combinable: List[int] = []
+        for i, rx in enumerate(self.unique):
+            lits = required_literals(rx.pattern, rx.flags)
+            if lits:
+                for lit in lits:
+                    li = literal_ids.setdefault(lit, len(literal_ids))
+                    if li == len(self._by_literal):
+                        self._by_literal.append([])
+                    self._by_literal[li].append(i)
+                continue
+            solo = _SOLO.search(rx.pattern) or rx.flags & (re.ASCII | re.LOCALE)
+            (self._solo if solo else combinable).append(i)
+        self.automaton = KeywordAutomaton(literal_ids)
+        # (Alternation oder None, Mitglieder); None: Zusammenfügen fehlgeschlagen
+        self._blocks: List[Tuple[re.Pattern | None, Tuple[int, ...]]] = []
+        for k in range(0, len(combinable), BLOCK_SIZE):
+            members = tuple(combinable[k:k + BLOCK_SIZE])
+            try:
+                rx = re.compile("|".join(_scoped(self.unique[i]) for i in members))
+            except (re.error, RecursionError, OverflowError):
+                rx = None
+            self._blocks.append((rx, members))
+
+    @classmethod
+    def from_markers(cls, markers, prefix: str = "ATO_") -> "AtoMatcher":
+        """Aus CompiledMarker-Records (``load_compiled_markers``); die Pattern-Objekte werden übernommen."""
+        return cls((cm.id, rx) for cm in markers.values() if cm.id.startswith(prefix) for rx in cm.patterns)
+
+    def _candidates(self, text: str, lower: str | None = None) -> List[int]:
+        """Eindeutige Patterns, die treffen können: Literal gefunden oder Block-Alternation trifft."""
+        out: Set[int] = set()
+        by_literal = self._by_literal
+        for li in self.automaton.find(fold(text if lower is None else lower)):
+            out.update(by_literal[li])
+        for rx, members in self._blocks:
+            if rx is None or rx.search(text) is not None:
+                out.update(members)
+        out.update(self._solo)
+        return sorted(out)
+
+    def match(self, text: str | MessageView) -> Dict[str, List[Span]]:
+        """ATO-ID -> sortierte Spans aller Treffer (je Pattern wie ``finditer``).
+
+        Bei einer ``MessageView`` wird deren normalisierter Text durchsucht und die
+        Kleinschreibung für den Literal-Filter wiederverwendet.
+        """
+        lower = None
+        if isinstance(text, MessageView):
+            text, lower = text.text, text.lower
+        hits: Dict[str, List[Span]] = {}
+        unique, owners = self.unique, self._owners
+        for i in self._candidates(text, lower):
+            spans = [m.span() for m in unique[i].finditer(text)]
+            if spans:
+                for mid in owners[i]:
+                    hits.setdefault(mid, []).extend(spans)
+        for spans in hits.values():
+            spans.sort()
+        return hits
+
+    def records(self, text: str | MessageView, index: Dict[str, int] | None = None,
+                names: Sequence[str] | None = None) -> MatchRecords:
+        """Treffer als MatchRecords; Int-IDs nach ``index``/``names`` (z. B. Registry), sonst eigene."""
+        if index is None:
+            index, names = self.index, self.names
+        return MatchRecords.from_hits(text, self.match(text), index, names)
+
+    def counts(self, text: str | MessageView) -> Dict[str, int]:
+        """ATO-ID -> Anzahl Treffer (Summe über die Patterns des Markers)."""
+        return {mid: len(spans) for mid, spans in self.match(text).items()}
+
+    def hit_ids(self, text: str | MessageView) -> Set[str]:
+        lower = None
+        if isinstance(text, MessageView):
+            text, lower = text.text, text.lower
+        unique, owners = self.unique, self._owners
+        return {mid for i in self._candidates(text, lower) if unique[i].search(text) for mid in owners[i]}
@@ -0,0 +1,143 @@
+from __future__ import annotations
+from typing import Dict, List, Any, Set, Tuple, Iterable, Sequence
+import numpy as np
+
+from markers_loader import RuleExpr, RuleProgram, compile_rule, layer_rank
+
+# -------- Batch-Auswertung (NumPy) --------
+# Für Backfills über archivierte Gespräche: statt Nachricht für Nachricht zu
+# streamen, wird eine Boolematrix (Nachrichten × Marker, Spalten nach
+# Registry.index) spaltenweise kumuliert und jedes Regelblatt über
+# Fensterdifferenzen der Kumulativsummen ausgewertet. Kumuliert werden je
+# Schicht nur die Spalten, die ihre Regeln lesen; Fensterzählungen entstehen je
+# Blatt nur für dessen Spalten und werden mit der Schicht wieder freigegeben.
+
+def _reads(leaf: RuleProgram, index: Dict[str, int]) -> Set[int] | None:
+    """Gelesene Spalten eines Blatts; None = alle (ANY ohne IDs)."""
+    if leaf.kind == "ANY_X_IN_Y" and not leaf.ids:
+        return None
+    ids = set(leaf.ids) | set(leaf.composed) | {c for c, _ in leaf.weights}
+    return {index[c] for c in ids if c in index}
+
+class _WindowCounts:
+    """Trefferzahlen der gelesenen Spalten in jedem Fenster der Länge y."""
+
+    def __init__(self, matrix: np.ndarray, cols: Iterable[int]) -> None:
+        self.n = matrix.shape[0]
+        self.matrix = matrix
+        self.local = {c: i for i, c in enumerate(sorted(cols))}
+        self.cum = np.zeros((self.n + 1, len(self.local)), dtype=np.int32)
+        if self.local:
+            np.cumsum(matrix[:, sorted(self.local)], axis=0, dtype=np.int32, out=self.cum[1:])
+        self._row_cum: np.ndarray | None = None
+
+    def columns(self, y: int, cols: Sequence[int]) -> np.ndarray:
+        # Zeile i = Fenster, das mit Nachricht i + y - 1 endet; Spalten wie ``cols``
+        local = [self.local[c] for c in cols]
+        return self.cum[y:, local] - self.cum[:-y, local]
+
+    def rows(self, y: int) -> np.ndarray:
+        if self._row_cum is None:
+            self._row_cum = np.zeros(self.n + 1, dtype=np.int64)
+            np.cumsum(self.matrix.sum(axis=1), out=self._row_cum[1:])
+        return self._row_cum[y:] - self._row_cum[:-y]
+
+def _leaf_steps(leaf: RuleProgram, counts: _WindowCounts, index: Dict[str, int]) -> np.ndarray:
+    out = np.zeros(counts.n, dtype=bool)
+    y = leaf.y
+    if y <= 0 or counts.n < y:
+        return out
+    kind = leaf.kind
+    if kind == "ANY_X_IN_Y" and not leaf.ids:
+        out[y - 1:] = counts.rows(y) >= leaf.x
+        return out
+    if kind == "BOTH_IN_N" and any(c not in index for c in leaf.ids):
+        return out
+    if kind in ("AT_LEAST_X_IN_Y", "ANY_X_IN_Y"):
+        mult: Dict[int, int] = {}
+        for c in leaf.composed:
+            if c in index:
+                mult[index[c]] = mult.get(index[c], 0) + 1
+        weights = np.fromiter(mult.values(), dtype=np.int32, count=len(mult))
+        out[y - 1:] = counts.columns(y, list(mult)) @ weights >= leaf.x
+        return out
+    if kind == "WEIGHTED_SUM":
+        pairs = [(index[c], wt) for c, wt in leaf.weights if c in index]
+        weights = np.array([p[1] for p in pairs], dtype=float)
+        present = counts.columns(y, [p[0] for p in pairs]) > 0
+        out[y - 1:] = present.any(axis=1) & (present @ weights >= leaf.x - 1e-9)
+        return out
+    present = counts.columns(y, sorted(index[c] for c in leaf.ids if c in index)) > 0
+    if kind == "BOTH_IN_N":
+        out[y - 1:] = present.all(axis=1)
+    else:  # AT_LEAST_X_DISTINCT_IN_Y
+        out[y - 1:] = present.sum(axis=1) >= leaf.x
+    return out
+
+def _combine(program, per_leaf: Dict[RuleProgram, np.ndarray]) -> np.ndarray:
+    if isinstance(program, RuleExpr):
+        parts = [_combine(c, per_leaf) for c in program.children]
+        op = np.logical_and if program.op == "AND" else np.logical_or
+        return op.reduce(parts)
+    return per_leaf[program]
+
+def evaluate_activation_batch(runtime: Dict[str, Any], matrix: np.ndarray, index: Dict[str, int],
+                              marker_ids: Iterable[str] | None = None) -> Tuple[List[str], np.ndarray]:
+    """Aktivierung aller Marker an jeder Position einer Nachrichtenfolge.
+
+    ``matrix`` ist (Nachrichten × len(index)) boolesch; Rückgabe sind die
+    ausgewerteten Marker-IDs und eine gleich lange Boolematrix
+    (Nachrichten × Marker). Wie beim StreamingActivationEngine zählen nur volle
+    Fenster, und aktive Marker einer Schicht werden als Eingabe der höheren
+    Schichten in dieselbe Nachricht eingetragen; die eigene Schicht sieht sie nicht.
+    """
+    programs = runtime.get("programs") or {}
+    unsupported = runtime.get("unsupported") or {}
+    if marker_ids is None:
+        marker_ids = [mid for mid in runtime["activation"] if mid not in unsupported]
+    ids = list(marker_ids)
+    rules = {}
+    for mid in ids:
+        program = programs.get(mid)
+        if program is None:
+            program = compile_rule(runtime["activation"][mid], runtime["composed_of"].get(mid, []))
+        rules[mid] = program
+
+    matrix = np.array(matrix, dtype=bool, copy=True)
+    result = np.zeros((matrix.shape[0], len(ids)), dtype=bool)
+    column = {mid: i for i, mid in enumerate(ids)}
+    reads: Dict[str, Set[int] | None] = {}
+    for mid in ids:
+        cols: Set[int] | None = set()
+        for leaf in rules[mid].leaves():
+            r = _reads(leaf, index)
+            cols = None if r is None or cols is None else cols | r
+        reads[mid] = cols
+    layers: Dict[int, List[str]] = {}
+    for mid in ids:
+        layers.setdefault(layer_rank(mid), []).append(mid)
+    for rank in sorted(layers):
+        needed: Set[int] = set()
+        for mid in layers[rank]:
+            needed |= reads[mid] or set()
+        counts = _WindowCounts(matrix, needed)
+        per_leaf: Dict[RuleProgram, np.ndarray] = {}
+        for mid in layers[rank]:
+            for leaf in rules[mid].leaves():
+                if leaf not in per_leaf:
+                    per_leaf[leaf] = _leaf_steps(leaf, counts, index)
+            result[:, column[mid]] = _combine(rules[mid], per_leaf)
+        del counts, per_leaf
+        # Treffer dieser Schicht speisen erst die höheren Schichten
+        for mid in layers[rank]:
+            if mid in index:
+                matrix[:, index[mid]] |= result[:, column[mid]]
+    return ids, result
+
+def to_matrix(messages: Sequence[Iterable[str]], index: Dict[str, int]) -> np.ndarray:
+    """Nachrichten (Sets von Marker-IDs) als Boolematrix nach ``index``."""
+    matrix = np.zeros((len(messages), len(index)), dtype=bool)
+    for i, msg in enumerate(messages):
+        cols = [index[mid] for mid in msg if mid in index]
+        matrix[i, cols] = True
+    return matrix
@@ -0,0 +1,166 @@
+from __future__ import annotations
+from typing import Dict, Iterator, Tuple
+import os
+import struct
+import time
+import zlib
+
+from conversation_store import ConversationStore, dumps, loads
+from telemetry import Telemetry
+
+# -------- Checkpoints --------
+# Append-only-Log aller seit dem letzten Checkpoint geänderten Gespräche
+# (``ConversationStore.dirty``) plus Telemetrie. Ein Record ist
+#   Länge (u32) | crc32 (u32) | Art (u8) | ID-Länge (u16) | ID | Zustand
+# mit dem Zustand im Format von ``conversation_store.dumps``. Nach einem Absturz
+# wird der Log einmal gelesen, ein halb geschriebener letzter Record abgeschnitten
+# und je Gespräch nur der jüngste Zustand übernommen — die Nachrichten selbst
+# werden nicht erneut ausgewertet. Wächst der Log über das Doppelte der aktuellen
+# Zustände, wird er kompaktiert (neu schreiben, fsync, atomar umbenennen).
+
+CHECKPOINT_INTERVAL = 5.0     # Sekunden zwischen Checkpoints
+COMPACT_MIN_BYTES = 1 << 20
+
+STATE, END, TELEMETRY = 1, 2, 3
+_HEAD = struct.Struct("<II")
+_KIND = struct.Struct("<BH")
+
+def _record(kind: int, cid: str, blob: bytes) -> bytes:
+    key = cid.encode("utf-8")
+    body = _KIND.pack(kind, len(key)) + key + blob
+    return _HEAD.pack(len(body), zlib.crc32(body)) + body
+
+def read_log(path: str) -> Iterator[Tuple[int, int, str, bytes]]:
+    """(Ende-Offset, Art, ID, Zustand) je intaktem Record; stoppt am ersten defekten."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        data = f.read()
+    pos = 0
+    while pos + _HEAD.size <= len(data):
+        size, crc = _HEAD.unpack_from(data, pos)
+        body = data[pos + _HEAD.size:pos + _HEAD.size + size]
+        if len(body) != size or zlib.crc32(body) != crc or size < _KIND.size:
+            return
+        kind, klen = _KIND.unpack_from(body)
+        pos += _HEAD.size + size
+        yield pos, kind, body[_KIND.size:_KIND.size + klen].decode("utf-8"), body[_KIND.size + klen:]
+
+def _seen(blob: bytes) -> int:
+    return loads(blob)["stream"]["seen"]
+
+class Checkpointer:
+    def __init__(self, store: ConversationStore, path: str, telemetry: Telemetry | None = None,
+                 interval: float = CHECKPOINT_INTERVAL, clock=time.monotonic) -> None:
+        self.store = store
+        self.path = path
+        self.telemetry = telemetry
+        self.interval = interval
+        self.clock = clock
+        self._last = clock()
+        self._live_bytes: Dict[str, int] = {}   # Größe des jüngsten Records je Gespräch
+        self._log_bytes = 0
+        self._log = None
+
+    # -------- Wiederanlauf --------
+    def recover(self) -> int:
+        """Log einlesen, defektes Ende abschneiden, jüngste Zustände in den Store legen."""
+        latest: Dict[str, Tuple[int, bytes]] = {}
+        end = 0
+        for end, kind, cid, blob in read_log(self.path):
+            latest[cid] = (kind, blob)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > end:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        restored = 0
+        for cid, (kind, blob) in latest.items():
+            if kind == TELEMETRY:
+                if self.telemetry is not None:
+                    self.telemetry.restore(loads(blob))
+            elif kind == END:
+                self.store.drop(cid)
+            else:
+                # ausgelagerter Zustand kann jünger sein als der letzte Checkpoint
+                current = self.store.state(cid)
+                if current is None or _seen(current) < _seen(blob):
+                    self.store.put(cid, blob)
+                restored += 1
+            self._live_bytes[cid] = len(_record(kind, cid, blob)) if kind != END else 0
+        self.store.dirty.clear()
+        self._log_bytes = end
+        return restored
+
+    # -------- Schreiben --------
+    def _open(self):
+        if self._log is None:
+            self._log = open(self.path, "ab")
+        return self._log
+
+    def checkpoint(self) -> int:
+        """Geänderte Gespräche und Telemetrie anhängen und fsyncen; liefert die Zahl der Records."""
+        store = self.store
+        out = []
+        for cid in store.dirty:
+            blob = store.state(cid)
+            rec = _record(END, cid, b"") if blob is None else _record(STATE, cid, blob)
+            out.append(rec)
+            if blob is None:
+                self._live_bytes.pop(cid, None)
+            else:
+                self._live_bytes[cid] = len(rec)
+        if self.telemetry is not None:
+            rec = _record(TELEMETRY, "", dumps(self.telemetry.state()))
+            out.append(rec)
+            self._live_bytes[""] = len(rec)
+        store.dirty.clear()
+        self._last = self.clock()
+        if out:
+            f = self._open()
+            data = b"".join(out)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self._log_bytes += len(data)
+        if self._log_bytes > max(COMPACT_MIN_BYTES, 2 * sum(self._live_bytes.values())):
+            self.compact()
+        return len(out)
+
+    def maybe_checkpoint(self) -> int:
+        """Checkpoint, falls ``interval`` verstrichen ist; pro Nachricht aufrufbar."""
+        if self.clock() - self._last < self.interval:
+            return 0
+        return self.checkpoint()
+
+    def compact(self) -> None:
+        """Log auf den jüngsten Record je Gespräch reduzieren (atomar ersetzt)."""
+        latest: Dict[str, bytes] = {}
+        for _, kind, cid, blob in read_log(self.path):
+            if kind == END:
+                latest.pop(cid, None)
+            else:
+                latest[cid] = _record(kind, cid, blob)
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            for rec in latest.values():
+                f.write(rec)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        dirfd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+        self._live_bytes = {cid: len(rec) for cid, rec in latest.items()}
+        self._log_bytes = sum(self._live_bytes.values())
+
+    def close(self) -> None:
+        self.checkpoint()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,156 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Set, Tuple
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import weakref
+import zlib
+
+from marker_engine import Conversation, MarkerEngine
+
+# -------- Gesprächszustände mit Speicherbudget --------
+# Höchstens ``max_live`` Gespräche liegen als Objekte im Speicher (LRU). Wer
+# herausfällt oder länger als ``ttl`` Sekunden ruht, wird als komprimierte
+# Momentaufnahme (``Conversation.snapshot``, JSON + zlib, typisch < 1 KB) in
+# SQLite geschrieben und bei der nächsten Nachricht transparent wieder geladen.
+# Lange Gesprächsschwänze kosten so Plattenplatz statt RAM. Ohne ``path``
+# landet die Datenbank in einem temporären Verzeichnis, das ``close`` wieder
+# löscht — ``:memory:`` hielte die Ausgelagerten doch wieder im RAM.
+#
+# ``max_live`` zählt Gespräche, nicht Bytes. Ein aktives Gespräch belegt mit der
+# vollen Registry rund ``LIVE_BYTES`` (gemessen mit ``tracemalloc`` nach 60
+# Nachrichten; Fensterzähler je Regel dominieren); ``max_live_for`` rechnet ein
+# Speicherbudget in MB entsprechend um.
+
+LIVE_BYTES = 96 << 10
+MEMORY_MB = 512
+
+def max_live_for(megabytes: float) -> int:
+    """Gespräche, die in ``megabytes`` MB Speicher passen (mindestens eins)."""
+    return max(1, int(megabytes * (1 << 20)) // LIVE_BYTES)
+
+MAX_LIVE = max_live_for(MEMORY_MB)
+
+def dumps(snap: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(snap, separators=(",", ":")).encode("utf-8"))
+
+def loads(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data))
+
+class ConversationStore:
+    def __init__(self, engine: MarkerEngine, path: str | None = None, max_live: int = MAX_LIVE,
+                 ttl: float | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        """``path``: SQLite-Datei für ausgelagerte Gespräche (ohne: temporäre Datei, ``:memory:`` nur zum Testen)."""
+        self._cleanup = None
+        if path is None:
+            tmpdir = tempfile.mkdtemp(prefix="conversations-")
+            self._cleanup = weakref.finalize(self, shutil.rmtree, tmpdir, True)
+            path = os.path.join(tmpdir, "state.sqlite")
+        self.path = path
+        self.engine = engine
+        self.max_live = max_live
+        self.ttl = ttl
+        self.clock = clock
+        self._live: OrderedDict[str, Tuple[Conversation, float]] = OrderedDict()
+        self.db = sqlite3.connect(path, isolation_level=None)
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS conversations (id TEXT PRIMARY KEY, state BLOB, touched REAL)")
+        self.stats = {"created": 0, "rehydrated": 0, "spilled": 0}
+        # seit dem letzten Checkpoint angefasste bzw. beendete Gespräche (siehe checkpoint.py)
+        self.dirty: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self._live or self.db.execute(
+            "SELECT 1 FROM conversations WHERE id = ?", (cid,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        """IDs der Gespräche im Speicher (älteste zuerst)."""
+        return iter(list(self._live))
+
+    @property
+    def spilled(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def get(self, cid: str) -> Conversation:
+        """Gespräch aus dem Speicher, aus SQLite oder neu; zählt als Zugriff."""
+        now = self.clock()
+        entry = self._live.pop(cid, None)
+        if entry is not None:
+            conv = entry[0]
+        else:
+            row = self.db.execute("SELECT state FROM conversations WHERE id = ?", (cid,)).fetchone()
+            if row is not None:
+                conv = self.engine.restore(loads(row[0]))
+                self.db.execute("DELETE FROM conversations WHERE id = ?", (cid,))
+                self.stats["rehydrated"] += 1
+            else:
+                conv = self.engine.conversation()
+                self.stats["created"] += 1
+        self._live[cid] = (conv, now)
+        self.dirty.add(cid)
+        self.evict_idle(now)
+        while len(self._live) > self.max_live:
+            self._spill(*self._live.popitem(last=False))
+        return conv
+
+    def drop(self, cid: str) -> None:
+        """Gespräch beenden: Zustand verwerfen, auch ausgelagert."""
+        self._live.pop(cid, None)
+        self.db.execute("DELETE FROM conversations WHERE id = ?", (cid,))
+        self.dirty.add(cid)
+
+    def state(self, cid: str) -> bytes | None:
+        """Serialisierter Zustand (``dumps``) eines Gesprächs, egal ob im Speicher oder ausgelagert."""
+        entry = self._live.get(cid)
+        if entry is not None:
+            return dumps(entry[0].snapshot())
+        row = self.db.execute("SELECT state FROM conversations WHERE id = ?", (cid,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, cid: str, state: bytes) -> None:
+        """Serialisierten Zustand übernehmen (ausgelagert, wird bei Bedarf geladen)."""
+        self._live.pop(cid, None)
+        self.db.execute("INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)", (cid, state, self.clock()))
+
+    def evict_idle(self, now: float | None = None) -> int:
+        """Gespräche auslagern, die länger als ``ttl`` ruhen; liefert ihre Anzahl."""
+        if self.ttl is None:
+            return 0
+        now = self.clock() if now is None else now
+        n = 0
+        while self._live:
+            cid, (conv, touched) = next(iter(self._live.items()))
+            if now - touched <= self.ttl:
+                break
+            del self._live[cid]
+            self._spill(cid, (conv, touched))
+            n += 1
+        return n
+
+    def flush(self) -> None:
+        """Alle Gespräche auslagern (z. B. vor dem Herunterfahren)."""
+        while self._live:
+            self._spill(*self._live.popitem(last=False))
+
+    def _spill(self, cid: str, entry: Tuple[Conversation, float]) -> None:
+        conv, touched = entry
+        self.db.execute("INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)",
+                        (cid, dumps(conv.snapshot()), touched))
+        self.stats["spilled"] += 1
+
+    def close(self) -> None:
+        """Gespräche sichern und schließen; eine temporäre Datenbank wird dabei gelöscht."""
+        if self._cleanup is None:
+            self.flush()
+        self.db.close()
+        if self._cleanup is not None:
+            self._cleanup()
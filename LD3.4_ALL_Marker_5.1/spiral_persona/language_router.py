@@ -0,0 +1,107 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Set, Tuple
+import re
+
+from ato_matcher import AtoMatcher, MatchRecords, Span
+from markers_loader import lang_of, marker_patterns
+from message_view import MessageView, message_view
+
+# -------- Spracherkennung --------
+# Leichtgewichtig und offline: Funktionswörter und typische Zeichen (ä, ö, ü, ß)
+# werden je Sprache gezählt. Eine Sprache gilt nur als erkannt, wenn sie klar
+# vorn liegt; kurze oder gemischte Nachrichten liefern None und werden gegen
+# alle Patterns geprüft, damit das Routing keine Treffer kostet. Wörter, die in
+# beiden Sprachen vorkommen (am, an, so, was, in, will, also, man, hat, die,
+# war, bin), zählen nicht.
+
+STOPWORDS: Dict[str, frozenset] = {
+    "de": frozenset("""
+        aber als auch auf aus bei bis bist da dann das dass dein dem den der des
+        dich dir doch du ein eine einem einen einer es für gar habe haben hast ich ihr im
+        ist ja jetzt kann kein keine mal mein mich mir mit muss nach nicht noch nur oder
+        schon sehr sein sich sie sind und uns von warum weil wenn wie wir wird zu zum zur
+    """.split()),
+    "en": frozenset("""
+        a about after all and are as at be because been but by can could did do does
+        don't for from had has have he her him his how i i'm if is it it's just me my no not of
+        on or our really she that the their them then there they this to we were what when
+        why with would you you're your
+    """.split()),
+}
+_LEXICON: Dict[str, str] = {w: lang for lang, words in STOPWORDS.items() for w in words}
+LANG_CHARS: Dict[str, str] = {"de": "äöüß"}
+MIN_SCORE = 2      # mindestens so viele Belege für eine Sprache
+DOMINANCE = 2.0    # Vorsprung gegenüber der nächstbesten Sprache
+
+def language_scores(message: str | MessageView) -> Dict[str, float]:
+    view = message_view(message)
+    scores = {lang: 0.0 for lang in STOPWORDS}
+    lexicon = _LEXICON
+    for w in view.words():
+        lang = lexicon.get(w)
+        if lang is not None:
+            scores[lang] += 1
+    for lang, chars in LANG_CHARS.items():
+        scores[lang] += sum(view.lower.count(c) for c in chars)
+    return scores
+
+def detect_language(message: str | MessageView) -> str | None:
+    """"de", "en" … oder None, wenn die Nachricht nicht eindeutig ist."""
+    ranked = sorted(language_scores(message).items(), key=lambda kv: kv[1], reverse=True)
+    best, score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    if score >= MIN_SCORE and score >= DOMINANCE * runner_up:
+        return best
+    return None
+
+# -------- Sprach-Partitionen --------
+class RoutedAtoMatcher:
+    """Ein AtoMatcher je Sprache (deren Patterns + sprachneutrale) und einer über alle.
+
+    Nachrichten mit erkannter Sprache durchsuchen nur ihre Partition; für Marker
+    anderer Sprachen entstehen dann keine Treffer.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str | re.Pattern, str | None]],
+                 flags: int = re.IGNORECASE) -> None:
+        """``patterns``: (Marker-ID, Regex, Sprache oder None)."""
+        items = list(patterns)
+        langs = sorted({lang for _, _, lang in items if lang})
+        self.all = AtoMatcher(((mid, src) for mid, src, _ in items), flags)
+        self.partitions: Dict[str, AtoMatcher] = {
+            lang: AtoMatcher(((mid, src) for mid, src, l in items if l in (None, lang)), flags)
+            for lang in langs
+        }
+
+    @classmethod
+    def from_markers(cls, markers, prefix: str = "ATO_") -> "RoutedAtoMatcher":
+        """Aus CompiledMarker-Records oder rohen Marker-Dicts (``pattern`` + ``lang``)."""
+        items: List[Tuple[str, str | re.Pattern, str | None]] = []
+        for mid, m in markers.items():
+            if not mid.startswith(prefix):
+                continue
+            if isinstance(m, dict):
+                items.extend((mid, src, lang_of(m)) for src in marker_patterns(m))
+            else:
+                items.extend((mid, rx, m.lang) for rx in m.patterns)
+        return cls(items)
+
+    def matcher_for(self, message: str | MessageView) -> AtoMatcher:
+        lang = detect_language(message)
+        return self.partitions.get(lang, self.all) if lang else self.all
+
+    def match(self, message: str | MessageView) -> Dict[str, List[Span]]:
+        view = message_view(message)
+        return self.matcher_for(view).match(view)
+
+    def records(self, message: str | MessageView) -> MatchRecords:
+        """Wie ``AtoMatcher.records``; Int-IDs einheitlich nach dem Gesamt-Matcher."""
+        view = message_view(message)
+        return MatchRecords.from_hits(view, self.match(view), self.all.index, self.all.names)
+
+    def counts(self, message: str | MessageView) -> Dict[str, int]:
+        return {mid: len(spans) for mid, spans in self.match(message).items()}
+
+    def hit_ids(self, message: str | MessageView) -> Set[str]:
+        view = message_view(message)
+        return self.matcher_for(view).hit_ids(view)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Sequence, Set, Tuple
+
+from ato_matcher import AtoMatcher, MatchRecords, Span
+from language_router import RoutedAtoMatcher
+from markers_loader import (
+    LAYER_PREFIXES,
+    CompiledMarker,
+    IntuitionBank,
+    Registry,
+    StreamingActivationEngine,
+    compile_runtime,
+    load_all_markers,
+    load_families,
+)
+from message_view import MessageView, message_view
+from negation_guard import NegationGuard
+from scene_gate import ContextGate, SceneState
+from yaml_cache import YamlCache
+
+# -------- Marker-Engine --------
+# Python-Gegenstück zu ``extension/src/engine.worker.ts``: Registry einmal laden,
+# dann pro Nachricht
+#   1. Ansicht aufbauen (NFKC, Kleinschreibung, Tokens)   message_view
+#   2. SCN-Szenen fortschreiben, ATO-Regexe matchen       ContextGate / RoutedAtoMatcher
+#   3. negierte Treffer verwerfen                         NegationGuard
+#   4. SEM → CLU → MEMA über die Gesprächsfenster         StreamingActivationEngine
+#   5. Intuitions-Cluster vorrücken                       IntuitionBank
+# Der Fensterzustand liegt in ``Conversation``; ``analyze_many`` wertet eine
+# Nachrichtenfolge als ein Gespräch aus und matcht gleiche Texte nur einmal.
+
+RULE_LAYERS = LAYER_PREFIXES[1:]   # ATO/SCN entscheiden ihre Regexe, Regeln nur für SEM/CLU/MEMA
+
+@dataclass(slots=True)
+class MarkerResult:
+    records: MatchRecords                   # ATO-/SCN-Treffer mit Offsets
+    active: Set[str]                        # aktive SEM/CLU/MEMA nach dieser Nachricht
+    scenes: FrozenSet[str] = frozenset()
+    intuitions: Dict[str, str] = field(default_factory=dict)  # Cluster -> Zustand (ohne provisional)
+    scores: List[Tuple[str, float]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-taugliche Form (Form der ``scores`` wie im Extension-Worker)."""
+        return {
+            "hits": self.records.to_rows(),
+            "active": sorted(self.active),
+            "scenes": sorted(self.scenes),
+            "intuitions": dict(self.intuitions),
+            "scores": [{"id": mid, "type": mid.split("_", 1)[0], "score": round(score, 6)}
+                       for mid, score in self.scores],
+        }
+
+class Conversation:
+    """Fensterzustand eines Gesprächs: Szenen, Regel-Fenster, Intuitionen."""
+    __slots__ = ("scenes", "stream", "intuitions")
+
+    def __init__(self, scenes: SceneState, stream: StreamingActivationEngine, intuitions: IntuitionBank) -> None:
+        self.scenes = scenes
+        self.stream = stream
+        self.intuitions = intuitions
+
+    @property
+    def seen(self) -> int:
+        return self.stream.seen
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-taugliche Momentaufnahme aller Fenster (siehe ``MarkerEngine.restore``)."""
+        return {"scenes": self.scenes.snapshot(), "stream": self.stream.snapshot(),
+                "intuitions": self.intuitions.snapshot()}
+
+class MarkerEngine:
+    def __init__(self, markers: Dict[str, CompiledMarker], intuitions: IntuitionBank | None = None,
+                 families: Dict[str, Iterable[str]] | None = None) -> None:
+        """``markers``: kompilierte Registry (``Registry.compact`` / ``load_compiled_markers``)."""
+        self.markers = markers
+        self.names: List[str] = list(markers)
+        self.index: Dict[str, int] = {mid: i for i, mid in enumerate(self.names)}
+        runtime = compile_runtime(markers)
+        for key in ("activation", "programs", "unsupported"):
+            runtime[key] = {mid: v for mid, v in runtime[key].items() if mid.startswith(RULE_LAYERS)}
+        self.runtime = runtime
+        self.families = families
+        self.gate = ContextGate(markers) if any(cm.scene or cm.requires_env for cm in markers.values()) else None
+        # ohne Szenen genügt ein Matcher; dann lohnt das Sprach-Routing
+        self.router = RoutedAtoMatcher.from_markers(markers) if self.gate is None else None
+        self.guard = NegationGuard.from_markers(markers)
+        self._intuitions = intuitions if intuitions is not None else IntuitionBank({}, {})
+        self._weight = {mid: cm.base * cm.weight for mid, cm in markers.items()}
+
+    @classmethod
+    def load(cls, root_dir: str, cache: YamlCache | None = None, workers: int | None = None,
+             families_path: str | None = None) -> "MarkerEngine":
+        """Registry aus einem Marker-Verzeichnis (wie ``load_all_markers``) inkl. Intuitions-Clustern."""
+        reg = Registry.build(load_all_markers(root_dir, cache, workers))
+        families = load_families(families_path) if families_path else None
+        return cls(reg.compact(), IntuitionBank.from_registry(reg), families)
+
+    def conversation(self) -> Conversation:
+        """Leerer Gesprächszustand; je Gespräch einer."""
+        return Conversation(SceneState(), StreamingActivationEngine(self.runtime, families=self.families),
+                            self._intuitions.fresh())
+
+    def restore(self, snap: Dict[str, Any]) -> Conversation:
+        """Gespräch aus ``Conversation.snapshot``."""
+        conv = self.conversation()
+        conv.scenes.restore(snap["scenes"])
+        conv.stream.restore(snap["stream"])
+        conv.intuitions.restore(snap["intuitions"])
+        return conv
+
+    # -------- Auswertung --------
+    def _matcher(self, state: SceneState, view: MessageView, ts: float | None) -> Tuple[AtoMatcher, Dict[str, List[Span]]]:
+        """Matcher für diese Nachricht und ggf. die SCN-Treffer (schreibt die Szenen fort)."""
+        if self.gate is None:
+            return self.router.matcher_for(view), {}
+        gate = self.gate
+        scene_hits = gate.scene_matcher.match(view) if gate.scenes else {}
+        active = state.advance(gate.scenes, {sid: len(sp) for sid, sp in scene_hits.items()}, ts)
+        return gate.matcher(active), scene_hits
+
+    def _step(self, conv: Conversation, view: MessageView, hits: Dict[str, List[Span]]) -> MarkerResult:
+        ids = set(hits)
+        active = conv.stream.push(ids)
+        gate = self.gate
+        if gate is not None and gate.requires:
+            active = {mid for mid in active if gate.allowed(mid, conv.scenes.active)}
+        bank = conv.intuitions
+        if bank.ids:
+            bank.step(active, ids | active)
+        weight = self._weight
+        scores = [(mid, weight[mid] * len(spans)) for mid, spans in hits.items()]
+        scores.extend((mid, weight[mid]) for mid in active)
+        scores.sort(key=lambda kv: kv[1], reverse=True)
+        intuitions = {cid: bank.state_of(cid) for cid in bank.ids if bank.state[bank.slot[cid]]}
+        return MarkerResult(MatchRecords.from_hits(view, hits, self.index, self.names), active,
+                            conv.scenes.active, intuitions, scores)
+
+    # -------- Zweiphasig (Worker-Prozesse) --------
+    def scan(self, text: str) -> Dict[str, List[Span]]:
+        """Zustandslose Phase: alle ATO-/SCN-Treffer nach Negations-Guard, als wären alle Szenen aktiv.
+
+        Läuft ohne Gesprächszustand und kann daher in Worker-Prozessen laufen;
+        ``step`` wendet danach Szenen und ``requires_env`` an.
+        """
+        view = message_view(text)
+        if self.gate is None:
+            return self.guard.filter(view, self.router.match(view))
+        gate = self.gate
+        hits = self.guard.filter(view, gate.matcher(frozenset().union(*gate.requires.values())).match(view))
+        return {**hits, **gate.scene_matcher.match(view)} if gate.scenes else hits
+
+    def step(self, conversation: Conversation, text: str, hits: Dict[str, List[Span]],
+             ts: float | None = None) -> MarkerResult:
+        """Zustandsbehaftete Phase zu ``scan``; Ergebnis wie ``analyze``."""
+        gate = self.gate
+        if gate is not None:
+            scenes = gate.scenes
+            active = conversation.scenes.advance(
+                scenes, {sid: len(sp) for sid, sp in hits.items() if sid in scenes}, ts)
+            hits = {mid: sp for mid, sp in hits.items() if mid in scenes or gate.allowed(mid, active)}
+        return self._step(conversation, message_view(text), hits)
+
+    def analyze(self, text: str, conversation: Conversation | None = None, ts: float | None = None) -> MarkerResult:
+        """Eine Nachricht; ohne ``conversation`` als Gespräch aus genau dieser Nachricht."""
+        conv = conversation if conversation is not None else self.conversation()
+        view = message_view(text)
+        matcher, scene_hits = self._matcher(conv.scenes, view, ts)
+        hits = self.guard.filter(view, matcher.match(view))
+        if scene_hits:
+            hits = {**hits, **scene_hits}
+        return self._step(conv, view, hits)
+
+    def analyze_many(self, texts: Sequence[str], conversation: Conversation | None = None,
+                     timestamps: Sequence[float | None] | None = None) -> List[MarkerResult]:
+        """Nachrichtenfolge eines Gesprächs in Reihenfolge.
+
+        Gleicher Text mit gleichem Matcher (gleiche aktive Szenen bzw. Sprache)
+        wird nur einmal gematcht und gefiltert; Grüße, Emojis und Bot-Vorlagen
+        kosten dann nur noch das Fenster-Update.
+        """
+        conv = conversation if conversation is not None else self.conversation()
+        memo: Dict[Tuple[int, str], Dict[str, List[Span]]] = {}
+        guard = self.guard
+        out: List[MarkerResult] = []
+        for i, text in enumerate(texts):
+            view = message_view(text)
+            matcher, scene_hits = self._matcher(conv.scenes, view, timestamps[i] if timestamps else None)
+            key = (id(matcher), text)
+            hits = memo.get(key)
+            if hits is None:
+                hits = memo[key] = guard.filter(view, matcher.match(view))
+            if scene_hits:
+                hits = {**hits, **scene_hits}
+            out.append(self._step(conv, view, hits))
+        return out
@@ -0,0 +1,229 @@
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from ato_matcher import Span
+from checkpoint import CHECKPOINT_INTERVAL, Checkpointer
+from conversation_store import MEMORY_MB, ConversationStore, max_live_for
+from marker_engine import MarkerEngine
+from telemetry import Telemetry
+
+# -------- Live-Scoring-Dienst --------
+# NDJSON über TCP, Unix-Socket oder stdin/stdout, ohne externen Broker.
+#   Anfrage:  {"conversation_id": "c1", "text": "…", "ts": 1700000000.0, "id": 7}
+#             {"conversation_id": "c1", "end": true}     Gesprächszustand verwerfen
+#   Antwort:  {"conversation_id": "c1", "id": 7, "seq": 3, "hits": […], "active": […], …}
+# Das Matching (``MarkerEngine.scan``) läuft in einem Worker-Pool; nur das
+# Fenster-Update (``MarkerEngine.step``) läuft in der Event-Loop, je Gespräch
+# strikt in Eingangsreihenfolge. Höchstens ``max_inflight`` Nachrichten sind
+# gleichzeitig in Arbeit — darüber wird nicht weitergelesen, und der Rückstau
+# landet im Socket-Puffer des Clients.
+
+MAX_INFLIGHT = 256
+LINE_LIMIT = 1 << 20
+
+_WORKER_ENGINE: MarkerEngine | None = None
+
+def _init_worker(root_dir: str) -> None:
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = MarkerEngine.load(root_dir)
+
+def _scan(text: str) -> Dict[str, List[Span]]:
+    return _WORKER_ENGINE.scan(text)
+
+def worker_pool(root_dir: str, workers: int | None = None) -> ProcessPoolExecutor:
+    """Prozess-Pool, dessen Worker die Registry je einmal laden."""
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(root_dir,))
+
+class MarkerServer:
+    def __init__(self, engine: MarkerEngine, pool: ProcessPoolExecutor | None = None,
+                 max_inflight: int = MAX_INFLIGHT, store: ConversationStore | None = None,
+                 checkpointer: Checkpointer | None = None) -> None:
+        """``pool`` aus ``worker_pool``; ohne Pool läuft ``scan`` im Thread-Pool der Loop.
+
+        ``store`` begrenzt die Gesprächszustände im Speicher (Standard: LRU, Auslagerung in eine temporäre Datei);
+        ``checkpointer`` sichert sie (und ``telemetry``) periodisch für den Wiederanlauf.
+        """
+        self.engine = engine
+        self.pool: Executor | None = pool
+        self._scan: Callable[[str], Dict[str, List[Span]]] = _scan if pool is not None else engine.scan
+        self.conversations = store if store is not None else ConversationStore(engine)
+        self.checkpointer = checkpointer
+        self.telemetry = checkpointer.telemetry if checkpointer and checkpointer.telemetry else Telemetry()
+        self._tail: Dict[str, asyncio.Future] = {}
+        self._slots = asyncio.Semaphore(max_inflight)
+        self.max_inflight = max_inflight
+        self.inflight = 0   # Nachrichten zwischen Annahme und geschriebener Antwort
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Eine Anfrage; Reihenfolge je ``conversation_id`` bleibt erhalten."""
+        cid = request.get("conversation_id")
+        if not isinstance(cid, str):
+            return {"id": request.get("id"), "error": "conversation_id fehlt"}
+        loop = asyncio.get_running_loop()
+        text = request.get("text")
+        if request.get("end"):
+            scanning = None
+        elif isinstance(text, str):
+            scanning = loop.run_in_executor(self.pool, self._scan, text)
+        else:
+            return {"conversation_id": cid, "id": request.get("id"), "error": "text fehlt"}
+        # Platz in der Gesprächsreihe reservieren, bevor auf den Worker gewartet wird
+        prev = self._tail.get(cid)
+        done = self._tail[cid] = loop.create_future()
+        try:
+            try:
+                hits = await scanning if scanning is not None else None
+            finally:
+                # auch wenn der Scan fehlschlägt: Vorgänger abwarten, sonst überholt der Nachfolger ihn
+                if prev is not None:
+                    await prev
+            if hits is None:
+                self.conversations.drop(cid)
+                self.telemetry.inc("conversations_ended")
+                return {"conversation_id": cid, "id": request.get("id"), "ended": True}
+            conv = self.conversations.get(cid)
+            ts = request.get("ts")
+            result = self.engine.step(conv, text, hits, ts if isinstance(ts, (int, float)) else None)
+            self.telemetry.inc("messages")
+            if self.checkpointer is not None:
+                self.checkpointer.maybe_checkpoint()
+            return {"conversation_id": cid, "id": request.get("id"), "seq": conv.seen, **result.to_dict()}
+        finally:
+            done.set_result(None)
+            if self._tail.get(cid) is done:
+                del self._tail[cid]
+
+    async def serve(self, reader: asyncio.StreamReader, write: Callable[[bytes], Awaitable[None]]) -> None:
+        """NDJSON-Zeilen von ``reader``; Antworten in Fertigstellungsreihenfolge über ``write``."""
+        pending: set = set()
+
+        async def answer(line: bytes) -> None:
+            self.inflight += 1
+            try:
+                try:
+                    request = json.loads(line)
+                except ValueError as exc:
+                    response: Dict[str, Any] = {"error": f"ungültiges JSON: {exc}"}
+                else:
+                    if not isinstance(request, dict):
+                        response = {"error": "Objekt erwartet"}
+                    else:
+                        try:
+                            response = await self.handle(request)
+                        except Exception as exc:  # Worker-Fehler beenden nicht die Verbindung
+                            response = {"conversation_id": request.get("conversation_id"),
+                                        "id": request.get("id"), "error": f"{type(exc).__name__}: {exc}"}
+                await write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+            finally:
+                self.inflight -= 1
+                self._slots.release()
+
+        while True:
+            await self._slots.acquire()
+            line = await reader.readline()
+            if not line:
+                self._slots.release()
+                break
+            if not line.strip():
+                self._slots.release()
+                continue
+            task = asyncio.create_task(answer(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+
+        async def write(data: bytes) -> None:
+            async with lock:
+                writer.write(data)
+                await writer.drain()
+
+        try:
+            await self.serve(reader, write)
+        finally:
+            writer.close()
+
+    async def serve_tcp(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self._connection, host, port, limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_unix(self, path: str) -> None:
+        server = await asyncio.start_unix_server(self._connection, path, limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_stdio(self) -> None:
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=LINE_LIMIT)
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except ValueError:  # umgeleitete Datei: kein Pipe, einmal komplett einlesen
+            reader.feed_data(await asyncio.to_thread(sys.stdin.buffer.read))
+            reader.feed_eof()
+        out = sys.stdout.buffer
+
+        async def write(data: bytes) -> None:
+            out.write(data)
+            out.flush()
+
+        await self.serve(reader, write)
+
+# -------- CLI --------
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Live-Marker-Scoring über NDJSON")
+    ap.add_argument("--markers", default=os.path.dirname(os.path.abspath(__file__)), help="Marker-Verzeichnis")
+    where = ap.add_mutually_exclusive_group()
+    where.add_argument("--tcp", metavar="HOST:PORT")
+    where.add_argument("--unix", metavar="PATH")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Worker-Prozesse fürs Matching (0 = Threads im Dienstprozess)")
+    ap.add_argument("--max-inflight", type=int, default=MAX_INFLIGHT)
+    ap.add_argument("--state-db", help="SQLite-Datei für ausgelagerte Gespräche (Standard: temporäre Datei)")
+    live = ap.add_mutually_exclusive_group()
+    live.add_argument("--memory-mb", type=float, default=MEMORY_MB,
+                      help="Speicherbudget für aktive Gespräche; bestimmt --max-live")
+    live.add_argument("--max-live", type=int, help="Gespräche im Speicher (statt --memory-mb)")
+    ap.add_argument("--ttl", type=float, help="Sekunden ohne Nachricht bis zur Auslagerung")
+    ap.add_argument("--checkpoint", metavar="PATH", help="Checkpoint-Log; wird beim Start eingelesen")
+    ap.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_INTERVAL)
+    args = ap.parse_args(argv)
+
+    async def run() -> None:
+        pool = worker_pool(args.markers, args.workers) if args.workers > 0 else None
+        engine = MarkerEngine.load(args.markers)
+        max_live = args.max_live if args.max_live is not None else max_live_for(args.memory_mb)
+        store = ConversationStore(engine, args.state_db, max_live, args.ttl)
+        checkpointer = None
+        if args.checkpoint:
+            checkpointer = Checkpointer(store, args.checkpoint, Telemetry(), args.checkpoint_interval)
+            checkpointer.recover()
+        server = MarkerServer(engine, pool, args.max_inflight, store, checkpointer)
+        try:
+            if args.tcp:
+                host, _, port = args.tcp.rpartition(":")
+                await server.serve_tcp(host or "127.0.0.1", int(port))
+            elif args.unix:
+                await server.serve_unix(args.unix)
+            else:
+                await server.serve_stdio()
+        finally:
+            if checkpointer is not None:
+                checkpointer.close()
+            store.close()
+            if pool is not None:
+                pool.shutdown()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
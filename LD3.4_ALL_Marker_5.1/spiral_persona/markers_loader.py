@@ -1,47 +1,79 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Set, Any, Tuple, Iterable
+from typing import Dict, List, Set, Any, Tuple, Iterable, FrozenSet, Sequence, Collection
+from functools import lru_cache
 import re
+import sys
 import yaml
 import json
 from pathlib import Path
 from collections import defaultdict, deque
+from array import array
+
+from yaml_cache import YamlCache, default_cache, parse_files, safe_load
 
 # -------- Dateien laden --------
-def load_markers(path: str | Path) -> Dict[str, Any]:
+def load_markers(path: str | Path, cache: YamlCache | None = None) -> Dict[str, Any]:
+    if cache is not None:
+        try:
+            return cache.load(path)
+        except yaml.YAMLError:
+            return {}
     with open(path, "r", encoding="utf-8") as f:
         try:
-            data = yaml.safe_load(f)
+            data = safe_load(f)
         except Exception:
             data = {}
     return data
 
-def load_all_markers(root_dir: str) -> Dict[str, Any]:
-    spec = {
-        "atomic_markers": [],
-        "semantic_markers": [],
-        "cluster_markers": [],
-        "meta_markers": [],
-    }
-    categories = {
-        "ATO": "atomic_markers",
-        "SEM": "semantic_markers",
-        "CLU": "cluster_markers",
-        "MEMA": "meta_markers",
-    }
+CATEGORIES = {
+    "SCN": "scene_markers",
+    "ATO": "atomic_markers",
+    "SEM": "semantic_markers",
+    "CLU": "cluster_markers",
+    "MEMA": "meta_markers",
+}
+
+def _load_marker_files(root: Path, cache: YamlCache | None, workers: int | None) -> List[Tuple[str, Path, Any]]:
+    files: List[Tuple[str, Path]] = []
+    for cat_dir, cat_key in CATEGORIES.items():
+        # ``ATO/`` oder Pack-Layout mit Suffix (``ATO_atomic/``, ``SCN_scene/`` …)
+        for dir_path in [root / cat_dir, *sorted(root.glob(f"{cat_dir}_*"))]:
+            if dir_path.is_dir():
+                files.extend((cat_key, p) for p in sorted(dir_path.glob("*.yaml")))
+    # alle Dateien auf einmal parsen (Cache + Prozess-Pool), Reihenfolge bleibt erhalten
+    paths = [p for _, p in files]
+    if cache is not None:
+        loaded = [data for data, _ in cache.load_many(paths, workers)]
+    else:
+        loaded = [data for _, data, _ in parse_files(paths, workers)]
+    return [(cat_key, path, data) for (cat_key, path), data in zip(files, loaded)]
+
+def load_all_markers(root_dir: str, cache: YamlCache | None = None, workers: int | None = None) -> Dict[str, Any]:
+    # ohne expliziten Cache greift $LEANDEEP_CACHE_DIR (falls gesetzt)
+    if cache is None:
+        cache = default_cache(root_dir)
+    spec: Dict[str, Any] = {cat_key: [] for cat_key in CATEGORIES.values()}
     root = Path(root_dir)
-    for cat_dir, cat_key in categories.items():
-        dir_path = root / cat_dir
-        if dir_path.is_dir():
-            for yaml_file in dir_path.glob("*.yaml"):
-                marker = load_markers(yaml_file)
-                if isinstance(marker, dict) and "id" in marker:
-                    spec[cat_key].append(marker)
+    for cat_key, _, marker in _load_marker_files(root, cache, workers):
+        if isinstance(marker, dict) and "id" in marker:
+            spec[cat_key].append(marker)
     meta_path = root / "metadata.yaml"
     if meta_path.is_file():
-        spec["metadata"] = load_markers(meta_path)["metadata"]
+        spec["metadata"] = load_markers(meta_path, cache)["metadata"]
+    if cache is not None:
+        cache.save()
     return spec
 
+def load_families(path: str | Path) -> Dict[str, List[str]]:
+    """``markers/families.json``: Familie -> ATO- und SEM-IDs."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        fam: [mid for key in ("atos", "sems") for mid in entry.get(key) or [] if isinstance(mid, str)]
+        for fam, entry in data.items() if isinstance(entry, dict)
+    }
+
 # -------- Index erstellen --------
 @dataclass
 class Registry:
@@ -51,6 +83,12 @@ class Registry:
     semantic_ids: Set[str] = field(default_factory=set)
     cluster_ids: Set[str] = field(default_factory=set)
     meta_ids: Set[str] = field(default_factory=set)
+    scene_ids: Set[str] = field(default_factory=set)
+    # invertierter Index: Eingabe-ID -> höhere Marker, die sie referenzieren
+    dependents: Dict[str, Set[str]] = field(default_factory=dict)
+    # dichte Integer-IDs (Bitposition) und Rückabbildung
+    index: Dict[str, int] = field(default_factory=dict)
+    names: List[str] = field(default_factory=list)
 
     @classmethod
     def build(cls, spec: Dict[str, Any]) -> "Registry":
@@ -60,19 +98,81 @@ class Registry:
             ("semantic_markers", r.semantic_ids),
             ("cluster_markers", r.cluster_ids),
             ("meta_markers", r.meta_ids),
+            ("scene_markers", r.scene_ids),
         ]:
             if k in spec and spec[k]:
                 for m in spec[k]:
                     if not isinstance(m, dict) or "id" not in m:
                         continue
                     mid = m["id"]
+                    if mid not in r.index:
+                        r.index[mid] = len(r.names)
+                        r.names.append(mid)
                     r.by_id[mid] = m
                     target.add(mid)
+        for mid in r.semantic_ids | r.cluster_ids | r.meta_ids:
+            for cid in composed_ids(r.by_id[mid]):
+                r.dependents.setdefault(cid, set()).add(mid)
         return r
 
+    def affected(self, changed: Iterable[str]) -> List[str]:
+        """Alle höheren Marker, die (transitiv) von ``changed`` abhängen, in Schichtreihenfolge."""
+        seen: Set[str] = set()
+        todo = list(changed)
+        while todo:
+            for dep in self.dependents.get(todo.pop(), ()):
+                if dep not in seen:
+                    seen.add(dep)
+                    todo.append(dep)
+        return sorted(seen, key=lambda mid: (layer_rank(mid), mid))
+
+    def compact(self) -> Dict[str, CompiledMarker]:
+        """CompiledMarker je ID (ohne Beispiele/Doku, siehe load_compiled_markers)."""
+        return {mid: compile_marker(m) for mid, m in self.by_id.items()}
+
+    def encode(self, msg: Iterable[str]) -> int:
+        """Marker-IDs einer Nachricht als Bitset (unbekannte IDs werden ignoriert)."""
+        return ids_to_bits(msg, self.index)
+
+    def decode(self, bits: int) -> Set[str]:
+        names = self.names
+        out: Set[str] = set()
+        while bits:
+            low = bits & -bits
+            out.add(names[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+    def to_rows(self, masks: Sequence[int]):
+        """Bitsets als NumPy-Boolematrix (Nachrichten × Marker); benötigt numpy."""
+        import numpy as np
+
+        n = len(self.names)
+        width = (n + 7) // 8
+        raw = b"".join(m.to_bytes(width, "little") for m in masks)
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(masks), width)
+        return np.unpackbits(packed, axis=1, count=n, bitorder="little").astype(bool)
+
+def ids_to_bits(ids: Iterable[str], index: Dict[str, int]) -> int:
+    bits = 0
+    for mid in ids:
+        pos = index.get(mid)
+        if pos is not None:
+            bits |= 1 << pos
+    return bits
+
+LAYER_PREFIXES = ("ATO_", "SEM_", "CLU_", "MEMA_")
+
+def layer_rank(mid: str) -> int:
+    """Schicht eines Markers nach ID-Präfix (ATO=0 … MEMA=3, Unbekanntes wie SEM)."""
+    for rank, prefix in enumerate(LAYER_PREFIXES):
+        if mid.startswith(prefix):
+            return rank
+    return 1
+
 # -------- Validierung --------
 RULE_PATTERNS = {
-    # deckt die im YAML verwendeten Regeln ab
+    # Kernformen für Schnellprüfungen; den vollständigen Dialekt parst compile_rule
     "BOTH_IN_N": re.compile(r"^\s*BOTH\s+IN\s+(\d+)\s+messages?\s*$", re.I),
     "AT_LEAST_X_IN_Y": re.compile(r"^\s*AT_LEAST\s+(\d+)\s+IN\s+(\d+)\s+messages?\s*$", re.I),
     "ANY_X_IN_Y": re.compile(r"^\s*ANY\s+(\d+)\s+IN\s+(\d+)\s+messages?\s*$", re.I),
@@ -106,8 +206,13 @@ def validate_spec(reg: Registry) -> None:
             errors.append(f"{sid}: SEM benötigt ≥2 ATO, gefunden {ato_count}")
 
     # 3) Aktivierungsregeln formell bekannt
-    def _rule_ok(rule: str) -> bool:
-        return any(pat.match(rule) for pat in RULE_PATTERNS.values())
+    def _rule_ok(m: Dict[str, Any], rule: str) -> bool:
+        windows, weights = rule_bindings(m)
+        try:
+            compile_rule(rule, composed_ids(m), windows, weights)
+        except RuleSyntaxError:
+            return False
+        return True
 
     for group, ids in [
         ("semantic_markers", reg.semantic_ids),
@@ -116,7 +221,7 @@ def validate_spec(reg: Registry) -> None:
     ]:
         for mid in ids:
             m = reg.by_id[mid]
-            rule = (m.get("activation") or {}).get("rule")
+            rule = rule_of(m)
             # Meta kann detect_class statt rule haben
             if rule is None:
                 if "detect_class" in m:
@@ -124,7 +229,7 @@ def validate_spec(reg: Registry) -> None:
                 # manche SEM nutzen nur composed_of, dann erzwingen wir rule
                 errors.append(f"{mid}: activation.rule fehlt")
             else:
-                if not _rule_ok(rule):
+                if not _rule_ok(m, rule):
                     errors.append(f"{mid}: unbekanntes activation.rule '{rule}'")
 
     # 4) Intuitions-CLUs Telemetrie und Learning
@@ -151,58 +256,601 @@ def validate_spec(reg: Registry) -> None:
     if errors:
         raise SpecError("\n".join(errors))
 
-# -------- Aktivierungsregeln auswerten --------
-def _window(messages: List[Set[str]], n: int) -> Iterable[List[Set[str]]]:
-    if n <= 0:
-        return []
-    dq: deque = deque(maxlen=n)
-    for msg in messages:
-        dq.append(msg)
-        if len(dq) == n:
-            yield list(dq)
-
-def evaluate_activation(rule: str, composed_of: List[str], messages: List[Set[str]]) -> bool:
-    # messages: Liste von Sets mit Marker-IDs pro Nachricht
-    if RULE_PATTERNS["BOTH_IN_N"].match(rule):
-        n = int(RULE_PATTERNS["BOTH_IN_N"].match(rule).group(1))
-        for win in _window(messages, n):
-            present: Set[str] = set()
-            for s in win:
-                present |= (s & set(composed_of))
-            if all(c in present for c in composed_of):
-                return True
-        return False
+# -------- Aktivierungsregeln kompilieren --------
+class RuleSyntaxError(ValueError): ...
 
-    if RULE_PATTERNS["AT_LEAST_X_IN_Y"].match(rule):
-        x, y = map(int, RULE_PATTERNS["AT_LEAST_X_IN_Y"].match(rule).groups())
-        for win in _window(messages, y):
-            count = sum(1 for s in win for c in composed_of if c in s)
-            if count >= x:
-                return True
-        return False
+# Regeltypen der Blätter:
+#   BOTH_IN_N                alle gezählten IDs im Fenster vorhanden
+#   AT_LEAST_X_IN_Y          gewichtete Treffer (Nachricht×ID) >= x
+#   ANY_X_IN_Y               Treffer der IDs >= x; ohne IDs zählt jeder Marker
+#   AT_LEAST_X_DISTINCT_IN_Y verschiedene IDs im Fenster >= x
+#   WEIGHTED_SUM             Summe der Gewichte vorhandener IDs >= x
+@dataclass(frozen=True)
+class RuleProgram:
+    """Blatt einer kompilierten Aktivierungsregel mit ihren Parametern."""
+    kind: str
+    x: float                   # Schwelle (bei BOTH_IN_N ungenutzt)
+    y: int                     # Fenstergröße in Nachrichten
+    composed: Tuple[str, ...]  # gezählte IDs inkl. Vielfachheit
+    ids: FrozenSet[str]
+    weights: Tuple[Tuple[str, float], ...] = ()  # nur WEIGHTED_SUM
+
+    def leaves(self) -> Iterable["RuleProgram"]:
+        yield self
+
+    def holds(self, leaf_ok) -> bool:
+        return leaf_ok(self)
 
-    if RULE_PATTERNS["ANY_X_IN_Y"].match(rule):
-        x, y = map(int, RULE_PATTERNS["ANY_X_IN_Y"].match(rule).groups())
-        for win in _window(messages, y):
-            count = sum(1 for s in win for _ in s)  # irgendein Marker
-            if count >= x:
+    def evaluate(self, messages: Sequence[Set[str]]) -> bool:
+        """True, wenn irgendein volles Fenster über ``messages`` die Regel erfüllt."""
+        y = self.y
+        if y <= 0:
+            return False
+        win = _RuleWindow(self)
+        for i, msg in enumerate(messages):
+            win.enter_message(msg)
+            if i >= y:
+                win.leave_message(messages[i - y])
+            if i + 1 >= y and win.satisfied():
                 return True
         return False
 
-    if RULE_PATTERNS["AT_LEAST_X_DISTINCT_SEMs_IN_Y"].match(rule):
-        x, y = map(int, RULE_PATTERNS["AT_LEAST_X_DISTINCT_SEMs_IN_Y"].match(rule).groups())
-        for win in _window(messages, y):
-            seen = set()
-            for s in win:
-                seen |= {m for m in s if m.startswith("SEM_")}
-            if len(seen & set(composed_of)) >= x:
-                return True
+    def steps(self, messages: Sequence[Set[str]]) -> List[bool]:
+        """Erfüllung je Fensterende (nur volle Fenster zählen)."""
+        y = self.y
+        out = [False] * len(messages)
+        if y <= 0:
+            return out
+        win = _RuleWindow(self)
+        for i, msg in enumerate(messages):
+            win.enter_message(msg)
+            if i >= y:
+                win.leave_message(messages[i - y])
+            out[i] = i + 1 >= y and win.satisfied()
+        return out
+
+    def bit_steps(self, masks: Sequence[int], index: Dict[str, int]) -> List[bool]:
+        """Wie ``steps``, aber auf Bitset-Nachrichten (siehe ``Registry.encode``)."""
+        y, n = self.y, len(masks)
+        out = [False] * n
+        if y <= 0 or n < y:
+            return out
+        if self.kind == "ANY_X_IN_Y" and not self.ids:
+            per = [m.bit_count() for m in masks]
+        elif self.kind in ("AT_LEAST_X_IN_Y", "ANY_X_IN_Y"):
+            # Vielfachheit in composed_of als Gewicht, je Gewicht eine Maske
+            mult: Dict[str, int] = {}
+            for c in self.composed:
+                mult[c] = mult.get(c, 0) + 1
+            groups: Dict[int, int] = {}
+            for c, w in mult.items():
+                if c in index:
+                    groups[w] = groups.get(w, 0) | 1 << index[c]
+            per = [sum(w * (m & g).bit_count() for w, g in groups.items()) for m in masks]
+        else:
+            mask = ids_to_bits(self.ids, index)
+            if self.kind == "BOTH_IN_N" and any(c not in index for c in self.ids):
+                return out
+            unions = _window_unions([m & mask for m in masks], y)
+            for i in range(y - 1, n):
+                u = unions[i]
+                if self.kind == "BOTH_IN_N":
+                    out[i] = u == mask
+                elif self.kind == "AT_LEAST_X_DISTINCT_IN_Y":
+                    out[i] = u.bit_count() >= self.x
+                else:
+                    total = sum(w for c, w in self.weights if c in index and u >> index[c] & 1)
+                    out[i] = u != 0 and total >= self.x - 1e-9
+            return out
+        total = sum(per[:y])
+        out[y - 1] = total >= self.x
+        for i in range(y, n):
+            total += per[i] - per[i - y]
+            out[i] = total >= self.x
+        return out
+
+    def evaluate_bits(self, masks: Sequence[int], index: Dict[str, int]) -> bool:
+        return any(self.bit_steps(masks, index))
+
+def _window_unions(vals: Sequence[int], y: int) -> List[int]:
+    """ODER über jedes Fenster der Länge y (Blockpräfix/-suffix, O(n))."""
+    n = len(vals)
+    pre, suf = [0] * n, [0] * n
+    for i in range(n):
+        pre[i] = vals[i] if i % y == 0 else pre[i - 1] | vals[i]
+    for i in range(n - 1, -1, -1):
+        suf[i] = vals[i] if i == n - 1 or (i + 1) % y == 0 else suf[i + 1] | vals[i]
+    out = [0] * n
+    for i in range(y - 1, n):
+        out[i] = suf[i - y + 1] | pre[i]
+    return out
+
+@dataclass(frozen=True)
+class RuleExpr:
+    """UND/ODER-Verknüpfung von Regeln; alle Teile beziehen sich auf dasselbe Fensterende."""
+    op: str  # "AND" | "OR"
+    children: Tuple[Any, ...]
+
+    def leaves(self) -> Iterable[RuleProgram]:
+        for c in self.children:
+            yield from c.leaves()
+
+    def holds(self, leaf_ok) -> bool:
+        if self.op == "AND":
+            return all(c.holds(leaf_ok) for c in self.children)
+        return any(c.holds(leaf_ok) for c in self.children)
+
+    def evaluate(self, messages: Sequence[Set[str]]) -> bool:
+        if self.op == "OR":
+            return any(c.evaluate(messages) for c in self.children)
+        return any(self.steps(messages))
+
+    def steps(self, messages: Sequence[Set[str]]) -> List[bool]:
+        per_leaf = {leaf: leaf.steps(messages) for leaf in set(self.leaves())}
+        return [self.holds(lambda leaf: per_leaf[leaf][i]) for i in range(len(messages))]
+
+    def bit_steps(self, masks: Sequence[int], index: Dict[str, int]) -> List[bool]:
+        per_leaf = {leaf: leaf.bit_steps(masks, index) for leaf in set(self.leaves())}
+        return [self.holds(lambda leaf: per_leaf[leaf][i]) for i in range(len(masks))]
+
+    def evaluate_bits(self, masks: Sequence[int], index: Dict[str, int]) -> bool:
+        return any(self.bit_steps(masks, index))
+
+_RULE_TOKEN = re.compile(r"\s*(>=|\(|\)|\[|\]|,|\+|\d+(?:\.\d+)?|[A-Za-z_][A-Za-z0-9_]*\*?)")
+_MARKER_ID = re.compile(r"^[A-Z][A-Z0-9]*(?:_[A-Z0-9]+)+$")
+_MARKER_WILDCARD = re.compile(r"^[A-Z][A-Z0-9]*_(?:[A-Z0-9]+_)*\*$")
+_KEYWORDS = {
+    "OR", "AND", "BOTH", "ALL", "ANY", "ANY_OF", "AT_LEAST", "DISTINCT", "DIFFERENT", "OF",
+    "IN", "WITHIN", "MESSAGE", "MESSAGES", "MSG", "MSGS", "COUNT", "WEIGHTED_AND", "WEIGHTED_OR",
+    "OCCURS", "AGAIN",
+}
+_PREFIX_WORDS = {"ATO": "ATO_", "ATOS": "ATO_", "SEM": "SEM_", "SEMS": "SEM_",
+                 "CLU": "CLU_", "CLUS": "CLU_", "MEMA": "MEMA_", "MEMAS": "MEMA_"}
+
+class _RuleParser:
+    """Rekursiver Abstieg über die Regel-Dialekte des Korpus.
+
+    expr   := and ("OR" and)*
+    and    := atom ("AND" atom)*
+    atom   := "(" expr ")" [window] | clause
+    clause := quant [ids] ["occurs again"] [window]
+    window := ("IN" | "WITHIN") (zahl ["message(s)"] | symbol)
+
+    Klauseln ohne eigenes Fenster übernehmen das nächste Fenster rechts in
+    ihrer Kette ("ATO_A AND ATO_B IN 3 messages"), sonst gilt 1 Nachricht.
+    """
+
+    def __init__(self, rule: str, composed_of: Tuple[str, ...], windows: Dict[str, int],
+                 weights: Dict[str, float]) -> None:
+        self.rule = rule
+        self.composed_of = composed_of
+        self.windows = windows
+        self.weights = weights
+        self.tokens: List[str] = []
+        pos = 0
+        text = rule.rstrip()
+        while pos < len(text):
+            m = _RULE_TOKEN.match(text, pos)
+            if not m:
+                raise RuleSyntaxError(f"unbekannte Regel: {rule}")
+            self.tokens.append(m.group(1))
+            pos = m.end()
+        self.i = 0
+
+    # --- Token-Hilfen ---
+    def _peek(self, k: int = 0) -> str | None:
+        j = self.i + k
+        return self.tokens[j] if j < len(self.tokens) else None
+
+    def _kw(self, k: int = 0) -> str | None:
+        t = self._peek(k)
+        return t.upper() if t is not None else None
+
+    def _take(self, *words: str) -> bool:
+        if self._kw() in words:
+            self.i += 1
+            return True
         return False
 
-    raise ValueError(f"unbekannte Regel: {rule}")
+    def _fail(self) -> RuleSyntaxError:
+        return RuleSyntaxError(f"unbekannte Regel: {self.rule}")
+
+    def _number(self) -> float | None:
+        t = self._peek()
+        if t is not None and t[0].isdigit():
+            self.i += 1
+            return float(t) if "." in t else int(t)
+        return None
+
+    def _is_id(self, t: str | None) -> bool:
+        return t is not None and t.upper() not in _KEYWORDS and bool(_MARKER_ID.match(t))
+
+    # --- Grammatik ---
+    def parse(self):
+        node = self._or()
+        if self._peek() is not None:
+            raise self._fail()
+        return self._resolve(node, None)
+
+    def _or(self):
+        parts = [self._and()]
+        while self._take("OR"):
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else ("OR", parts, None)
+
+    def _and(self):
+        parts = [self._atom()]
+        while self._take("AND"):
+            parts.append(self._atom())
+        return parts[0] if len(parts) == 1 else ("AND", parts, None)
+
+    def _atom(self):
+        if self._take("("):
+            node = self._or()
+            if not self._take(")"):
+                raise self._fail()
+            op, parts, _ = node if isinstance(node, tuple) and node[0] in ("AND", "OR") else ("AND", [node], None)
+            return (op, parts, self._window())
+        return self._clause()
+
+    def _ids(self) -> Tuple[str, ...] | None:
+        if not (self._kw() == "OF" and self._peek(1) == "["):
+            return None
+        self.i += 2
+        ids: List[str] = []
+        while not self._take("]"):
+            t = self._peek()
+            if not self._is_id(t):
+                raise self._fail()
+            ids.append(t)
+            self.i += 1
+            self._take(",")
+        return tuple(ids)
+
+    def _count_terms(self) -> Tuple[str, ...]:
+        ids: List[str] = []
+        while True:
+            if not (self._take("COUNT") and self._take("(")):
+                raise self._fail()
+            t = self._peek()
+            if not self._is_id(t):
+                raise self._fail()
+            ids.append(t)
+            self.i += 1
+            if not self._take(")"):
+                raise self._fail()
+            if not self._take("+"):
+                return tuple(ids)
+
+    def _clause(self):
+        kw = self._kw()
+        prefix: str | None = None
+        ids: Tuple[str, ...] | None = None
+        x: float = 1
+        if kw == "BOTH":
+            self.i += 1
+            kind = "BOTH_IN_N"
+        elif kw == "ALL":
+            self.i += 1
+            n = self._number()
+            kind = "BOTH_IN_N" if n is None else "AT_LEAST_X_DISTINCT_IN_Y"
+            x = n or 0
+        elif kw in ("ANY", "ANY_OF"):
+            self.i += 1
+            kind = "ANY_X_IN_Y"
+            n = self._number() if kw == "ANY" else None
+            x = 1 if n is None else n
+        elif kw == "AT_LEAST":
+            self.i += 1
+            n = self._number()
+            if n is None:
+                raise self._fail()
+            x = n
+            kind = "AT_LEAST_X_IN_Y"
+            word = self._kw()
+            if word in ("DISTINCT", "DIFFERENT"):
+                self.i += 1
+                kind = "AT_LEAST_X_DISTINCT_IN_Y"
+                word = self._kw()
+                if word in _PREFIX_WORDS:
+                    prefix = _PREFIX_WORDS[word]
+                    self.i += 1
+                elif word is not None and _MARKER_WILDCARD.match(self._peek()):
+                    prefix = self._peek()[:-1]
+                    self.i += 1
+            elif word is not None and word.startswith("DISTINCT_") and word[9:] in _PREFIX_WORDS:
+                self.i += 1
+                kind = "AT_LEAST_X_DISTINCT_IN_Y"
+                prefix = _PREFIX_WORDS[word[9:]]
+        elif kw in ("WEIGHTED_AND", "WEIGHTED_OR"):
+            self.i += 1
+            kind = "WEIGHTED_SUM"
+            x = self.weights.get("__threshold__", 0)
+            if self._take(">="):
+                n = self._number()
+                if n is None:
+                    raise self._fail()
+                x = n
+        elif kw == "COUNT":
+            ids = self._count_terms()
+            if not self._take(">="):
+                raise self._fail()
+            n = self._number()
+            if n is None:
+                raise self._fail()
+            kind, x = "AT_LEAST_X_IN_Y", n
+        elif self._is_id(self._peek()):
+            ids = (self._peek(),)
+            self.i += 1
+            kind = "AT_LEAST_X_IN_Y"
+        else:
+            raise self._fail()
+        if ids is None:
+            ids = self._ids()
+        window = None
+        if self._kw() == "OCCURS" and self._kw(1) == "AGAIN":
+            self.i += 2
+            x = max(x, 2)
+            window = "confirm_window"
+        window = self._window() or window
+        return ("LEAF", kind, x, ids, prefix, window)
+
+    def _window(self) -> int | str | None:
+        if not self._take("IN", "WITHIN"):
+            return None
+        n = self._number()
+        if n is not None:
+            self._take("MESSAGE", "MESSAGES", "MSG", "MSGS")
+            return int(n)
+        t = self._peek()
+        if t is None or not re.match(r"^[a-z][a-z0-9_]*$", t):
+            raise self._fail()
+        self.i += 1
+        return t
+
+    # --- Fenster auflösen und Blätter bauen ---
+    def _resolve(self, node, inherited):
+        if node[0] == "LEAF":
+            _, kind, x, ids, prefix, window = node
+            return self._leaf(kind, x, ids, prefix, window if window is not None else inherited)
+        op, parts, window = node
+        carry = window if window is not None else inherited
+        out = []
+        for part in reversed(parts):
+            own = part[5] if part[0] == "LEAF" else part[2]
+            if own is not None:
+                carry = own
+            out.append(self._resolve(part, carry))
+        out.reverse()
+        return RuleExpr(op=op, children=tuple(out))
+
+    def _leaf(self, kind: str, x: float, ids, prefix, window) -> RuleProgram:
+        if window is None:
+            y = 1
+        elif isinstance(window, int):
+            y = window
+        elif window in self.windows:
+            y = int(self.windows[window])
+        else:
+            raise RuleSyntaxError(f"unbekanntes Fenster '{window}' in Regel: {self.rule}")
+        composed = tuple(ids) if ids is not None else self.composed_of
+        if prefix:
+            composed = tuple(c for c in composed if c.startswith(prefix))
+        weights: Tuple[Tuple[str, float], ...] = ()
+        if kind == "WEIGHTED_SUM":
+            weights = tuple((c, float(self.weights[c])) for c in dict.fromkeys(composed) if c in self.weights)
+            if not weights:
+                # ohne Kombinationsgewichte wäre die Summe immer 0 und die Regel nie erfüllt
+                raise RuleSyntaxError(f"WEIGHTED-Regel ohne Gewichte: {self.rule}")
+            composed = tuple(c for c, _ in weights)
+        return RuleProgram(kind=kind, x=x, y=y, composed=composed, ids=frozenset(composed), weights=weights)
+
+@lru_cache(maxsize=None)
+def _compile_rule(rule: str, composed_of: Tuple[str, ...], windows: Tuple[Tuple[str, int], ...],
+                  weights: Tuple[Tuple[str, float], ...]):
+    return _RuleParser(rule, composed_of, dict(windows), dict(weights)).parse()
+
+def compile_rule(rule: str, composed_of: Iterable[str], windows: Dict[str, int] | None = None,
+                 weights: Dict[str, float] | None = None):
+    """Übersetzt eine Aktivierungsregel in ein RuleProgram bzw. einen RuleExpr-Baum.
+
+    ``windows`` bindet symbolische Fenster wie ``confirm_window``; ``weights`` liefert
+    Komponenten-Gewichte (und optional ``__threshold__``) für WEIGHTED_AND/OR.
+    Ergebnisse werden je Regel, IDs und Bindungen gecacht.
+    """
+    return _compile_rule(
+        rule,
+        tuple(composed_of),
+        tuple(sorted((windows or {}).items())),
+        tuple(sorted((weights or {}).items())),
+    )
+
+def rule_of(marker: Dict[str, Any]) -> str | None:
+    """Liest die Regel aus ``activation.rule`` oder einer Kurzform ``activation: "…"``."""
+    act = marker.get("activation")
+    if isinstance(act, str):
+        return act
+    if isinstance(act, dict) and isinstance(act.get("rule"), str):
+        return act["rule"]
+    return None
+
+def rule_bindings(marker: Dict[str, Any]) -> Tuple[Dict[str, int], Dict[str, float]]:
+    """Sammelt Fenster-Symbole und WEIGHTED-Gewichte aus einem Marker-Dict."""
+    windows: Dict[str, int] = {}
+    act = marker.get("activation")
+    for src in (marker.get("window"), act.get("window") if isinstance(act, dict) else None):
+        if isinstance(src, int):
+            windows["window"] = src
+        elif isinstance(src, dict) and isinstance(src.get("messages"), int):
+            windows["window"] = src["messages"]
+    md = marker.get("metadata")
+    intu = md.get("intuition") if isinstance(md, dict) else None
+    if isinstance(intu, dict):
+        for k in ("confirm_window", "decay_window"):
+            if isinstance(intu.get(k), int):
+                windows[k] = intu[k]
+    weights: Dict[str, float] = {}
+    comb = marker.get("combination")
+    if isinstance(comb, dict):
+        for comp in comb.get("components") or []:
+            if isinstance(comp, dict):
+                cid = comp.get("marker_id") or comp.get("id")
+                if isinstance(cid, str) and isinstance(comp.get("weight"), (int, float)):
+                    weights[cid] = float(comp["weight"])
+        if isinstance(comb.get("threshold"), (int, float)):
+            weights["__threshold__"] = float(comb["threshold"])
+    return windows, weights
+
+def composed_ids(marker: Dict[str, Any]) -> List[str]:
+    """composed_of als ID-Liste; WEIGHTED-Komponenten ergänzen fehlende IDs."""
+    comp = marker.get("composed_of")
+    ids = [c for c in comp if isinstance(c, str)] if isinstance(comp, list) else []
+    if isinstance(comp, dict):
+        for k in ("any_of", "all_of"):
+            if isinstance(comp.get(k), list):
+                ids.extend(c for c in comp[k] if isinstance(c, str))
+    _, weights = rule_bindings(marker)
+    ids.extend(c for c in weights if c != "__threshold__" and c not in ids)
+    return ids
+
+class _RuleWindow:
+    """Rollende Zähler eines RuleProgram-Blatts über sein Nachrichtenfenster."""
+    __slots__ = ("program", "kind", "x", "y", "weights", "counts", "covered", "total", "every")
+
+    def __init__(self, program: RuleProgram) -> None:
+        self.program = program
+        self.kind, self.x, self.y = program.kind, program.x, program.y
+        # Gewicht = Vielfachheit in composed_of (AT_LEAST zählt Paare Nachricht×ID),
+        # bei WEIGHTED_SUM das Komponenten-Gewicht
+        self.weights: Dict[str, float] = {}
+        if program.kind == "WEIGHTED_SUM":
+            self.weights.update(program.weights)
+        else:
+            for c in program.composed:
+                self.weights[c] = self.weights.get(c, 0) + 1
+        self.every = program.kind == "ANY_X_IN_Y" and not program.ids
+        self.counts: Dict[str, int] = {}
+        self.covered = 0  # IDs mit Zähler > 0 im Fenster
+        self.total = 0    # gewichtete Treffer im Fenster
+
+    def enter(self, mid: str) -> None:
+        n = self.counts.get(mid, 0)
+        if n == 0:
+            self.covered += 1
+            if self.kind == "WEIGHTED_SUM":
+                self.total += self.weights[mid]
+        self.counts[mid] = n + 1
+        if self.kind != "WEIGHTED_SUM":
+            self.total += self.weights[mid]
+
+    def leave(self, mid: str) -> None:
+        n = self.counts[mid] - 1
+        if n == 0:
+            self.covered -= 1
+            del self.counts[mid]
+            if self.kind == "WEIGHTED_SUM":
+                self.total -= self.weights[mid]
+        else:
+            self.counts[mid] = n
+        if self.kind != "WEIGHTED_SUM":
+            self.total -= self.weights[mid]
+
+    def enter_message(self, msg: Set[str]) -> None:
+        if self.every:
+            self.total += len(msg)
+            return
+        for mid in self.program.ids.intersection(msg):
+            self.enter(mid)
+
+    def leave_message(self, msg: Set[str]) -> None:
+        if self.every:
+            self.total -= len(msg)
+            return
+        for mid in self.program.ids.intersection(msg):
+            self.leave(mid)
+
+    def satisfied(self) -> bool:
+        if self.kind == "BOTH_IN_N":
+            return self.covered == len(self.weights)
+        if self.kind == "AT_LEAST_X_DISTINCT_IN_Y":
+            return self.covered >= self.x
+        if self.kind == "WEIGHTED_SUM":
+            return self.covered > 0 and self.total >= self.x - 1e-9
+        # AT_LEAST_X_IN_Y und ANY_X_IN_Y
+        return self.total >= self.x
+
+# -------- Aktivierungsregeln auswerten --------
+def evaluate_activation(rule: str | RuleProgram | RuleExpr, composed_of: List[str], messages: List[Set[str]],
+                        windows: Dict[str, int] | None = None, index: Dict[str, int] | None = None) -> bool:
+    # messages: Liste von Sets mit Marker-IDs pro Nachricht,
+    # oder mit ``index`` (Registry.index) Bitsets aus Registry.encode
+    program = compile_rule(rule, composed_of, windows) if isinstance(rule, str) else rule
+    if index is not None:
+        return program.evaluate_bits(messages, index)
+    return program.evaluate(messages)
 
 # -------- Intuitions-Zustand --------
-@dataclass
+class _ConfirmTracker:
+    """Ringpuffer eines Intuitions-Clusters: Fenster der confirm_rule und Support-Treffer."""
+    __slots__ = ("program", "source", "windows", "ids", "support_ids", "limit",
+                 "history", "seen", "support_ring", "support")
+
+    def __init__(self, program, confirm_ids: Sequence[str], confirm_window: int, decay_window: int) -> None:
+        self.program = program
+        self.source = tuple(confirm_ids)
+        leaves = set(program.leaves()) if program is not None else set()
+        self.windows: Dict[RuleProgram, _RuleWindow] = {leaf: _RuleWindow(leaf) for leaf in leaves}
+        # nur relevante IDs puffern; Regeln ohne IDs zählen jeden Marker
+        every = any(rw.every for rw in self.windows.values())
+        self.ids = None if every else frozenset(confirm_ids).union(*(leaf.ids for leaf in leaves))
+        self.support_ids = frozenset(confirm_ids)
+        self.limit = confirm_window
+        self.history: deque = deque(maxlen=max((leaf.y for leaf in leaves), default=0))
+        self.seen = 0
+        self.support_ring: deque = deque(maxlen=decay_window)
+        self.support = 0
+
+    def push(self, msg: Set[str]) -> None:
+        rel = frozenset(msg) if self.ids is None else self.ids.intersection(msg)
+        n = len(self.history)
+        for leaf, rw in self.windows.items():
+            if 0 < leaf.y <= n:
+                rw.leave_message(self.history[-leaf.y])
+            rw.enter_message(rel)
+        self.history.append(rel)
+        self.seen += 1
+        hit = not self.support_ids.isdisjoint(msg)
+        ring = self.support_ring
+        if ring.maxlen and len(ring) == ring.maxlen:
+            self.support -= ring[0]
+        ring.append(hit)
+        self.support += hit if ring.maxlen else 0
+
+    def load(self, seen: int, history: Iterable[Iterable[str]], ring: Iterable[bool]) -> None:
+        """Zustand aus ``IntuitionBank.snapshot``; Fensterzähler werden aus der Historie neu aufgebaut."""
+        self.history.clear()
+        self.history.extend(frozenset(m) for m in history)
+        msgs = list(self.history)
+        for leaf in self.windows:
+            rw = self.windows[leaf] = _RuleWindow(leaf)
+            for rel in (msgs[-leaf.y:] if leaf.y > 0 else msgs):
+                rw.enter_message(rel)
+        self.seen = seen
+        self.support_ring.clear()
+        self.support_ring.extend(bool(b) for b in ring)
+        self.support = sum(self.support_ring) if self.support_ring.maxlen else 0
+
+    def confirmed(self) -> bool:
+        # wie tick(): nur volle Fenster innerhalb der letzten confirm_window Nachrichten
+        limit = min(self.seen, self.limit)
+        return self.program.holds(lambda leaf: 0 < leaf.y <= limit and self.windows[leaf].satisfied())
+
+def _confirm_program(confirm_rule: str, confirm_ids: Sequence[str], confirm_window: int, decay_window: int):
+    if not confirm_rule:
+        return None
+    return compile_rule(confirm_rule, confirm_ids, {"confirm_window": confirm_window, "decay_window": decay_window})
+
+@dataclass(slots=True)
 class IntuitionState:
     state: str = "provisional"  # provisional | confirmed | decayed
     score: float = 0.0
@@ -214,12 +862,14 @@ class IntuitionState:
     confirm_rule: str = ""
     ewma_alpha: float = 0.1
     ewma_precision: float = 0.5
+    _tracker: Any = field(default=None, init=False, repr=False, compare=False)
 
     def update_ewma(self, precision: float) -> None:
         a = self.ewma_alpha
         self.ewma_precision = a * precision + (1 - a) * self.ewma_precision
 
-    def tick(self, activated: bool, window_msgs: List[Set[str]], confirm_ids: List[str]) -> None:
+    def tick(self, activated: bool, window_msgs: List[Set[str]], confirm_ids: List[str],
+             index: Dict[str, int] | None = None) -> None:
         # Score
         if activated:
             self.score += self.base * self.weight
@@ -229,7 +879,8 @@ class IntuitionState:
         # Bestätigung prüfen
         if self.state == "provisional":
             # confirm_rule gilt auf confirm_window
-            ok = evaluate_activation(self.confirm_rule, confirm_ids, window_msgs[-self.confirm_window :]) if self.confirm_rule else False
+            windows = {"confirm_window": self.confirm_window, "decay_window": self.decay_window}
+            ok = evaluate_activation(self.confirm_rule, confirm_ids, window_msgs[-self.confirm_window :], windows, index) if self.confirm_rule else False
             if ok:
                 self.state = "confirmed"
                 self.score *= self.multiplier_on_confirm
@@ -237,22 +888,611 @@ class IntuitionState:
         if not activated and self.state == "confirmed":
             # keine strenge Regel, einfacher Time-based Decay
             last = window_msgs[-self.decay_window :]
-            any_support = any(any(mid in msg for mid in confirm_ids) for msg in last)
+            if index is not None:
+                support = ids_to_bits(confirm_ids, index)
+                any_support = any(msg & support for msg in last)
+            else:
+                any_support = any(any(mid in msg for mid in confirm_ids) for msg in last)
             if not any_support:
                 self.state = "decayed"
 
+    def step(self, activated: bool, msg: Set[str], confirm_ids: Sequence[str]) -> None:
+        """Wie ``tick``, aber mit nur der neuen Nachricht; Fenster laufen als Ringpuffer mit.
+
+        Entspricht ``tick`` mit den letzten Nachrichten, sofern jede Nachricht genau
+        einmal übergeben wird.
+        """
+        tr = self._tracker
+        if tr is None or (confirm_ids is not tr.source and tuple(confirm_ids) != tr.source):
+            program = _confirm_program(self.confirm_rule, confirm_ids, self.confirm_window, self.decay_window)
+            tr = self._tracker = _ConfirmTracker(program, confirm_ids, self.confirm_window, self.decay_window)
+        tr.push(msg)
+        if activated:
+            self.score += self.base * self.weight
+        else:
+            self.score *= 0.9
+        if self.state == "provisional" and tr.program is not None and tr.confirmed():
+            self.state = "confirmed"
+            self.score *= self.multiplier_on_confirm
+        if not activated and self.state == "confirmed" and tr.support == 0:
+            self.state = "decayed"
+
+class IntuitionBank:
+    """Zustand vieler Intuitions-Cluster in flachen Arrays, pro Nachricht ein Aufruf.
+
+    ``step`` rückt alle Cluster gemeinsam vor; Score, Verstärkung und EWMA liegen
+    in ``array('d')``, der Zustand als Byte (Index in ``STATES``).
+    """
+    STATES = ("provisional", "confirmed", "decayed")
+
+    def __init__(self, clusters: Dict[str, IntuitionState], confirm_ids: Dict[str, Sequence[str]]) -> None:
+        self._config = (clusters, confirm_ids)
+        self.ids: List[str] = list(clusters)
+        self.slot = {cid: i for i, cid in enumerate(self.ids)}
+        states = [clusters[cid] for cid in self.ids]
+        self.score = array("d", (st.score for st in states))
+        self.gain = array("d", (st.base * st.weight for st in states))
+        self.multiplier = array("d", (st.multiplier_on_confirm for st in states))
+        self.ewma = array("d", (st.ewma_precision for st in states))
+        self.alpha = array("d", (st.ewma_alpha for st in states))
+        self.state = bytearray(self.STATES.index(st.state) for st in states)
+        self._trackers: List[_ConfirmTracker] = []
+        for cid, st in zip(self.ids, states):
+            ids = confirm_ids.get(cid, ())
+            program = _confirm_program(st.confirm_rule, ids, st.confirm_window, st.decay_window)
+            self._trackers.append(_ConfirmTracker(program, ids, st.confirm_window, st.decay_window))
+
+    @classmethod
+    def from_registry(cls, reg: Registry, confirm_ids: Dict[str, Sequence[str]] | None = None) -> "IntuitionBank":
+        """Alle CLU_INTUITION_* mit Scoring- und Intuitions-Metadaten.
+
+        Ohne explizite ``confirm_ids`` zählen die IDs der confirm_rule bzw. composed_of.
+        """
+        clusters: Dict[str, IntuitionState] = {}
+        ids: Dict[str, Sequence[str]] = dict(confirm_ids or {})
+        for cid in sorted(reg.cluster_ids):
+            m = reg.by_id[cid]
+            md = m.get("metadata") or {}
+            intu = md.get("intuition") or {}
+            if not cid.startswith("CLU_INTUITION_") or not intu:
+                continue
+            scoring = m.get("scoring") or {}
+            st = IntuitionState(
+                base=scoring.get("base", 0.5),
+                weight=scoring.get("weight", 1.0),
+                multiplier_on_confirm=intu.get("multiplier_on_confirm", 1.5),
+                confirm_window=intu.get("confirm_window", 5),
+                decay_window=intu.get("decay_window", 7),
+                confirm_rule=intu.get("confirm_rule", ""),
+                ewma_alpha=(md.get("learning") or {}).get("ewma_alpha", 0.1),
+            )
+            if cid not in ids:
+                comp = composed_ids(m)
+                try:
+                    program = _confirm_program(st.confirm_rule, comp, st.confirm_window, st.decay_window)
+                except RuleSyntaxError:
+                    continue
+                leaf_ids = set().union(*(leaf.ids for leaf in program.leaves())) if program else set()
+                ids[cid] = sorted(leaf_ids) or comp
+            clusters[cid] = st
+        return cls(clusters, ids)
+
+    def fresh(self) -> "IntuitionBank":
+        """Neue Bank mit denselben Clustern im Anfangszustand (z. B. je Gespräch)."""
+        return IntuitionBank(*self._config)
+
+    def step(self, activated: Set[str], msg: Set[str]) -> None:
+        """Rückt alle Cluster um eine Nachricht vor; ``activated`` = aktive Cluster-IDs."""
+        score, state = self.score, self.state
+        for i, tr in enumerate(self._trackers):
+            tr.push(msg)
+            on = self.ids[i] in activated
+            if on:
+                score[i] += self.gain[i]
+            else:
+                score[i] *= 0.9
+            if state[i] == 0 and tr.program is not None and tr.confirmed():
+                state[i] = 1
+                score[i] *= self.multiplier[i]
+            if not on and state[i] == 1 and tr.support == 0:
+                state[i] = 2
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-taugliche Momentaufnahme (Scores, Zustände, Ringpuffer) nach Cluster-ID."""
+        return {cid: [self.score[i], self.ewma[i], self.state[i], tr.seen,
+                      [sorted(m) for m in tr.history], [int(b) for b in tr.support_ring]]
+                for i, (cid, tr) in enumerate(zip(self.ids, self._trackers))}
+
+    def restore(self, snap: Dict[str, Any]) -> None:
+        """Gegenstück zu ``snapshot``; unbekannte Cluster werden übersprungen."""
+        for cid, (score, ewma, state, seen, history, ring) in snap.items():
+            i = self.slot.get(cid)
+            if i is None:
+                continue
+            self.score[i], self.ewma[i], self.state[i] = score, ewma, state
+            self._trackers[i].load(seen, history, ring)
+
+    def update_ewma(self, cid: str, precision: float) -> None:
+        i = self.slot[cid]
+        a = self.alpha[i]
+        self.ewma[i] = a * precision + (1 - a) * self.ewma[i]
+
+    def state_of(self, cid: str) -> str:
+        return self.STATES[self.state[self.slot[cid]]]
+
 # -------- Laufzeit-Hilfen --------
-def compile_runtime(reg: Registry) -> Dict[str, Any]:
+def compile_runtime(reg: Registry | Dict[str, CompiledMarker]) -> Dict[str, Any]:
     """Erzeugt schnelle Lookups für composed_of und Regeln."""
-    runtime = {"activation": {}, "composed_of": {}}
+    runtime = {"activation": {}, "composed_of": {}, "programs": {}, "unsupported": {}}
+    if not isinstance(reg, Registry):
+        # bereits kompilierte Marker (load_compiled_markers / Registry.compact)
+        for mid, cm in reg.items():
+            runtime["composed_of"][mid] = list(cm.composed)
+            if cm.rule:
+                runtime["activation"][mid] = cm.rule
+                if cm.program is not None:
+                    runtime["programs"][mid] = cm.program
+                else:
+                    runtime["unsupported"][mid] = f"nicht unterstützte Regel: {cm.rule}"
+        return runtime
     for mid in reg.by_id:
         m = reg.by_id[mid]
-        runtime["composed_of"][mid] = m.get("composed_of", [])
-        rule = (m.get("activation") or {}).get("rule")
+        runtime["composed_of"][mid] = composed_ids(m)
+        rule = rule_of(m)
         if rule:
             runtime["activation"][mid] = rule
+            windows, weights = rule_bindings(m)
+            try:
+                runtime["programs"][mid] = compile_rule(rule, runtime["composed_of"][mid], windows, weights)
+            except RuleSyntaxError as exc:
+                runtime["unsupported"][mid] = str(exc)
     return runtime
 
+# -------- Kompakte Laufzeit-Marker --------
+# Felder, die zur Laufzeit gebraucht werden; alles andere (examples, frame,
+# metadata, Reparatur-Logs …) bleibt in MarkerDocs und wird erst bei Bedarf gelesen.
+RUNTIME_FIELDS = {"id", "pattern", "patterns", "composed_of", "activation", "combination", "window", "scoring",
+                  "negation_guard", "lang", "requires_env", "detect_class"}
+
+# -------- Pattern-Interning --------
+# Dieselben Regex-Quellen stehen in vielen Packs (ALL_Marker_5.1, LD3.4_*,
+# Markers_canonical). Jede Quelle wird auf eine kanonische Form gebracht —
+# führende Inline-Flags wie ``(?i)`` wandern in die Compile-Flags — und pro
+# (Quelle, Flags) genau einmal kompiliert. Alle Marker mit gleichem Pattern
+# teilen sich dasselbe ``re.Pattern``-Objekt.
+
+_INLINE_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+_FLAG_BITS = {"a": re.ASCII, "i": re.IGNORECASE, "L": re.LOCALE, "m": re.MULTILINE,
+              "s": re.DOTALL, "u": 0, "x": re.VERBOSE}
+_PATTERN_POOL: Dict[Tuple[str, int], re.Pattern] = {}
+
+def canonical_pattern(source: str, flags: int = re.IGNORECASE) -> Tuple[str, int]:
+    """(Quelle ohne führende Inline-Flags, Flags inkl. dieser); gleiche Semantik wie ``re.compile(source, flags)``."""
+    m = _INLINE_FLAGS.match(source)
+    while m:
+        for c in m.group(1):
+            flags |= _FLAG_BITS[c]
+        source = source[m.end():]
+        m = _INLINE_FLAGS.match(source)
+    return sys.intern(source), flags & ~re.UNICODE
+
+def intern_pattern(source: str | re.Pattern, flags: int = re.IGNORECASE) -> re.Pattern:
+    """Geteiltes kompiliertes Pattern; ``re.error`` wird weitergereicht."""
+    if isinstance(source, re.Pattern):
+        return source
+    key = canonical_pattern(source, flags)
+    rx = _PATTERN_POOL.get(key)
+    if rx is None:
+        rx = _PATTERN_POOL[key] = re.compile(*key)
+    return rx
+
+def marker_patterns(marker: Dict[str, Any]) -> List[str]:
+    """Regex-Quellen eines Markers: String, Liste, ``{regex: …}`` oder ``{tokens: […]}``."""
+    def collect(p: Any, out: List[str]) -> None:
+        if isinstance(p, str):
+            out.append(p)
+        elif isinstance(p, list):
+            for item in p:
+                collect(item, out)
+        elif isinstance(p, dict):
+            collect(p.get("regex"), out)
+            tokens = [t for t in p.get("tokens") or [] if isinstance(t, str) and t]
+            if tokens:
+                # längste Tokens zuerst, damit Mehrwort-Phrasen gewinnen
+                alt = "|".join(re.escape(t) for t in sorted(tokens, key=len, reverse=True))
+                out.append(rf"(?<!\w)(?:{alt})(?!\w)")
+    out: List[str] = []
+    collect(marker.get("pattern", marker.get("patterns")), out)
+    return out
+
+@dataclass(frozen=True, slots=True)
+class CompiledMarker:
+    id: str
+    type: str                           # ATO | SEM | CLU | MEMA
+    patterns: Tuple[re.Pattern, ...]    # case-insensitive kompiliert
+    composed: Tuple[str, ...]
+    rule: str | None
+    program: Any                        # RuleProgram | RuleExpr | None
+    base: float = 1.0
+    weight: float = 1.0
+    guard: Tuple[str, Tuple[str, ...], int] | None = None  # (Negator-Regex, Signale, Fenster in Tokens)
+    lang: str | None = None             # "de", "en" … oder None = sprachneutral
+    requires_env: Tuple[str, ...] = ()  # nur auswerten, wenn eine dieser Szenen aktiv ist
+    scene: SceneSpec | None = None      # nur SCN-Marker
+
+def negation_guard_of(m: Dict[str, Any]) -> Tuple[str, Tuple[str, ...], int] | None:
+    """``negation_guard`` eines Markers als (Regex, frame.signal, Fenster) oder None."""
+    ng = m.get("negation_guard")
+    if not isinstance(ng, dict) or not isinstance(ng.get("regex"), str):
+        return None
+    frame = m.get("frame") if isinstance(m.get("frame"), dict) else {}
+    signals = tuple(s for s in frame.get("signal") or [] if isinstance(s, str) and s)
+    window = ng.get("window", 3)
+    return sys.intern(ng["regex"]), signals, int(window) if isinstance(window, (int, float)) else 3
+
+# -------- Szenen (SCN) und requires_env --------
+# SCN-Marker beschreiben einen Gesprächskontext (Partnerschaft, Hochzeit …).
+# Eine Szene wird aktiv, wenn ihre Patterns ``min_hits``-mal im Fenster treffen,
+# und läuft nach ``decay`` ohne neuen Treffer aus. Fenster und Decay sind in
+# Nachrichten (``utterances``, ``30 turns``) oder Zeit (``days``, ``14d``) angegeben;
+# ohne Zeitstempel gelten die Nachrichten-Defaults. Marker mit
+# ``requires_env.any_of`` werden nur bei aktiver Szene ausgewertet.
+
+SCENE_ACTIVATION_HITS = 2   # CFG_CONTEXT_GATING_DEFAULTS.scene_activation_hits
+SCENE_WINDOW_TURNS = 20
+SCENE_DECAY_TURNS = 30      # CFG_CONTEXT_GATING_DEFAULTS.scene_decay_turns
+_SCENE_HITS = re.compile(r"hysteresis\s*=\s*(\d+)\s*hits?", re.I)
+_SCENE_DECAY = re.compile(r"decay\s*=\s*(\d+)\s*(turns?|d(?:ays?)?)\b", re.I)
+
+@dataclass(frozen=True, slots=True)
+class SceneSpec:
+    min_hits: int = SCENE_ACTIVATION_HITS
+    window_turns: int = SCENE_WINDOW_TURNS
+    window_seconds: float | None = None
+    decay_turns: int = SCENE_DECAY_TURNS
+    decay_seconds: float | None = None
+
+def scene_spec_of(m: Dict[str, Any]) -> SceneSpec | None:
+    """Aktivierungsparameter eines SCN-Markers aus ``composed_of`` und ``detect_class.rule``."""
+    if not str(m.get("id", "")).startswith("SCN_"):
+        return None
+    comp = m.get("composed_of") if isinstance(m.get("composed_of"), dict) else {}
+    dc = m.get("detect_class") if isinstance(m.get("detect_class"), dict) else {}
+    rule = dc.get("rule") if isinstance(dc.get("rule"), str) else ""
+    kw: Dict[str, Any] = {}
+    hits = _SCENE_HITS.search(rule)
+    if isinstance(comp.get("min_hits"), int):
+        kw["min_hits"] = comp["min_hits"]
+    elif hits:
+        kw["min_hits"] = int(hits.group(1))
+    window = comp.get("window") if isinstance(comp.get("window"), dict) else {}
+    if isinstance(window.get("utterances"), int):
+        kw["window_turns"] = window["utterances"]
+    if isinstance(window.get("days"), (int, float)):
+        kw["window_seconds"] = float(window["days"]) * 86400
+    decay = _SCENE_DECAY.search(rule)
+    if decay and decay.group(2).lower().startswith("t"):
+        kw["decay_turns"] = int(decay.group(1))
+    elif decay:
+        kw["decay_seconds"] = int(decay.group(1)) * 86400.0
+    return SceneSpec(**kw)
+
+def requires_env_of(m: Dict[str, Any]) -> Tuple[str, ...]:
+    env = m.get("requires_env")
+    ids = env.get("any_of") if isinstance(env, dict) else env
+    return tuple(sys.intern(e) for e in ids or () if isinstance(e, str)) if isinstance(ids, list) else ()
+
+def lang_of(m: Dict[str, Any]) -> str | None:
+    lang = m.get("lang")
+    return sys.intern(lang.strip().lower()) if isinstance(lang, str) and lang.strip() else None
+
+def compile_marker(m: Dict[str, Any]) -> CompiledMarker:
+    mid = sys.intern(m["id"])
+    patterns = []
+    for src in marker_patterns(m):
+        try:
+            patterns.append(intern_pattern(src))
+        except re.error:
+            continue  # ungültige Regex meldet validate_spec bzw. das Audit
+    composed = tuple(sys.intern(c) for c in composed_ids(m))
+    rule = rule_of(m)
+    program = None
+    if rule:
+        windows, weights = rule_bindings(m)
+        try:
+            program = compile_rule(rule, composed, windows, weights)
+        except RuleSyntaxError:
+            program = None
+    scoring = m.get("scoring") if isinstance(m.get("scoring"), dict) else {}
+    return CompiledMarker(
+        id=mid,
+        type=sys.intern(mid.split("_", 1)[0]),
+        patterns=tuple(patterns),
+        composed=composed,
+        rule=rule,
+        program=program,
+        base=float(scoring.get("base", 1.0)),
+        weight=float(scoring.get("weight", 1.0)),
+        guard=negation_guard_of(m),
+        lang=lang_of(m),
+        requires_env=requires_env_of(m),
+        scene=scene_spec_of(m),
+    )
+
+class MarkerDocs:
+    """Beispiele und Dokumentation je Marker, lazy aus den Quelldateien gelesen."""
+
+    def __init__(self, sources: Dict[str, Path], cache: YamlCache | None = None, maxsize: int = 256) -> None:
+        self.sources = sources
+        self.cache = cache
+        self.maxsize = maxsize
+        self._recent: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, mid: str) -> Dict[str, Any]:
+        doc = self._recent.pop(mid, None)
+        if doc is None:
+            data = load_markers(self.sources[mid], self.cache) or {}
+            doc = {k: v for k, v in data.items() if k not in RUNTIME_FIELDS}
+            if len(self._recent) >= self.maxsize:
+                self._recent.pop(next(iter(self._recent)))
+        self._recent[mid] = doc
+        return doc
+
+    def examples(self, mid: str) -> List[Any]:
+        ex = self.get(mid).get("examples")
+        return ex if isinstance(ex, list) else []
+
+def load_compiled_markers(root_dir: str, cache: YamlCache | None = None,
+                          workers: int | None = None) -> Tuple[Dict[str, CompiledMarker], MarkerDocs]:
+    """Wie load_all_markers, behält aber nur CompiledMarker; die YAML-Dicts werden verworfen."""
+    if cache is None:
+        cache = default_cache(root_dir)
+    markers: Dict[str, CompiledMarker] = {}
+    sources: Dict[str, Path] = {}
+    for _, path, data in _load_marker_files(Path(root_dir), cache, workers):
+        if isinstance(data, dict) and isinstance(data.get("id"), str):
+            cm = compile_marker(data)
+            markers[cm.id] = cm
+            sources[cm.id] = path
+    if cache is not None:
+        cache.save()
+    return markers, MarkerDocs(sources, cache)
+
+# -------- Streaming-Auswertung --------
+class StreamingActivationEngine:
+    """Inkrementelle Auswertung aller Aktivierungsregeln eines Runtimes.
+
+    Jede Nachricht wird genau einmal hinzugefügt und verlässt jedes Fenster genau
+    einmal; pro Nachricht werden nur die Zähler der Regelblätter angefasst, deren
+    IDs in der eintretenden oder austretenden Nachricht vorkommen. Gleiche Blätter
+    mehrerer Marker teilen sich ein Zählerfenster. ``push`` liefert die Marker,
+    deren Regel auf dem Fenster erfüllt ist, das mit der neuen Nachricht endet.
+
+    Die Auswertung läuft Schicht für Schicht (ATO → SEM → CLU → MEMA): aktive
+    Marker einer Schicht gelten als Teil der Nachricht und werden in die Fenster
+    der höheren Schichten eingetragen, die sie referenzieren. Neu bewertet werden
+    nur Marker, deren Blätter sich dabei geändert haben. Ein Marker sieht also die
+    IDs der Nachricht selbst und die Treffer niedrigerer Schichten — eigene und
+    gleich hohe oder höhere Treffer zählen nie, auch nicht in späteren Nachrichten
+    (Zählerfenster gibt es deshalb je Blatt und Schicht). Das entspricht
+    ``batch_activation.evaluate_activation_batch``.
+    Wie bei ``evaluate_activation`` zählen nur volle Fenster;
+    ``evaluate_activation(rule, comp, msgs[: i + 1])`` entspricht daher dem ODER
+    über die Ergebnisse der Schritte ``0..i``.
+    """
+
+    def __init__(self, runtime: Dict[str, Any], marker_ids: Iterable[str] | None = None,
+                 families: Dict[str, Iterable[str]] | None = None) -> None:
+        """``families``: Familie -> Marker-IDs (``load_families``) für Familien-Zusammenfassungen."""
+        programs = runtime.get("programs") or {}
+        unsupported = runtime.get("unsupported") or {}
+        if marker_ids is None:
+            marker_ids = [mid for mid in runtime["activation"] if mid not in unsupported]
+        ids = marker_ids
+        self.rules: Dict[str, Any] = {}
+        # (Blatt, Schicht) -> Zählerfenster; Schicht je Fenster
+        self._leaves: Dict[Tuple[RuleProgram, int], _RuleWindow] = {}
+        self._layer: Dict[_RuleWindow, int] = {}
+        self._owners: Dict[_RuleWindow, List[str]] = defaultdict(list)
+        # Fenstergröße -> ID -> Blätter, die diese ID zählen
+        self._by_input: Dict[int, Dict[str, List[_RuleWindow]]] = defaultdict(lambda: defaultdict(list))
+        # ANY_X_IN_Y ohne IDs zählt jeden Marker; Fenstergröße -> Blätter
+        self._any_rules: Dict[int, List[_RuleWindow]] = defaultdict(list)
+        # Fenstergröße -> Blätter (werden erfüllbar, sobald das Fenster voll ist)
+        self._by_size: Dict[int, List[_RuleWindow]] = defaultdict(list)
+        for mid in ids:
+            program = programs.get(mid)
+            if program is None:
+                program = compile_rule(runtime["activation"][mid], runtime["composed_of"].get(mid, []))
+            self.rules[mid] = program
+            rank = layer_rank(mid)
+            for leaf in set(program.leaves()):
+                rw = self._leaves.get((leaf, rank))
+                if rw is None:
+                    rw = self._leaves[(leaf, rank)] = _RuleWindow(leaf)
+                    self._layer[rw] = rank
+                    if rw.y > 0:
+                        self._by_size[rw.y].append(rw)
+                        if rw.every:
+                            self._any_rules[rw.y].append(rw)
+                        else:
+                            for c in rw.weights:
+                                self._by_input[rw.y][c].append(rw)
+                self._owners[rw].append(mid)
+        self._windows = sorted(self._by_size)
+        self._rank: Dict[str, int] = {mid: layer_rank(mid) for mid in self.rules}
+        self._ranks = sorted(set(self._rank.values()))
+        max_y = self._windows[-1] if self._windows else 0
+        # je Nachricht (eigene IDs, bei ihrer Auswertung eingetragene Treffer)
+        self._history: deque = deque(maxlen=max_y)
+        self._hits: Set[str] = set()
+        self.seen = 0
+        # Leerlauf: nicht-leere Nachrichten im größten Fenster. Ist das Fenster leer
+        # und keine Regel auf leeren Fenstern erfüllbar, ist push ohne Auswertung fertig.
+        self._live = 0
+        self._idle_safe = not any(_RuleWindow(leaf).satisfied() for leaf, _ in self._leaves)
+        # Familien: Marker -> Familien und je Familie Nachrichten mit Treffern im Fenster
+        self._family_of: Dict[str, Tuple[str, ...]] = {}
+        for fam, members in (families or {}).items():
+            for mid in members:
+                self._family_of[mid] = self._family_of.get(mid, ()) + (fam,)
+        self._family_live: Dict[str, int] = {fam: 0 for fam in families or {}}
+        self._family_history: deque = deque(maxlen=max_y)
+
+    def _leaf_ok(self, leaf: RuleProgram, rank: int) -> bool:
+        rw = self._leaves[(leaf, rank)]
+        return 0 < rw.y <= self.seen and rw.satisfied()
+
+    def reset(self) -> None:
+        for rw in self._leaves.values():
+            rw.counts.clear()
+            rw.covered = 0
+            rw.total = 0
+        self._history.clear()
+        self._hits.clear()
+        self.seen = 0
+        self._live = 0
+        self._family_live = dict.fromkeys(self._family_live, 0)
+        self._family_history.clear()
+
+    def idle(self) -> bool:
+        """Keine Treffer im Fenster und keine offenen Auswertungen."""
+        return self._live == 0 and not self._hits
+
+    def active_families(self) -> Set[str]:
+        """Familien mit mindestens einem Treffer im aktuellen Fenster."""
+        return {fam for fam, n in self._family_live.items() if n}
+
+    def _record(self, raw: FrozenSet[str], lifted: FrozenSet[str]) -> None:
+        history = self._history
+        if not history.maxlen:
+            return
+        if len(history) == history.maxlen and (history[0][0] or history[0][1]):
+            self._live -= 1
+        if raw or lifted:
+            self._live += 1
+        history.append((raw, lifted))
+        if self._family_of:
+            fh = self._family_history
+            if len(fh) == fh.maxlen:
+                for fam in fh[0]:
+                    self._family_live[fam] -= 1
+            fams = {fam for mid in raw | lifted for fam in self._family_of.get(mid, ())} if raw or lifted else ()
+            for fam in fams:
+                self._family_live[fam] += 1
+            fh.append(tuple(fams))
+
+    def _count(self, y: int, ids: Collection[str], sign: int, below: int, touched: Set[_RuleWindow]) -> None:
+        """``ids`` in (sign=1) oder aus (sign=-1) die Fenster der Größe ``y`` oberhalb von Schicht ``below``."""
+        if not ids:
+            return
+        layer = self._layer
+        by_id = self._by_input.get(y)
+        if by_id:
+            for mid in ids:
+                for rw in by_id.get(mid, ()):
+                    if layer[rw] > below:
+                        if sign > 0:
+                            rw.enter(mid)
+                        else:
+                            rw.leave(mid)
+                        touched.add(rw)
+        for rw in self._any_rules.get(y, ()):
+            if layer[rw] > below:
+                rw.total += sign * len(ids)
+                touched.add(rw)
+
+    def _count_lifted(self, y: int, lifted: Iterable[str], sign: int, touched: Set[_RuleWindow]) -> None:
+        by_rank: Dict[int, List[str]] = {}
+        for mid in lifted:
+            by_rank.setdefault(layer_rank(mid), []).append(mid)
+        for rank, ids in by_rank.items():
+            self._count(y, ids, sign, rank, touched)
+
+    def _enter(self, ids: Collection[str], touched: Set[_RuleWindow], below: int = -1) -> None:
+        for y in self._windows:
+            self._count(y, ids, 1, below, touched)
+
+    def _leave(self, touched: Set[_RuleWindow]) -> None:
+        n = len(self._history)
+        for y in self._windows:
+            if n < y:
+                break
+            raw, lifted = self._history[-y]
+            self._count(y, raw, -1, -1, touched)
+            if lifted:
+                self._count_lifted(y, lifted, -1, touched)
+
+    def push(self, msg: Set[str]) -> Set[str]:
+        """Fügt eine Nachricht (Set getriggerter Marker-IDs) hinzu."""
+        if not msg and self._idle_safe and self.idle():
+            # Smalltalk ohne Treffer im Fenster: alle Zähler sind 0, nichts kann feuern
+            self.seen += 1
+            self._record(frozenset(), frozenset())
+            return set()
+        raw = frozenset(msg)
+        touched: Set[_RuleWindow] = set(self._by_size.get(self.seen + 1, ()))
+        self._leave(touched)
+        self.seen += 1
+        self._enter(raw, touched)
+        by_rank: Dict[int, Set[str]] = {}
+        for rw in touched:
+            for mid in self._owners[rw]:
+                by_rank.setdefault(self._rank[mid], set()).add(mid)
+        lifted: Set[str] = set()
+        for rank in self._ranks:
+            # Schicht ohne geänderte Eingaben und ohne aktive Marker: nichts zu tun
+            todo = by_rank.get(rank)
+            if todo:
+                leaf_ok = lambda leaf: self._leaf_ok(leaf, rank)
+                for mid in todo:
+                    if self.rules[mid].holds(leaf_ok):
+                        self._hits.add(mid)
+                    else:
+                        self._hits.discard(mid)
+            if not self._hits:
+                continue
+            # aktive Marker dieser Schicht speisen nur die höheren Schichten
+            up = [mid for mid in self._hits if self._rank[mid] == rank and mid not in raw]
+            if up:
+                lifted.update(up)
+                fresh: Set[_RuleWindow] = set()
+                self._enter(up, fresh, rank)
+                for rw in fresh:
+                    for mid in self._owners[rw]:
+                        by_rank.setdefault(self._rank[mid], set()).add(mid)
+        self._record(raw, frozenset(lifted))
+        return set(self._hits)
+
+    def run(self, messages: Iterable[Set[str]]) -> List[Set[str]]:
+        """Wertet eine Nachrichtenfolge aus und liefert die Treffer je Schritt."""
+        return [self.push(msg) for msg in messages]
+
+    # -------- Zustand sichern --------
+    def snapshot(self) -> Dict[str, Any]:
+        """Kompakter, JSON-tauglicher Zustand: Fenster-Historie (IDs je Nachricht) und aktive Marker.
+
+        Die Zählerfenster sind eine Funktion der Historie und werden nicht gespeichert.
+        """
+        return {"seen": self.seen, "history": [sorted(raw) for raw, _ in self._history],
+                "lifted": [sorted(lifted) for _, lifted in self._history], "hits": sorted(self._hits)}
+
+    def restore(self, snap: Dict[str, Any]) -> None:
+        """Gegenstück zu ``snapshot``; Marker, die es nicht mehr gibt, werden ignoriert."""
+        self.reset()
+        maxlen = self._history.maxlen
+        raws = snap["history"]
+        lifts = snap.get("lifted") or [[] for _ in raws]
+        history = [(frozenset(r), frozenset(l)) for r, l in zip(raws, lifts)][-maxlen:] if maxlen else []
+        for y in self._windows:
+            for raw, lifted in history[-y:]:
+                self._count(y, raw, 1, -1, set())
+                self._count_lifted(y, lifted, 1, set())
+        for raw, lifted in history:
+            self._record(raw, lifted)
+        self.seen = snap["seen"]
+        self._hits = {mid for mid in snap["hits"] if mid in self.rules}
+
 # -------- Beispielnutzung --------
 def demo() -> None:
     spec = load_markers("markers/LEAN_DEEP_MARKERS.yaml")
@@ -270,7 +1510,7 @@ def demo() -> None:
     ]
 
     sem = "SEM_UNCERTAINTY_TONING"
-    ok = evaluate_activation(rt["activation"][sem], rt["composed_of"][sem], msgs)
+    ok = evaluate_activation(rt["programs"][sem], rt["composed_of"][sem], msgs)
     print(f"{sem} aktiviert:", ok)
 
     # Intuition Beispiel
@@ -286,13 +1526,11 @@ def demo() -> None:
         confirm_rule=meta["intuition"]["confirm_rule"],
         ewma_alpha=meta["learning"]["ewma_alpha"],
     )
-    # Streaming-Update
-    composed = rt["composed_of"][clu]
-    rule = rt["activation"][clu]
-    for i in range(len(msgs)):
-        window = msgs[: i + 1]
-        activated = evaluate_activation(rule, composed, window)
-        istate.tick(activated, window, confirm_ids=["SEM_ANGER_ESCALATION"])
+    # Streaming-Update: jede Nachricht wird genau einmal verarbeitet
+    engine = StreamingActivationEngine(rt, [clu])
+    for msg in msgs:
+        activated = clu in engine.push(msg)
+        istate.step(activated, msg, confirm_ids=["SEM_ANGER_ESCALATION"])
         istate.update_ewma(precision=1.0 if activated else 0.0)
     print("INT_CONFLICT:", istate.state, "score=", round(istate.score, 3), "ewma=", round(istate.ewma_precision, 3))
 
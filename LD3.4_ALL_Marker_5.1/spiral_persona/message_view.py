@@ -0,0 +1,112 @@
+from __future__ import annotations
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Tuple
+import re
+import unicodedata
+
+# -------- Nachrichtenansicht --------
+# Eine Nachricht wird genau einmal aufbereitet; ATO-Matcher, Negations-Guards
+# und Nähe-Prüfungen arbeiten alle auf derselben Ansicht:
+#   text       NFKC-normalisiert (Ligaturen, Vollbreite, kompatible Zeichen)
+#   raw_span   rechnet Spans in ``text`` auf die Originalnachricht zurück
+#   lower      Kleinschreibung mit denselben Offsets wie ``text``
+#   tokens     (start, ende) je Wort in ``text``
+#   sentences  (start, ende) je Satz in ``text``
+# Abstände (z. B. Negationsfenster) werden in echten Tokens gemessen.
+
+VIEW_CACHE_SIZE = 1024
+_TOKEN = re.compile(r"\w+(?:['’-]\w+)*")
+_SENTENCE_END = re.compile(r"[.!?…]+(?=\s|$)|\n+")
+_LOWER_FIX = {0x130: "i"}  # İ: str.lower() liefert zwei Zeichen und verschöbe die Offsets
+
+Span = Tuple[int, int]
+
+class MessageView:
+    __slots__ = ("raw", "text", "lower", "tokens", "sentences", "_starts", "_sentence_starts",
+                 "_raw_start", "_raw_end")
+
+    def __init__(self, raw: str) -> None:
+        self.raw = raw
+        # je Zeichen von ``text``: Anfang/Ende des Original-Abschnitts, aus dem es stammt
+        self._raw_start: List[int] | None = None
+        self._raw_end: List[int] | None = None
+        if unicodedata.is_normalized("NFKC", raw):
+            self.text = raw
+        else:
+            self.text = self._normalize(raw)
+        self.lower = self.text.translate(_LOWER_FIX).lower()
+        self.tokens: List[Span] = [m.span() for m in _TOKEN.finditer(self.text)]
+        self._starts = [s for s, _ in self.tokens]
+        self.sentences: List[Span] = []
+        start = 0
+        for m in _SENTENCE_END.finditer(self.text):
+            if self.text[start:m.start()].strip():
+                self.sentences.append((start, m.end()))
+            start = m.end()
+        if self.text[start:].strip():
+            self.sentences.append((start, len(self.text)))
+        self._sentence_starts = [s for s, _ in self.sentences]
+
+    def _normalize(self, raw: str) -> str:
+        # abschnittsweise ab jedem Basiszeichen, damit „…“ -> "..." oder
+        # e + Akzent -> é auf ihre Herkunft zurückgeführt werden können
+        parts: List[str] = []
+        starts: List[int] = []
+        ends: List[int] = []
+        begin = 0
+        for i in range(1, len(raw) + 1):
+            if i < len(raw) and unicodedata.combining(raw[i]):
+                continue
+            norm = unicodedata.normalize("NFKC", raw[begin:i])
+            parts.append(norm)
+            starts.extend([begin] * len(norm))
+            ends.extend([i] * len(norm))
+            begin = i
+        text = "".join(parts)
+        if text != unicodedata.normalize("NFKC", raw):
+            # Komposition über Basiszeichen hinweg (z. B. Halbbreiten-Kana): Original behalten
+            return raw
+        self._raw_start, self._raw_end = starts, ends
+        return text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def raw_span(self, start: int, end: int) -> Span:
+        """Span in ``text`` als Span in ``raw`` (angeschnittene Zeichen zählen ganz)."""
+        if self._raw_start is None:
+            return start, end
+        n = len(self.text)
+        s = self._raw_start[start] if start < n else len(self.raw)
+        e = self._raw_end[end - 1] if end > start else s
+        return s, e
+
+    def __repr__(self) -> str:
+        return f"MessageView({self.raw!r})"
+
+    def words(self) -> List[str]:
+        """Tokens in Kleinschreibung."""
+        lower = self.lower
+        return [lower[s:e] for s, e in self.tokens]
+
+    def token_index(self, offset: int) -> int:
+        """Index des Tokens an ``offset`` (bzw. des letzten davor); -1 vor dem ersten Token."""
+        return bisect_right(self._starts, offset) - 1
+
+    def token_distance(self, a: int, b: int) -> int:
+        """Anzahl Tokens zwischen zwei Zeichenpositionen (0 = dasselbe Token)."""
+        return abs(self.token_index(a) - self.token_index(b))
+
+    def sentence_index(self, offset: int) -> int:
+        return bisect_right(self._sentence_starts, offset) - 1
+
+@lru_cache(maxsize=VIEW_CACHE_SIZE)
+def _cached_view(raw: str) -> MessageView:
+    return MessageView(raw)
+
+def message_view(message: str | MessageView) -> MessageView:
+    """Ansicht für ``message``; wiederholte Nachrichten kommen aus einem LRU-Cache."""
+    if isinstance(message, MessageView):
+        return message
+    return _cached_view(message)
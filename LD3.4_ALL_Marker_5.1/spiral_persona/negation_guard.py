@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Tuple
+import re
+
+from markers_loader import CompiledMarker, negation_guard_of
+from message_view import MessageView, Span, message_view
+
+# -------- Negations-Guard (Laufzeit) --------
+# ``negation_guard`` unterdrückt ATO-Treffer, wenn ein Negator („nicht“, „kein“ …)
+# höchstens ``window`` Tokens vom Signal entfernt steht. Alle Guard- und
+# Signal-Regexe werden einmal beim Aufbau kompiliert; gleiche Guards mehrerer
+# Marker teilen sich einen Detektor. Reine Wortlisten wie ``\b(nicht|kein)\b``
+# werden in einem einzigen Durchlauf über die Tokens der Nachricht gefunden,
+# alles andere per Regex auf der Kleinschreibung. Marker ohne Guard kosten nichts.
+
+_WORD_ALTERNATION = re.compile(r"^(?:\(\?i\))?\\b\((?:\?:)?(\w+(?:\|\w+)*)\)\\b$")
+
+def _word_list(source: str) -> List[str] | None:
+    """Wörter einer reinen Alternation ``\\b(a|b|c)\\b``, sonst None."""
+    m = _WORD_ALTERNATION.match(source)
+    return m.group(1).lower().split("|") if m else None
+
+class NegationGuard:
+    def __init__(self, guards: Dict[str, Tuple[str, Tuple[str, ...], int]]) -> None:
+        """``guards``: Marker-ID -> (Negator-Regex, Signale, Fenster in Tokens)."""
+        detectors: Dict[str, int] = {}
+        self._words: Dict[str, List[int]] = {}          # Token -> Detektoren
+        self._regexes: List[Tuple[int, re.Pattern]] = []  # Detektoren ohne Wortliste
+
+        def detector(source: str) -> int | None:
+            if source in detectors:
+                return detectors[source]
+            words = _word_list(source)
+            if words is None:
+                try:
+                    rx = re.compile(source, re.IGNORECASE)
+                except re.error:
+                    return None
+            did = detectors[source] = len(detectors)
+            if words is None:
+                self._regexes.append((did, rx))
+            else:
+                for w in words:
+                    self._words.setdefault(w, []).append(did)
+            return did
+
+        self.rules: Dict[str, Tuple[int, Tuple[int, ...], int]] = {}
+        for mid, (guard, signals, window) in guards.items():
+            neg = detector(guard)
+            if neg is None:
+                continue
+            sig = []
+            for s in signals:
+                src = rf"\b({s})\b" if re.fullmatch(r"\w+", s) else rf"\b{s}\b"
+                did = detector(src)
+                if did is not None:
+                    sig.append(did)
+            self.rules[mid] = (neg, tuple(sig), window)
+
+    @classmethod
+    def from_markers(cls, markers: Dict[str, Any]) -> "NegationGuard":
+        """Aus CompiledMarker-Records oder rohen Marker-Dicts."""
+        guards = {}
+        for mid, m in markers.items():
+            guard = m.guard if isinstance(m, CompiledMarker) else negation_guard_of(m)
+            if guard is not None:
+                guards[mid] = guard
+        return cls(guards)
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def positions(self, view: MessageView) -> Dict[int, List[int]]:
+        """Detektor -> Token-Indizes seiner Treffer (ein Durchlauf über die Tokens)."""
+        found: Dict[int, List[int]] = {}
+        words = self._words
+        if words:
+            for i, w in enumerate(view.words()):
+                for did in words.get(w, ()):
+                    found.setdefault(did, []).append(i)
+        for did, rx in self._regexes:
+            hits = [view.token_index(m.start()) for m in rx.finditer(view.lower)]
+            if hits:
+                found[did] = hits
+        return found
+
+    def filter(self, message: str | MessageView, hits: Dict[str, List[Span]]) -> Dict[str, List[Span]]:
+        """Treffer ohne die negierten Spans; ``hits`` wie von ``AtoMatcher.match``."""
+        rules = self.rules
+        if not any(mid in rules for mid in hits):
+            return hits
+        view = message_view(message)
+        found = self.positions(view)
+        out: Dict[str, List[Span]] = {}
+        for mid, spans in hits.items():
+            rule = rules.get(mid)
+            negators = found.get(rule[0]) if rule else None
+            if not negators:
+                out[mid] = spans
+                continue
+            signals = sorted({p for did in rule[1] for p in found.get(did, ())})
+            kept = [sp for sp in spans if not _negated(view, sp, negators, signals, rule[2])]
+            if kept:
+                out[mid] = kept
+        return out
+
+def _negated(view: MessageView, span: Span, negators: Iterable[int], signals: List[int], window: int) -> bool:
+    a, b = view.token_index(span[0]), view.token_index(max(span[0], span[1] - 1))
+    anchors = [p for p in signals if a <= p <= b]
+    if anchors:
+        return any(abs(n - p) <= window for n in negators for p in anchors)
+    # Signal nicht im Treffer: Abstand zum Treffer selbst zählt
+    return any(max(a - n, n - b, 0) <= window for n in negators)
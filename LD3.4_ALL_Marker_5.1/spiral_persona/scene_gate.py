@@ -0,0 +1,112 @@
+from __future__ import annotations
+from collections import deque
+from typing import Any, Deque, Dict, FrozenSet, List, Tuple
+import re
+
+from ato_matcher import AtoMatcher, Span
+from markers_loader import CompiledMarker, SceneSpec
+from message_view import MessageView, message_view
+
+# -------- Kontext-Gating über Szenen --------
+# Pro Nachricht werden zuerst die SCN-Marker ausgewertet und der Szenenzustand
+# des Gesprächs fortgeschrieben; danach laufen nur die ATO-Patterns, deren
+# ``requires_env`` erfüllt ist. Für jede Menge aktiver Szenen wird ein eigener
+# AtoMatcher gebaut und gecacht — gegatete Patterns kosten bei inaktiver Szene
+# also nichts. Szenenwechsel sind selten, der Cache bleibt klein.
+
+def _within(turns: int, seconds: float | None, age_turns: int, age_seconds: float | None) -> bool:
+    if seconds is not None and age_seconds is not None:
+        return age_seconds <= seconds
+    return age_turns < turns
+
+class SceneState:
+    """Szenenzustand eines Gesprächs."""
+    __slots__ = ("turn", "active", "_hits", "_last")
+
+    def __init__(self) -> None:
+        self.turn = -1
+        self.active: FrozenSet[str] = frozenset()
+        self._hits: Dict[str, Deque[Tuple[int, float | None, int]]] = {}
+        self._last: Dict[str, Tuple[int, float | None]] = {}
+
+    def advance(self, scenes: Dict[str, SceneSpec], hits: Dict[str, int], ts: float | None = None) -> FrozenSet[str]:
+        """Nächste Nachricht mit ``hits`` (Szene -> Trefferzahl); liefert die aktiven Szenen."""
+        self.turn += 1
+        t = self.turn
+        active = set(self.active)
+        for sid, n in hits.items():
+            spec = scenes[sid]
+            q = self._hits.setdefault(sid, deque())
+            q.append((t, ts, n))
+            while q and not _within(spec.window_turns, spec.window_seconds, t - q[0][0],
+                                    None if ts is None or q[0][1] is None else ts - q[0][1]):
+                q.popleft()
+            self._last[sid] = (t, ts)
+            if sid in active or sum(e[2] for e in q) >= spec.min_hits:
+                active.add(sid)
+        for sid in list(active):
+            if sid in hits:
+                continue
+            spec = scenes[sid]
+            lt, lts = self._last[sid]
+            age_seconds = None if ts is None or lts is None else ts - lts
+            if not _within(spec.decay_turns, spec.decay_seconds, t - lt, age_seconds):
+                active.discard(sid)
+                self._hits.pop(sid, None)
+        if active != self.active:
+            self.active = frozenset(active)
+        return self.active
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"turn": self.turn, "active": sorted(self.active),
+                "hits": {sid: [list(e) for e in q] for sid, q in self._hits.items()},
+                "last": {sid: list(v) for sid, v in self._last.items()}}
+
+    def restore(self, snap: Dict[str, Any]) -> None:
+        self.turn = snap["turn"]
+        self.active = frozenset(snap["active"])
+        self._hits = {sid: deque(tuple(e) for e in q) for sid, q in snap["hits"].items()}
+        self._last = {sid: tuple(v) for sid, v in snap["last"].items()}
+
+class ContextGate:
+    def __init__(self, markers: Dict[str, CompiledMarker], prefix: str = "ATO_") -> None:
+        self.scenes: Dict[str, SceneSpec] = {mid: cm.scene for mid, cm in markers.items() if cm.scene is not None}
+        self.scene_matcher = AtoMatcher((mid, rx) for mid in self.scenes for rx in markers[mid].patterns)
+        self._ungated: List[Tuple[str, re.Pattern]] = []
+        self._gated: List[Tuple[str, re.Pattern, FrozenSet[str]]] = []
+        self.requires: Dict[str, FrozenSet[str]] = {}
+        for mid, cm in markers.items():
+            if cm.requires_env:
+                self.requires[mid] = frozenset(cm.requires_env)
+            if not mid.startswith(prefix):
+                continue
+            for rx in cm.patterns:
+                if cm.requires_env:
+                    self._gated.append((mid, rx, self.requires[mid]))
+                else:
+                    self._ungated.append((mid, rx))
+        self._matchers: Dict[FrozenSet[str], AtoMatcher] = {}
+
+    def matcher(self, active: FrozenSet[str]) -> AtoMatcher:
+        """AtoMatcher über die ungegateten und die durch ``active`` freigeschalteten Patterns."""
+        key = frozenset(s for s in active if any(s in env for _, _, env in self._gated))
+        m = self._matchers.get(key)
+        if m is None:
+            m = self._matchers[key] = AtoMatcher(
+                self._ungated + [(mid, rx) for mid, rx, env in self._gated if env & key]
+            )
+        return m
+
+    def allowed(self, mid: str, active: FrozenSet[str]) -> bool:
+        """Für Marker höherer Schichten: ``requires_env`` erfüllt (oder keins gesetzt)?"""
+        env = self.requires.get(mid)
+        return env is None or bool(env & active)
+
+    def match(self, state: SceneState, message: str | MessageView, ts: float | None = None) -> Dict[str, List[Span]]:
+        """Szenen fortschreiben, dann die freigeschalteten ATOs matchen; SCN-Treffer sind enthalten."""
+        view = message_view(message)
+        scene_hits = self.scene_matcher.match(view) if self.scenes else {}
+        active = state.advance(self.scenes, {sid: len(sp) for sid, sp in scene_hits.items()}, ts)
+        hits = self.matcher(active).match(view)
+        hits.update(scene_hits)
+        return hits
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Tuple
+import gc
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import zlib
+
+from checkpoint import CHECKPOINT_INTERVAL, Checkpointer
+from conversation_store import MAX_LIVE, ConversationStore
+from marker_engine import MarkerEngine
+
+# -------- Sharded Ausführung --------
+# Ein Prozess schafft die Spitzenlast wegen des GIL nicht. ``conversation_id``
+# wird stabil (crc32) auf N Worker-Prozesse verteilt; jeder Worker hält die
+# Fensterzustände seiner Gespräche und arbeitet seine Eingangsqueue der Reihe
+# nach ab — die Reihenfolge innerhalb eines Gesprächs bleibt so erhalten.
+# Mit ``fork`` wird die im Elternprozess geladene Engine vererbt (copy-on-write,
+# vorher ``gc.freeze``, damit der Zyklus-GC die geteilten Seiten nicht anfasst);
+# ohne ``fork`` lädt jeder Worker die Registry einmal selbst.
+
+MAX_DEPTH = 1024   # offene Nachrichten je Shard, darüber blockiert submit
+
+def shard_of(conversation_id: str, shards: int) -> int:
+    """Stabil über Prozesse und Neustarts (``hash()`` ist pro Prozess gesalzen)."""
+    return zlib.crc32(conversation_id.encode("utf-8")) % shards
+
+def _shard_main(engine: MarkerEngine | None, root_dir: str | None, inbox, outbox,
+                state_path: str | None, max_live: int, ttl: float | None,
+                checkpoint_path: str | None, checkpoint_interval: float) -> None:
+    if engine is None:
+        engine = MarkerEngine.load(root_dir)
+    conversations = ConversationStore(engine, state_path, max_live, ttl)
+    checkpointer = None
+    if checkpoint_path:
+        checkpointer = Checkpointer(conversations, checkpoint_path, interval=checkpoint_interval)
+        checkpointer.recover()
+    for batch in iter(inbox.get, None):
+        out = []
+        for token, cid, text, ts in batch:
+            try:
+                if text is None:
+                    conversations.drop(cid)
+                    out.append((token, True, {"conversation_id": cid, "ended": True}))
+                    continue
+                conv = conversations.get(cid)
+                result = engine.analyze(text, conv, ts)
+                out.append((token, True, {"conversation_id": cid, "seq": conv.seen, **result.to_dict()}))
+            except Exception as exc:
+                out.append((token, False, f"{type(exc).__name__}: {exc}"))
+        outbox.put(out)
+        if checkpointer is not None:
+            checkpointer.maybe_checkpoint()
+    if checkpointer is not None:
+        checkpointer.close()
+    conversations.close()
+
+class ShardedExecutor:
+    def __init__(self, engine: MarkerEngine | None = None, root_dir: str | None = None,
+                 shards: int | None = None, max_depth: int = MAX_DEPTH, start_method: str | None = None,
+                 state_dir: str | None = None, max_live: int = MAX_LIVE, ttl: float | None = None,
+                 checkpoint_interval: float | None = CHECKPOINT_INTERVAL) -> None:
+        """``engine`` wird per ``fork`` geteilt; sonst (oder ohne ``engine``) lädt jeder Worker ``root_dir``.
+
+        ``state_dir``: je Shard eine SQLite-Datei für ausgelagerte Gespräche (``ConversationStore``)
+        und ein Checkpoint-Log (``checkpoint_interval=None`` schaltet Checkpoints ab). Da
+        ``shard_of`` stabil ist, findet jeder Worker nach einem Neustart seine Gespräche wieder.
+        Ohne ``state_dir`` lagert jeder Worker in eine temporäre Datei aus. ``max_live`` gilt je
+        Shard (``conversation_store.max_live_for`` rechnet ein Speicherbudget um).
+        """
+        if engine is None and root_dir is None:
+            raise ValueError("engine oder root_dir angeben")
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        if start_method != "fork" and root_dir is None:
+            raise ValueError(f"root_dir nötig für start_method={start_method!r}")
+        ctx = mp.get_context(start_method)
+        self.shards = shards or os.cpu_count() or 1
+        self.max_depth = max_depth
+        self._tokens = itertools.count()
+        self._futures: Dict[int, Tuple[int, Future]] = {}
+        self._lock = threading.Lock()
+        self._room = [threading.BoundedSemaphore(max_depth) for _ in range(self.shards)]
+        self.depth = [0] * self.shards
+        self.peak = [0] * self.shards
+        self.processed = [0] * self.shards
+        self._outbox = ctx.Queue()
+        self._inboxes = [ctx.Queue() for _ in range(self.shards)]
+        shared = engine if start_method == "fork" else None
+        if shared is not None:
+            gc.freeze()
+        self._workers = [
+            ctx.Process(target=_shard_main, daemon=True, args=(
+                shared, root_dir, inbox, self._outbox,
+                os.path.join(state_dir, f"shard-{i}.sqlite") if state_dir else None, max_live, ttl,
+                os.path.join(state_dir, f"shard-{i}.ckpt") if state_dir and checkpoint_interval is not None else None,
+                checkpoint_interval or 0.0))
+            for i, inbox in enumerate(self._inboxes)
+        ]
+        for w in self._workers:
+            w.start()
+        if shared is not None:
+            gc.unfreeze()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    # -------- Ein- und Ausgang --------
+    def submit_many(self, items: Iterable[Tuple[str, str | None, float | None]]) -> List[Future]:
+        """(conversation_id, Text oder None = Gespräch beenden, Zeitstempel); ein IPC-Paket je Shard."""
+        batches: Dict[int, List[Tuple[int, str, str | None, float | None]]] = {}
+        futures: List[Future] = []
+        for cid, text, ts in items:
+            shard = shard_of(cid, self.shards)
+            if not self._room[shard].acquire(blocking=False):
+                # Shard voll: Angesammeltes erst abschicken, sonst wartet submit auf sich selbst
+                if shard in batches:
+                    self._inboxes[shard].put(batches.pop(shard))
+                self._room[shard].acquire()
+            fut: Future = Future()
+            token = next(self._tokens)
+            with self._lock:
+                self._futures[token] = (shard, fut)
+                self.depth[shard] += 1
+                self.peak[shard] = max(self.peak[shard], self.depth[shard])
+            batches.setdefault(shard, []).append((token, cid, text, ts))
+            futures.append(fut)
+            if len(batches[shard]) >= 64:
+                self._inboxes[shard].put(batches.pop(shard))
+        for shard, batch in batches.items():
+            self._inboxes[shard].put(batch)
+        return futures
+
+    def submit(self, conversation_id: str, text: str, ts: float | None = None) -> Future:
+        return self.submit_many([(conversation_id, text, ts)])[0]
+
+    def end(self, conversation_id: str) -> Future:
+        """Gesprächszustand im zuständigen Worker verwerfen."""
+        return self.submit_many([(conversation_id, None, None)])[0]
+
+    def _collect(self) -> None:
+        for out in iter(self._outbox.get, None):
+            for token, ok, payload in out:
+                with self._lock:
+                    shard, fut = self._futures.pop(token)
+                    self.depth[shard] -= 1
+                    self.processed[shard] += 1
+                self._room[shard].release()
+                if ok:
+                    fut.set_result(payload)
+                else:
+                    fut.set_exception(RuntimeError(payload))
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        """Je Shard: offene Nachrichten, Höchststand, verarbeitet, Worker lebt."""
+        with self._lock:
+            return [{"shard": i, "depth": self.depth[i], "peak_depth": self.peak[i],
+                     "processed": self.processed[i], "alive": self._workers[i].is_alive()}
+                    for i in range(self.shards)]
+
+    def close(self) -> None:
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for w in self._workers:
+            w.join()
+        self._outbox.put(None)
+        self._collector.join()
+
+    def __enter__(self) -> "ShardedExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Any, Dict
 import time
 
 @dataclass
@@ -33,6 +33,15 @@ class Telemetry:
         return {**{k: v.value for k, v in self.counters.items()},
                 **{k: v.value for k, v in self.ewhm.items()}}
 
+    def state(self) -> Dict[str, Dict[str, Any]]:
+        """Vollständiger Zustand inkl. EWMA-Alpha (für Checkpoints)."""
+        return {"counters": {k: v.value for k, v in self.counters.items()},
+                "ewma": {k: [v.alpha, v.value] for k, v in self.ewhm.items()}}
+
+    def restore(self, state: Dict[str, Dict[str, Any]]) -> None:
+        self.counters = {k: Counter(v) for k, v in state.get("counters", {}).items()}
+        self.ewhm = {k: EWMA(alpha=a, value=v) for k, (a, v) in state.get("ewma", {}).items()}
+
     def emit(self, sink=print) -> None:
         ts = int(time.time())
         sink({"ts": ts, **self.snapshot()})
@@ -0,0 +1,111 @@
+import random
+import re
+import pytest
+from ato_matcher import AtoMatcher, KeywordAutomaton, required_literals
+
+PATTERNS = [
+    ("ATO_ABSOLUTIZER", r"(?i)\bimmer\b"),
+    ("ATO_ABSOLUTIZER", r"(?i)\bnie\b"),
+    ("ATO_ABSOLUTIZER", r"(?i)\bauf\s+jeden\s+fall\b"),
+    ("ATO_DELAY", r"\b(später|morgen|bald)\b"),
+    ("ATO_TIME", r"\b(heute|morgen|immer)\b"),
+    ("ATO_REPEAT", r"\b(\w+) \1\b"),
+    ("ATO_BROKEN", r"(unclosed"),
+    ("ATO_DOTS", r"…|\.\.\."),
+] + [(f"ATO_FILL_{i}", rf"\bwort{i}\b") for i in range(40)]
+
+WORDS = ["ſpäter", "NİE", "immer", "nie", "auf", "jeden", "fall", "später", "Morgen", "bald", "heute", "ja", "ja",
+         "...", "…", "wort3", "wort17", "wort39", "Niemals", "immerhin", "x"]
+
+def _naive(text):
+    out = {}
+    for mid, src in PATTERNS:
+        try:
+            rx = re.compile(src, re.I)
+        except re.error:
+            continue
+        spans = [m.span() for m in rx.finditer(text)]
+        if spans:
+            out.setdefault(mid, []).extend(spans)
+    return {mid: sorted(spans) for mid, spans in out.items()}
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matcher_equals_individual_scans(seed):
+    rnd = random.Random(seed)
+    text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 25)))
+    matcher = AtoMatcher(PATTERNS)
+    assert matcher.match(text) == _naive(text)
+    assert matcher.hit_ids(text) == set(_naive(text))
+
+def test_counts_and_overlapping_markers():
+    matcher = AtoMatcher(PATTERNS)
+    counts = matcher.counts("Immer morgen, nie heute. ja ja")
+    assert counts["ATO_ABSOLUTIZER"] == 2
+    assert counts["ATO_DELAY"] == 1 and counts["ATO_TIME"] == 3
+    assert counts["ATO_REPEAT"] == 1
+    assert "ATO_BROKEN" not in {mid for mid, _ in matcher.compiled}
+
+@pytest.mark.parametrize("source, expected", [
+    (r"(?i)\bimmer\b", {"immer"}),
+    (r"\bauf\s+jeden\s+fall\b", {"jeden"}),
+    (r"\b(später|Morgen|bald)\b", {"später", "morgen", "bald"}),
+    (r"(ab|cd)?xyz", {"xyz"}),
+    (r"(?:nie)+mals", {"mals"}),
+    (r"\w+", None),
+    (r"(foo|\d+)", None),
+    (r"(?=immer)\w+", None),
+])
+def test_required_literals(source, expected):
+    got = required_literals(source, re.I)
+    assert (set(got) if got is not None else None) == expected
+
+def test_keyword_automaton_finds_overlaps():
+    auto = KeywordAutomaton(["he", "she", "his", "hers"])
+    assert auto.find("ushers") == {0, 1, 3}
+    assert auto.find("xyz") == set()
+
+def test_prefilter_respects_re_case_folding():
+    matcher = AtoMatcher([("ATO_S", r"\bspäter\b"), ("ATO_I", r"\bnie\b")])
+    assert matcher.hit_ids("ſPÄTER") == {"ATO_S"}
+    assert matcher.hit_ids("NİE oder nıe") == {"ATO_I"}
+
+def test_identical_patterns_are_interned_and_fanned_out():
+    matcher = AtoMatcher([
+        ("ATO_A", r"(?i)\bimmer\b"),
+        ("ATO_B", r"\bimmer\b"),
+        ("ATO_A", r"\bimmer\b"),
+        ("ATO_C", r"(?m)^ja$"),
+    ])
+    assert len(matcher.compiled) == 4 and len(matcher.unique) == 2
+    assert matcher.compiled[0][1] is matcher.compiled[1][1]
+    hits = matcher.match("Immer\nja")
+    assert hits == {"ATO_A": [(0, 5), (0, 5)], "ATO_B": [(0, 5)], "ATO_C": [(6, 8)]}
+
+def test_match_records_reference_the_message():
+    matcher = AtoMatcher(PATTERNS)
+    text = "Immer morgen, nie heute."
+    rec = matcher.records(text)
+    assert rec.text is text and rec.ids.typecode == "I"
+    assert [(rec.marker(i), rec.snippet(i)) for i in range(len(rec))] == [
+        ("ATO_ABSOLUTIZER", "Immer"), ("ATO_TIME", "Immer"),
+        ("ATO_DELAY", "morgen"), ("ATO_TIME", "morgen"),
+        ("ATO_ABSOLUTIZER", "nie"), ("ATO_TIME", "heute"),
+    ]
+    assert rec.counts() == matcher.counts(text)
+    assert rec.spans("ATO_TIME") == matcher.match(text)["ATO_TIME"]
+    assert rec.highlight() == "[Immer] [morgen], [nie] [heute]."
+    assert rec.to_rows()[2] == {"marker": "ATO_DELAY", "start": 6, "end": 12, "text": "morgen"}
+
+def test_match_records_use_external_index():
+    matcher = AtoMatcher(PATTERNS)
+    names = ["ATO_X", "ATO_DELAY"]
+    rec = matcher.records("bald", index={"ATO_DELAY": 1}, names=names)
+    assert list(rec) == [(1, 0, 4)] and rec.marker(0) == "ATO_DELAY"
+
+def test_match_records_offsets_refer_to_raw_message():
+    from message_view import message_view
+    raw = "Naja… vielleicht… ich weiß nicht, ob ich das schaffe"
+    rec = AtoMatcher([("ATO_HEDGE", r"\bvielleicht\b")]).records(message_view(raw))
+    assert rec.text is raw and rec.to_rows() == [
+        {"marker": "ATO_HEDGE", "start": 6, "end": 16, "text": "vielleicht"}]
+    assert rec.highlight() == "Naja… [vielleicht]… ich weiß nicht, ob ich das schaffe"
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batch_activation import evaluate_activation_batch, to_matrix
+from markers_loader import StreamingActivationEngine
+from test_streaming_activation import (
+    IDS, LAYERED, RUNTIME, SAME_LAYER, _random_chat, layered_reference, random_runtime,
+)
+
+@pytest.mark.parametrize("runtime", [RUNTIME, LAYERED, SAME_LAYER], ids=["flat", "layered", "same-layer"])
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_streaming(runtime, seed):
+    index = {mid: i for i, mid in enumerate(IDS + [m for m in runtime["activation"] if m not in IDS])}
+    msgs = _random_chat(seed, 40)
+    ids, result = evaluate_activation_batch(runtime, to_matrix(msgs, index), index)
+    steps = StreamingActivationEngine(runtime).run(msgs)
+    for i, active in enumerate(steps):
+        assert {mid for j, mid in enumerate(ids) if result[i, j]} == active, i
+
+def test_batch_returns_every_position():
+    index = {"ATO_A": 0, "ATO_B": 1}
+    rt = {"activation": {"SEM_P": "BOTH IN 2 messages"}, "composed_of": {"SEM_P": ["ATO_A", "ATO_B"]}}
+    msgs = [{"ATO_A"}, {"ATO_B"}, set(), {"ATO_A", "ATO_B"}]
+    ids, result = evaluate_activation_batch(rt, to_matrix(msgs, index), index)
+    assert ids == ["SEM_P"]
+    assert result[:, 0].tolist() == [False, True, False, True]
+
+def test_batch_same_layer_hits_are_not_inputs():
+    index = {mid: i for i, mid in enumerate(["ATO_A", "ATO_B", "ATO_C", "SEM_P", "CLU_Q", "CLU_R", "CLU_S", "MEMA_T"])}
+    msgs = [{"ATO_A", "ATO_B"}] * 3 + [set(), set()]
+    ids, result = evaluate_activation_batch(SAME_LAYER, to_matrix(msgs, index), index)
+    col = {mid: result[:, j].tolist() for j, mid in enumerate(ids)}
+    assert col["CLU_Q"] == col["MEMA_T"] == [True, True, True, False, False]
+    assert col["CLU_R"] == [False] * 5
+    assert col["CLU_S"] == [False, True, True, True, False]
+
+def test_batch_activation_expires_with_its_window():
+    index = {"ATO_A": 0, "ATO_X": 1}
+    rt = {"activation": {"ATO_X": "ANY 1 IN 3 messages"}, "composed_of": {"ATO_X": []}}
+    ids, result = evaluate_activation_batch(rt, to_matrix([{"ATO_A"}] + [set()] * 8, index), index)
+    assert result[:, 0].tolist() == [False, False, True] + [False] * 6
+
+@pytest.mark.parametrize("seed", range(30))
+def test_batch_matches_reference_and_streaming_on_random_rules(seed):
+    runtime = random_runtime(seed)
+    ids = ["ATO_A", "ATO_B", "ATO_C"] + list(runtime["activation"])
+    index = {mid: i for i, mid in enumerate(ids)}
+    rnd = random.Random(seed)
+    msgs = [{mid for mid in ("ATO_A", "ATO_B", "ATO_C") if rnd.random() < 0.3} for _ in range(30)] + [set()] * 6
+    got, result = evaluate_activation_batch(runtime, to_matrix(msgs, index), index)
+    batch = [{mid for j, mid in enumerate(got) if result[i, j]} for i in range(len(msgs))]
+    assert batch == layered_reference(runtime, msgs)
+    assert batch == StreamingActivationEngine(runtime).run(msgs)
+
+def test_window_counts_cumulate_only_read_columns():
+    from batch_activation import _WindowCounts
+    matrix = to_matrix([{"ATO_A"}, {"ATO_C"}, {"ATO_A", "ATO_B"}], {"ATO_A": 0, "ATO_B": 1, "ATO_C": 2})
+    counts = _WindowCounts(matrix, {0, 2})
+    assert counts.cum.shape == (4, 2)
+    assert counts.columns(2, [2, 0]).tolist() == [[1, 1], [1, 1]]
+    assert counts.rows(3).tolist() == [4]
@@ -0,0 +1,44 @@
+import os
+
+from checkpoint import Checkpointer, read_log
+from conversation_store import ConversationStore
+from telemetry import Telemetry
+from test_conversation_store import TEXTS
+from test_marker_server import _engine
+
+def test_restart_resumes_from_checkpoint(tmp_path):
+    engine = _engine()
+    path = str(tmp_path / "state.ckpt")
+    store = ConversationStore(engine, max_live=1)
+    tele = Telemetry()
+    ckpt = Checkpointer(store, path, tele, interval=0)
+    reference = {cid: engine.conversation() for cid in "ab"}
+    for text in TEXTS[:4]:
+        for cid in "ab":
+            engine.analyze(text, store.get(cid))
+            engine.analyze(text, reference[cid])
+            tele.inc("messages")
+            ckpt.maybe_checkpoint()
+    store.drop("b")
+    ckpt.checkpoint()
+    with open(path, "ab") as f:  # Absturz mitten im nächsten Record
+        f.write(b"\x40\x00\x00\x00\x01\x02")
+    size = os.path.getsize(path)
+
+    store2, tele2 = ConversationStore(engine), Telemetry()
+    ckpt2 = Checkpointer(store2, path, tele2)
+    assert ckpt2.recover() == 1
+    assert os.path.getsize(path) == size - 6
+    assert tele2.snapshot() == {"messages": 8} and "b" not in store2
+    conv = store2.get("a")
+    assert conv.seen == 4
+    for text in TEXTS[4:]:
+        assert engine.analyze(text, conv).to_dict() == engine.analyze(text, reference["a"]).to_dict()
+
+    ckpt2.checkpoint()
+    before = sum(1 for _ in read_log(path))
+    ckpt2.compact()
+    assert sorted(cid for _, _, cid, _ in read_log(path)) == ["", "a"] and before > 2
+    store3 = ConversationStore(engine)
+    Checkpointer(store3, path).recover()
+    assert store3.get("a").snapshot() == conv.snapshot()
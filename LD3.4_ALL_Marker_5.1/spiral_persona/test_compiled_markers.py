@@ -0,0 +1,50 @@
+import re
+import pytest
+from markers_loader import (
+    CompiledMarker,
+    Registry,
+    canonical_pattern,
+    compile_marker,
+    compile_runtime,
+    intern_pattern,
+    load_all_markers,
+    load_compiled_markers,
+)
+
+def test_compiled_marker_is_compact():
+    cm = compile_marker({
+        "id": "ATO_X",
+        "pattern": {"tokens": ["immer du", "immer"]},
+        "examples": ["immer du"],
+        "scoring": {"base": 0.5, "weight": 2},
+    })
+    assert not hasattr(cm, "__dict__")
+    assert (cm.type, cm.base, cm.weight) == ("ATO", 0.5, 2.0)
+    assert cm.patterns[0].search("IMMER DU wieder").group(0) == "IMMER DU"
+    assert cm.patterns[0].search("immerzu") is None
+    with pytest.raises(AttributeError):
+        cm.id = "ATO_Y"
+
+def test_compiled_runtime_matches_registry_runtime():
+    markers, docs = load_compiled_markers("spiral_persona")
+    assert all(isinstance(cm, CompiledMarker) for cm in markers.values())
+    reg_rt = compile_runtime(Registry.build(load_all_markers("spiral_persona")))
+    rt = compile_runtime(markers)
+    assert rt["programs"] == reg_rt["programs"]
+    assert set(rt["unsupported"]) == set(reg_rt["unsupported"])
+    sem = next(mid for mid in markers if mid.startswith("SEM_"))
+    assert "id" not in docs.get(sem)
+    assert docs.examples(sem) == docs.get(sem).get("examples", [])
+
+def test_patterns_are_interned_across_markers():
+    assert canonical_pattern(r"(?i)(?s)\bja\b") == (r"\bja\b", re.I | re.S)
+    a = compile_marker({"id": "ATO_A", "pattern": [r"(?i)\bnie\b"]})
+    b = compile_marker({"id": "ATO_B", "pattern": {"regex": r"\bnie\b"}})
+    assert a.patterns[0] is b.patterns[0] is intern_pattern(r"\bnie\b")
+
+def test_load_families_from_repo():
+    from pathlib import Path
+    from markers_loader import load_families
+    fams = load_families(Path(__file__).resolve().parent.parent / "markers" / "families.json")
+    assert "ATO_JOY_EXPRESSION" in fams["positive_affect"]
+    assert "SEM_EMOTIONAL_ACCEPTANCE" in fams["affect_regulation"]
@@ -0,0 +1,41 @@
+import os
+
+from conversation_store import LIVE_BYTES, MAX_LIVE, MEMORY_MB, ConversationStore, max_live_for
+from test_marker_server import _engine
+
+TEXTS = ["später", "vielleicht", "nichts", "vielleicht", "später", "nichts"]
+
+def test_store_spills_and_rehydrates(tmp_path):
+    engine = _engine()
+    now = [0.0]
+    store = ConversationStore(engine, str(tmp_path / "state.sqlite"), max_live=2, ttl=10, clock=lambda: now[0])
+    reference = {cid: engine.conversation() for cid in "abc"}
+    for step, text in enumerate(TEXTS):
+        for cid in "abc":
+            now[0] += 1
+            got = engine.analyze(text, store.get(cid)).to_dict()
+            assert got == engine.analyze(text, reference[cid]).to_dict(), (step, cid)
+            assert len(store) <= 2
+    assert store.stats["rehydrated"] > 0 and "a" in store
+    now[0] += 60
+    assert store.evict_idle() == 2 and len(store) == 0 and store.spilled == 3
+    store.drop("a")
+    assert "a" not in store and store.get("b").seen == len(TEXTS)
+    store.close()
+    reopened = ConversationStore(engine, str(tmp_path / "state.sqlite"))
+    assert reopened.get("c").seen == len(TEXTS) and reopened.stats["rehydrated"] == 1
+
+def test_default_store_spills_to_temporary_file():
+    engine = _engine()
+    store = ConversationStore(engine, max_live=1)
+    assert store.path != ":memory:" and os.path.exists(store.path)
+    for cid in "ab":
+        engine.analyze("später", store.get(cid))
+    assert store.spilled == 1 and os.path.getsize(store.path) > 0
+    store.close()
+    assert not os.path.exists(os.path.dirname(store.path))
+
+def test_max_live_from_memory_budget():
+    assert max_live_for(LIVE_BYTES / (1 << 20)) == 1
+    assert max_live_for(0) == 1
+    assert MAX_LIVE == max_live_for(MEMORY_MB)
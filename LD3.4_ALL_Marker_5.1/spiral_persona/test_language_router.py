@@ -0,0 +1,37 @@
+from language_router import STOPWORDS, RoutedAtoMatcher, detect_language
+from markers_loader import compile_marker
+
+MARKERS = [
+    {"id": "ATO_NEVER_DE", "lang": "de", "pattern": [r"\bnie\b"]},
+    {"id": "ATO_NEVER_EN", "lang": "en", "pattern": [r"\bnever\b"]},
+    {"id": "ATO_OK", "pattern": [r"\bok\b"]},
+]
+
+def test_detect_language():
+    assert detect_language("Ich weiß nicht, ob ich das schaffe.") == "de"
+    assert detect_language("I don't think this is working for me") == "en"
+    assert detect_language("ok") is None
+    assert detect_language("Das ist so nice, I love it") is None
+
+def test_homographs_do_not_route_short_messages():
+    shared = {"am", "an", "so", "was", "in", "will", "also", "man", "hat", "die", "war", "bin"}
+    assert not shared & (STOPWORDS["de"] | STOPWORDS["en"])
+    for text in ("Will in Hamburg", "Man in black hat", "Also war die Party gut", "Bin da"):
+        assert detect_language(text) is None, text
+    routed = RoutedAtoMatcher.from_markers({m["id"]: compile_marker(m) for m in MARKERS})
+    assert routed.hit_ids("Will in Hamburg nie") == {"ATO_NEVER_DE"}
+    assert routed.hit_ids("Man in black hat, never") == {"ATO_NEVER_EN"}
+
+def test_routed_matcher_scans_only_the_detected_partition():
+    compiled = {m["id"]: compile_marker(m) for m in MARKERS}
+    routed = RoutedAtoMatcher.from_markers(compiled)
+    assert set(routed.partitions) == {"de", "en"}
+    assert len(routed.partitions["de"].unique) == 2
+    assert routed.hit_ids("ok, ich will das nie wieder, never") == {"ATO_NEVER_DE", "ATO_OK"}
+    assert routed.hit_ids("ok, I will never do it, nie") == {"ATO_NEVER_EN", "ATO_OK"}
+    # unklare Sprache: alle Patterns
+    assert routed.hit_ids("nie never ok") == {"ATO_NEVER_DE", "ATO_NEVER_EN", "ATO_OK"}
+
+def test_raw_marker_dicts_are_accepted():
+    routed = RoutedAtoMatcher.from_markers({m["id"]: m for m in MARKERS})
+    assert routed.counts("I never said that, never") == {"ATO_NEVER_EN": 2}
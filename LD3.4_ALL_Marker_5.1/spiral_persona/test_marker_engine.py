@@ -0,0 +1,75 @@
+from marker_engine import MarkerEngine
+from markers_loader import compile_marker
+
+MSGS = ["Ich weiß nicht, vielleicht später.", "Du bist immer so!", "Das ist deine Schuld.",
+        "Ich vertraue dir.", "ok"] * 4
+
+def _engine():
+    markers = {cm.id: cm for cm in map(compile_marker, [
+        {"id": "ATO_A", "pattern": [r"\bvielleicht\b"], "scoring": {"base": 0.5}},
+        {"id": "ATO_B", "pattern": [r"\bsp(ä|ae)ter\b"], "negation_guard": {"regex": r"\b(nicht)\b", "window": 1}},
+        {"id": "SEM_AB", "composed_of": ["ATO_A", "ATO_B"], "activation": {"rule": "BOTH IN 2 messages"}},
+    ])}
+    return MarkerEngine(markers)
+
+def test_analyze_runs_all_layers():
+    engine = _engine()
+    conv = engine.conversation()
+    first = engine.analyze("Vielleicht.", conv)
+    second = engine.analyze("Dann eben später.", conv)
+    assert first.records.counts() == {"ATO_A": 1} and not first.active
+    assert second.active == {"SEM_AB"} and conv.seen == 2
+    assert second.to_dict()["scores"] == [{"id": "ATO_B", "type": "ATO", "score": 1.0},
+                                          {"id": "SEM_AB", "type": "SEM", "score": 1.0}]
+    assert engine.analyze("Vielleicht nicht später.").records.counts() == {"ATO_A": 1}
+
+def test_analyze_many_equals_sequential_analyze():
+    engine = MarkerEngine.load("spiral_persona")
+    batch = engine.analyze_many(MSGS)
+    conv = engine.conversation()
+    single = [engine.analyze(text, conv) for text in MSGS]
+    assert [r.to_dict() for r in batch] == [r.to_dict() for r in single]
+    assert any(r.active for r in batch)
+    assert "CLU_INTUITION_UNCERTAINTY" in batch[-1].intuitions
+
+def test_scan_and_step_match_analyze_with_scenes():
+    markers = {cm.id: cm for cm in map(compile_marker, [
+        {"id": "SCN_HOME", "pattern": [r"\bzuhause\b"], "composed_of": {"min_hits": 1},
+         "detect_class": {"rule": "decay=2 turns"}},
+        {"id": "ATO_TIRED", "pattern": [r"\bmüde\b"], "requires_env": {"any_of": ["SCN_HOME"]}},
+        {"id": "ATO_LATE", "pattern": [r"\bspät\b"]},
+    ])}
+    engine = MarkerEngine(markers)
+    texts = ["müde und spät", "zuhause", "so müde", "spät", "spät", "müde"]
+    a, b = engine.conversation(), engine.conversation()
+    direct = [engine.analyze(t, a).to_dict() for t in texts]
+    staged = [engine.step(b, t, engine.scan(t)).to_dict() for t in texts]
+    assert direct == staged
+    assert [sorted(h["marker"] for h in d["hits"]) for d in direct] == [
+        ["ATO_LATE"], ["SCN_HOME"], ["ATO_TIRED"], ["ATO_LATE"], ["ATO_LATE"], []]
+
+def test_snapshot_restore_continues_identically():
+    import json
+    engine = MarkerEngine.load("spiral_persona")
+    a, b = engine.conversation(), engine.conversation()
+    for i, text in enumerate(MSGS * 2):
+        assert engine.analyze(text, a).to_dict() == engine.analyze(text, b).to_dict(), i
+        if i % 3 == 0:
+            b = engine.restore(json.loads(json.dumps(b.snapshot())))
+    assert a.intuitions.snapshot() == b.intuitions.snapshot()
+
+def test_active_layers_decay_on_real_pack():
+    from pathlib import Path
+    pack = (Path(__file__).resolve().parents[2] / "MAIN_LeanDeep3.5_ALL_Marker_6.0"
+            / "MARKER_COLLECTION_LD3.5 Kopie" / "Marker_LD3.5_SSoTh")
+    engine = MarkerEngine.load(str(pack))
+    # ATOs mit Regeln wie "ANY 1" entscheidet allein der Regex-Treffer
+    assert engine.runtime["activation"] and not any(
+        mid.startswith(("ATO_", "SCN_")) for mid in engine.runtime["activation"])
+    conv = engine.conversation()
+    angry = engine.analyze("Du bist so ein verdammter Idiot, ich hasse dich! "
+                           "Immer machst du alles kaputt, das ist deine Schuld!", conv)
+    assert angry.active and all(mid.startswith(("SEM_", "CLU_", "MEMA_")) for mid in angry.active)
+    calm = [engine.analyze("🙂👍"[i % 2], conv) for i in range(40)]
+    assert not any(r.records.counts() for r in calm)
+    assert len(calm[0].active) < len(angry.active) and calm[-1].active == set()
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from marker_engine import MarkerEngine
+from marker_server import MarkerServer
+from markers_loader import compile_marker
+
+def _engine():
+    markers = {cm.id: cm for cm in map(compile_marker, [
+        {"id": "ATO_A", "pattern": [r"\bvielleicht\b"]},
+        {"id": "ATO_B", "pattern": [r"\bspäter\b"]},
+        {"id": "SEM_AB", "composed_of": ["ATO_A", "ATO_B"], "activation": {"rule": "BOTH IN 2 messages"}},
+    ])}
+    return MarkerEngine(markers)
+
+def _run(server, requests):
+    out = []
+
+    async def write(data):
+        out.append(json.loads(data))
+
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(json.dumps(r).encode() + b"\n" if isinstance(r, dict) else r for r in requests))
+        reader.feed_eof()
+        await server.serve(reader, write)
+
+    asyncio.run(main())
+    return out
+
+def test_server_keeps_order_and_state_per_conversation():
+    server = MarkerServer(_engine(), max_inflight=4)
+    reqs = []
+    for i in range(6):
+        reqs.append({"conversation_id": "a", "id": f"a{i}", "text": "vielleicht" if i % 2 else "später"})
+        reqs.append({"conversation_id": "b", "id": f"b{i}", "text": "nichts"})
+    out = _run(server, reqs + [{"conversation_id": "a", "end": True}])
+    by_id = {r["id"]: r for r in out}
+    assert [by_id[f"a{i}"]["seq"] for i in range(6)] == [1, 2, 3, 4, 5, 6]
+    assert [by_id[f"a{i}"]["active"] for i in range(6)] == [[]] + [["SEM_AB"]] * 5
+    assert all(not by_id[f"b{i}"]["active"] for i in range(6))
+    assert by_id[None]["ended"] and set(server.conversations) == {"b"}
+    assert server.inflight == 0
+
+def test_server_reports_bad_lines():
+    out = _run(MarkerServer(_engine()), [b"{kaputt\n", b"\n", {"id": 1, "text": "x"}, b"[1]\n"])
+    assert out[0]["error"].startswith("ungültiges JSON") and out[1]["error"] == "conversation_id fehlt"
+    assert out[2] == {"error": "Objekt erwartet"} and len(out) == 3
+
+def test_server_inflight_stays_within_limit():
+    server = MarkerServer(_engine(), max_inflight=3)
+    seen = []
+
+    async def write(data):
+        seen.append(server.inflight)
+        await asyncio.sleep(0)
+
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(json.dumps({"conversation_id": f"c{i % 4}", "text": "später"}).encode() + b"\n"
+                                  for i in range(20)))
+        reader.feed_eof()
+        await server.serve(reader, write)
+
+    asyncio.run(main())
+    assert len(seen) == 20 and max(seen) == 3 and min(seen) >= 1
+    assert server.inflight == 0
+
+def test_failed_scan_keeps_conversation_order():
+    import time
+    server = MarkerServer(_engine())
+    scan = server._scan
+
+    def flaky(text):
+        if text == "kaputt":
+            raise ValueError("Scan fehlgeschlagen")
+        if text == "vielleicht":
+            time.sleep(0.2)
+        return scan(text)
+
+    server._scan = flaky
+    out = _run(server, [{"conversation_id": "c", "id": i, "text": t}
+                        for i, t in enumerate(["vielleicht", "kaputt", "später"])])
+    by_id = {r["id"]: r for r in out}
+    assert by_id[1]["error"] == "ValueError: Scan fehlgeschlagen"
+    assert by_id[0]["seq"] == 1 and by_id[2]["seq"] == 2
+    assert by_id[2]["active"] == ["SEM_AB"]
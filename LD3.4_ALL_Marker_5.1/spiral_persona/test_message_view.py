@@ -0,0 +1,41 @@
+from ato_matcher import AtoMatcher
+from message_view import MessageView, message_view
+
+def test_normalization_keeps_offsets_aligned():
+    view = MessageView("ﬁne İSTANBUL Ａbc")
+    assert view.text == "fine İSTANBUL Abc"
+    assert len(view.lower) == len(view.text)
+    assert view.lower == "fine istanbul abc"
+    assert view.words() == ["fine", "istanbul", "abc"]
+
+def test_tokens_and_token_distance():
+    view = MessageView("Ich freue mich nicht so sehr, weil's regnet.")
+    assert view.words() == ["ich", "freue", "mich", "nicht", "so", "sehr", "weil's", "regnet"]
+    neg = view.lower.index("nicht")
+    sig = view.lower.index("freue")
+    assert view.token_distance(neg, sig) == 2
+    assert view.token_index(0) == 0 and view.token_index(len(view) - 1) == 7
+
+def test_sentences():
+    view = MessageView("Hallo du! Wie geht's? 3.5 Punkte…\nneu")
+    spans = [view.text[s:e].strip() for s, e in view.sentences]
+    assert spans == ["Hallo du!", "Wie geht's?", "3.5 Punkte...", "neu"]  # NFKC: … -> ...
+    assert view.sentence_index(view.text.index("geht")) == 1
+
+def test_view_cache_and_matcher_reuse():
+    assert message_view("hallo") is message_view("hallo")
+    view = message_view("ＮＩＥ wieder")
+    assert message_view(view) is view
+    matcher = AtoMatcher([("ATO_NEVER", r"\bnie\b")])
+    assert matcher.match(view) == {"ATO_NEVER": [(0, 3)]}
+    assert matcher.hit_ids(view) == {"ATO_NEVER"}
+
+def test_raw_span_maps_back_to_original():
+    raw = "Naja… vielleicht… ich weiß nicht, ob ich das ﬁnde"
+    view = message_view(raw)
+    s = view.text.index("vielleicht")
+    assert view.raw_span(s, s + len("vielleicht")) == (6, 16)
+    f = view.text.index("finde")
+    assert raw[slice(*view.raw_span(f, f + 5))] == "ﬁnde"
+    assert view.raw_span(4, 5) == (4, 5)  # erster Punkt von "..." -> ganzes "…"
+    assert message_view("ﾊﾞ").text == "ﾊﾞ"  # keine abschnittsweise Normalform möglich
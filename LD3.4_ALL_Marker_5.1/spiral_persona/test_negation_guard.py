@@ -0,0 +1,48 @@
+from ato_matcher import AtoMatcher
+from markers_loader import compile_marker
+from message_view import message_view
+from negation_guard import NegationGuard
+
+JOY = {
+    "id": "ATO_JOY_EXPRESSION",
+    "pattern": {"regex": r"(?i)\b(freue mich|glücklich|stolz)\b"},
+    "frame": {"signal": ["glücklich", "freue"]},
+    "negation_guard": {"regex": r"(?i)\b(nicht|kein|ohne)\b", "window": 2},
+}
+PLAIN = {"id": "ATO_PLAIN", "pattern": [r"(?i)\bglücklich\b"]}
+
+def _setup():
+    markers = {m["id"]: compile_marker(m) for m in (JOY, PLAIN)}
+    return AtoMatcher.from_markers(markers), NegationGuard.from_markers(markers)
+
+def test_hits_near_negator_are_suppressed():
+    matcher, guard = _setup()
+    view = message_view("Ich bin nicht glücklich, aber stolz auf dich.")
+    hits = guard.filter(view, matcher.match(view))
+    assert [view.text[s:e] for s, e in hits["ATO_JOY_EXPRESSION"]] == ["stolz"]
+    assert len(hits["ATO_PLAIN"]) == 1  # ohne Guard unverändert
+
+def test_window_is_measured_in_tokens():
+    matcher, guard = _setup()
+    near = message_view("Nicht dass ich glücklich wäre")   # 3 Tokens Abstand
+    far = message_view("Nicht dass ich heute so glücklich wäre")
+    assert "ATO_JOY_EXPRESSION" in guard.filter(near, matcher.match(near))
+    assert "ATO_JOY_EXPRESSION" in guard.filter(far, matcher.match(far))
+    close = message_view("Ich bin kein bisschen glücklich")
+    assert "ATO_JOY_EXPRESSION" not in guard.filter(close, matcher.match(close))
+
+def test_no_guarded_hits_returns_input_unchanged():
+    matcher, guard = _setup()
+    hits = matcher.match("nicht glücklich")
+    only_plain = {"ATO_PLAIN": hits["ATO_PLAIN"]}
+    assert guard.filter("nicht glücklich", only_plain) is only_plain
+    assert not NegationGuard({})
+
+def test_guards_share_detectors():
+    guard = NegationGuard({
+        "ATO_A": (r"(?i)\b(nicht|kein)\b", ("gut",), 3),
+        "ATO_B": (r"(?i)\b(nicht|kein)\b", ("gut",), 1),
+        "ATO_C": (r"nie\s+wieder", (), 3),
+    })
+    assert guard.rules["ATO_A"][:2] == guard.rules["ATO_B"][:2]
+    assert guard.positions(message_view("gut, nie  wieder nicht")) == {1: [0], 0: [3], 2: [1]}
@@ -0,0 +1,73 @@
+from markers_loader import SceneSpec, compile_marker, scene_spec_of
+from scene_gate import ContextGate, SceneState
+
+PARTNER = {
+    "id": "SCN_PARTNERSHIP_CONTEXT",
+    "pattern": [r"\b(Beziehung|als Paar|Partnerschaft)\b"],
+    "composed_of": {"window": {"utterances": 3}, "min_hits": 2},
+    "detect_class": {"rule": "activate(scene, hysteresis=1hit, decay=2 turns)"},
+}
+WEDDING = {
+    "id": "SCN_WEDDING_CONTEXT",
+    "pattern": [r"\bHochzeit\b"],
+    "composed_of": {"window": {"days": 60}, "min_hits": 1},
+    "detect_class": {"rule": "activate(scene, hysteresis=2hits, decay=14d)"},
+}
+TIME = {"id": "ATO_LL_QUALITY_TIME", "pattern": [r"\bzu zweit\b"],
+        "requires_env": {"any_of": ["SCN_PARTNERSHIP_CONTEXT"]}}
+FREE = {"id": "ATO_FREE", "pattern": [r"\bzeit\b"]}
+
+def _gate():
+    return ContextGate({m["id"]: compile_marker(m) for m in (PARTNER, WEDDING, TIME, FREE)})
+
+def test_scene_spec_from_marker():
+    assert scene_spec_of(PARTNER) == SceneSpec(min_hits=2, window_turns=3, decay_turns=2)
+    spec = scene_spec_of(WEDDING)
+    assert spec.min_hits == 1 and spec.window_seconds == 60 * 86400 and spec.decay_seconds == 14 * 86400
+    assert scene_spec_of(TIME) is None
+
+def test_gated_marker_only_fires_in_active_scene():
+    gate, state = _gate(), SceneState()
+    assert set(gate.match(state, "Zeit zu zweit")) == {"ATO_FREE"}
+    gate.match(state, "Unsere Beziehung ist mir wichtig")
+    assert state.active == frozenset()            # 1 Treffer < min_hits
+    hits = gate.match(state, "Als Paar wollen wir Zeit zu zweit")
+    assert state.active == {"SCN_PARTNERSHIP_CONTEXT"}
+    assert set(hits) == {"SCN_PARTNERSHIP_CONTEXT", "ATO_FREE", "ATO_LL_QUALITY_TIME"}
+
+def test_scene_decays_without_hits():
+    gate, state = _gate(), SceneState()
+    gate.match(state, "Beziehung und Partnerschaft")
+    assert state.active == {"SCN_PARTNERSHIP_CONTEXT"}
+    gate.match(state, "zu zweit")
+    assert "ATO_LL_QUALITY_TIME" not in gate.match(state, "zu zweit")
+    assert state.active == frozenset()
+
+def test_time_based_decay_with_timestamps():
+    gate, state = _gate(), SceneState()
+    gate.match(state, "Hochzeit!", ts=0.0)
+    assert state.active == {"SCN_WEDDING_CONTEXT"}
+    gate.match(state, "egal", ts=13 * 86400.0)
+    assert state.active == {"SCN_WEDDING_CONTEXT"}
+    gate.match(state, "egal", ts=15 * 86400.0)
+    assert state.active == frozenset()
+
+def test_matchers_are_cached_per_active_set():
+    gate = _gate()
+    assert gate.matcher(frozenset()) is gate.matcher(frozenset({"SCN_WEDDING_CONTEXT"}))
+    assert len(gate.matcher(frozenset({"SCN_PARTNERSHIP_CONTEXT"})).unique) == 2
+    assert not gate.allowed("ATO_LL_QUALITY_TIME", frozenset()) and gate.allowed("ATO_FREE", frozenset())
+
+def test_love_languages_pack_gates_on_scene():
+    from pathlib import Path
+    from marker_engine import MarkerEngine
+    pack = (Path(__file__).resolve().parents[2] / "MAIN_LeanDeep3.5_ALL_Marker_6.0"
+            / "MARKER_COLLECTION_LD3.5 Kopie" / "LD3.4_LOVE_LANGUAGES_CONTEXT_GATED")
+    engine = MarkerEngine.load(str(pack))
+    assert {"SCN_PARTNERSHIP_CONTEXT", "ATO_LL_QUALITY_TIME", "SEM_LL_QUALITY_TIME"} <= set(engine.markers)
+    conv = engine.conversation()
+    ask = "Ich wünsche mir einen Abend zu zweit ohne Handy."
+    assert not engine.analyze(ask, conv).records.counts()
+    scene = engine.analyze("Unsere Beziehung ist mir wichtig, als Paar schaffen wir das.", conv)
+    assert scene.scenes == {"SCN_PARTNERSHIP_CONTEXT"}
+    assert engine.analyze(ask, conv).records.counts() == {"ATO_LL_QUALITY_TIME": 2}
@@ -0,0 +1,26 @@
+from shard_executor import ShardedExecutor, shard_of
+from test_marker_server import _engine
+
+def test_shards_preserve_order_and_state():
+    engine = _engine()
+    chats = {f"c{i}": ["später", "vielleicht", "nichts", "nichts", "vielleicht"] for i in range(6)}
+    items = [(cid, text, None) for step in range(5) for cid, texts in chats.items() for text in [texts[step]]]
+    with ShardedExecutor(engine, shards=2, max_depth=4) as ex:
+        results = [f.result(timeout=30) for f in ex.submit_many(items)]
+        ended = ex.end("c0").result(timeout=30)
+        metrics = ex.metrics()
+    expected = {}
+    for cid, texts in chats.items():
+        conv = engine.conversation()
+        expected[cid] = [engine.analyze(t, conv).to_dict() for t in texts]
+    for cid in chats:
+        got = [r for r in results if r["conversation_id"] == cid]
+        assert [r["seq"] for r in got] == [1, 2, 3, 4, 5]
+        assert [{k: v for k, v in r.items() if k not in ("conversation_id", "seq")} for r in got] == expected[cid]
+    assert ended["ended"]
+    assert [m["depth"] for m in metrics] == [0, 0] and sum(m["processed"] for m in metrics) == 31
+    assert max(m["peak_depth"] for m in metrics) <= 4
+
+def test_shard_of_is_stable():
+    assert shard_of("conversation-42", 8) == shard_of("conversation-42", 8)
+    assert {shard_of(f"c{i}", 4) for i in range(50)} == {0, 1, 2, 3}
@@ -0,0 +1,355 @@
+import random
+import pytest
+from markers_loader import (
+    IntuitionState,
+    RuleExpr,
+    RuleSyntaxError,
+    StreamingActivationEngine,
+    compile_rule,
+    evaluate_activation,
+    layer_rank,
+)
+
+IDS = ["ATO_A", "ATO_B", "ATO_C", "SEM_X", "SEM_Y", "SEM_Z"]
+
+RUNTIME = {
+    "activation": {
+        "SEM_BOTH": "BOTH IN 2 messages",
+        "SEM_ATLEAST": "AT_LEAST 3 IN 4 messages",
+        "SEM_ANY": "ANY 4 IN 3 messages",
+        "CLU_DISTINCT": "AT_LEAST 2 DISTINCT SEMs IN 5 messages",
+        "CLU_BOTH1": "BOTH IN 1 message",
+        "SEM_OR": "BOTH IN 1 message OR ANY 2 IN 2 messages",
+        "SEM_AND": "ATO_A AND ATO_C IN 3 messages",
+    },
+    "composed_of": {
+        "SEM_BOTH": ["ATO_A", "ATO_B"],
+        "SEM_ATLEAST": ["ATO_A", "ATO_C"],
+        "SEM_ANY": ["ATO_B"],
+        "CLU_DISTINCT": ["SEM_X", "SEM_Y", "SEM_Z"],
+        "CLU_BOTH1": ["SEM_X", "ATO_C"],
+        "SEM_OR": ["ATO_A", "ATO_B"],
+        "SEM_AND": ["ATO_A", "ATO_C"],
+    },
+}
+
+def _reference(prog, msgs):
+    # naive Auswertung des Fensters, das mit der letzten Nachricht endet
+    if isinstance(prog, RuleExpr):
+        combine = all if prog.op == "AND" else any
+        return combine(_reference(c, msgs) for c in prog.children)
+    if len(msgs) < prog.y:
+        return False
+    win = msgs[len(msgs) - prog.y:]
+    union = set().union(*win)
+    comp = prog.composed
+    if prog.kind == "BOTH_IN_N":
+        return set(comp) <= union
+    if prog.kind in ("AT_LEAST_X_IN_Y", "ANY_X_IN_Y"):
+        return sum(1 for s in win for c in comp if c in s) >= prog.x
+    if prog.kind == "AT_LEAST_X_DISTINCT_IN_Y":
+        return len(union & set(comp)) >= prog.x
+    raise AssertionError(prog.kind)
+
+def _random_chat(seed: int, n: int):
+    rnd = random.Random(seed)
+    return [{mid for mid in IDS if rnd.random() < 0.25} for _ in range(n)]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_streaming_matches_batch(seed):
+    msgs = _random_chat(seed, 40)
+    engine = StreamingActivationEngine(RUNTIME)
+    steps = engine.run(msgs)
+    for mid, rule in RUNTIME["activation"].items():
+        comp = RUNTIME["composed_of"][mid]
+        prog = compile_rule(rule, comp)
+        fired = False
+        for i, active in enumerate(steps):
+            assert (mid in active) == _reference(prog, msgs[: i + 1]), (mid, i)
+            fired = fired or mid in active
+            assert fired == evaluate_activation(rule, comp, msgs[: i + 1]), (mid, i)
+
+def test_only_full_windows_count():
+    engine = StreamingActivationEngine(RUNTIME, ["SEM_BOTH"])
+    assert engine.push({"ATO_A", "ATO_B"}) == set()
+    assert engine.push(set()) == {"SEM_BOTH"}
+    assert engine.push(set()) == set()
+
+def test_reset_clears_window():
+    engine = StreamingActivationEngine(RUNTIME, ["CLU_BOTH1"])
+    assert engine.push({"SEM_X", "ATO_C"}) == {"CLU_BOTH1"}
+    engine.reset()
+    assert engine.seen == 0
+    assert engine.push({"SEM_X"}) == set()
+
+def test_compile_rule_is_cached_and_typed():
+    p1 = compile_rule("AT_LEAST 2 DISTINCT SEMs IN 4 messages", ["SEM_X", "ATO_A", "SEM_Y"])
+    p2 = compile_rule("AT_LEAST 2 DISTINCT SEMs IN 4 messages", ("SEM_X", "ATO_A", "SEM_Y"))
+    assert p1 is p2
+    assert (p1.kind, p1.x, p1.y) == ("AT_LEAST_X_DISTINCT_IN_Y", 2, 4)
+    assert p1.ids == {"SEM_X", "SEM_Y"}
+    assert evaluate_activation(p1, [], [{"SEM_X"}, set(), {"SEM_Y"}, set()])
+
+def test_unknown_rule_raises():
+    with pytest.raises(ValueError):
+        compile_rule("SOMETIMES IN 3 messages", [])
+    with pytest.raises(RuleSyntaxError):
+        compile_rule("AT_LEAST 1 of [SEM_X] IN confirm_window", [])
+
+@pytest.mark.parametrize("rule", [
+    "ANY 1",
+    "ANY in 1 message",
+    "ANY 1 IN 30 messages",
+    "ALL 2 IN 3 messages",
+    "ALL in 1 message OR ANY 2 in 3 messages",
+    "BOTH IN 1 message OR ANY 2 IN 2 messages",
+    "AT_LEAST 2 DISTINCT CLUs IN 10 messages",
+    "AT_LEAST 3 different CLU_SPIRAL_PERSONA_* IN 10 messages",
+    "AT_LEAST 2 DISTINCT_ATO",
+    "COUNT(SEM_X)+COUNT(ATO_A) >= 3 IN 20",
+    "COUNT(ATO_A)>=1 AND COUNT(ATO_B)>=1 IN 5",
+    "WEIGHTED_AND",
+    "WEIGHTED_OR >= 0.8",
+])
+def test_corpus_dialects_compile(rule):
+    compile_rule(rule, ["ATO_A", "ATO_B"], weights={"ATO_A": 0.5, "ATO_B": 0.4, "__threshold__": 0.6})
+
+def test_symbolic_window_and_id_list():
+    prog = compile_rule("AT_LEAST 1 of [SEM_X, SEM_Y] IN confirm_window", ["SEM_Z"], {"confirm_window": 4})
+    assert (prog.x, prog.y, prog.ids) == (1, 4, {"SEM_X", "SEM_Y"})
+    again = compile_rule("ANY of [SEM_X] occurs again", [], {"confirm_window": 3})
+    assert (again.x, again.y) == (2, 3)
+
+def test_weighted_rule_without_weights_is_unsupported():
+    from markers_loader import compile_marker, compile_runtime
+    with pytest.raises(RuleSyntaxError):
+        compile_rule("WEIGHTED_AND", ["ATO_A", "ATO_B"])
+    cm = compile_marker({"id": "SEM_W", "composed_of": ["ATO_A", "ATO_B"], "activation": {"rule": "WEIGHTED_OR"}})
+    runtime = compile_runtime({"SEM_W": cm})
+    assert "SEM_W" in runtime["unsupported"] and "SEM_W" not in runtime["programs"]
+
+def test_weighted_sum_threshold():
+    prog = compile_rule("WEIGHTED_AND", ["ATO_A", "ATO_B"], {}, {"ATO_A": 0.5, "ATO_B": 0.4, "__threshold__": 0.6})
+    assert not prog.evaluate([{"ATO_A"}])
+    assert prog.evaluate([{"ATO_A", "ATO_B"}])
+
+def test_trailing_window_is_shared_by_and_chain():
+    prog = compile_rule("ATO_A AND ATO_C IN 3 messages", [])
+    assert [leaf.y for leaf in prog.children] == [3, 3]
+    assert prog.evaluate([{"ATO_A"}, set(), {"ATO_C"}])
+    assert not prog.evaluate([{"ATO_A"}, set(), set(), {"ATO_C"}])
+
+def test_intuition_confirm_rule_dialect():
+    istate = IntuitionState(confirm_window=3, confirm_rule="AT_LEAST 1 of [SEM_X] IN confirm_window")
+    istate.tick(True, [set(), {"SEM_X"}, set()], confirm_ids=["SEM_X"])
+    assert istate.state == "confirmed"
+
+LAYERED = {
+    "activation": {
+        "SEM_P": "BOTH IN 1 message",
+        "CLU_P": "AT_LEAST 2 IN 3 messages",
+        "MEMA_P": "ANY 1 IN 1 message",
+    },
+    "composed_of": {
+        "SEM_P": ["ATO_A", "ATO_B"],
+        "CLU_P": ["SEM_P"],
+        "MEMA_P": ["CLU_P"],
+    },
+}
+
+def test_hits_propagate_across_layers_in_one_push():
+    engine = StreamingActivationEngine(LAYERED)
+    steps = engine.run([{"ATO_A", "ATO_B"}, set(), {"ATO_A", "ATO_B"}, set(), set()])
+    assert steps[0] == {"SEM_P"}
+    assert steps[1] == set()
+    assert steps[2] == {"SEM_P", "CLU_P", "MEMA_P"}
+    assert steps[3] == set()
+    engine.reset()
+    steps = engine.run([{"ATO_A", "ATO_B"}, {"ATO_A", "ATO_B"}, set(), set()])
+    assert steps[1] == {"SEM_P"}
+    assert steps[2] == {"CLU_P", "MEMA_P"}
+    assert steps[3] == set()
+
+# Treffer zählen nur für höhere Schichten; CLU → CLU sieht nichts
+SAME_LAYER = {
+    "activation": {
+        "SEM_P": "BOTH IN 1 message",
+        "CLU_Q": "ANY 1 IN 1 message",
+        "CLU_R": "AT_LEAST 2 IN 3 messages",
+        "CLU_S": "ANY 1 IN 2 messages",
+        "MEMA_T": "ANY 1 IN 1 message",
+    },
+    "composed_of": {
+        "SEM_P": ["ATO_A", "ATO_B"],
+        "CLU_Q": ["SEM_P"],
+        "CLU_R": ["CLU_Q"],
+        "CLU_S": [],
+        "MEMA_T": ["CLU_Q"],
+    },
+}
+
+def test_same_layer_hits_are_not_inputs():
+    engine = StreamingActivationEngine(SAME_LAYER)
+    steps = engine.run([{"ATO_A", "ATO_B"}, {"ATO_A", "ATO_B"}, {"ATO_A", "ATO_B"}, set(), set()])
+    # CLU_S (ANY ohne IDs) zählt ATOs und SEM_P, aber weder CLU_Q noch sich selbst
+    assert steps[0] == {"SEM_P", "CLU_Q", "MEMA_T"}
+    assert steps[1] == steps[2] == {"SEM_P", "CLU_Q", "CLU_S", "MEMA_T"}
+    assert steps[3] == {"CLU_S"}
+    assert steps[4] == set()
+    assert engine.run([set(), set()]) == [set(), set()] and engine.idle()
+
+def test_activation_expires_with_its_window():
+    runtime = {"activation": {"ATO_X": "ANY 1 IN 3 messages"}, "composed_of": {"ATO_X": []}}
+    steps = StreamingActivationEngine(runtime).run([{"ATO_A"}] + [set()] * 8)
+    assert steps == [set(), set(), {"ATO_X"}] + [set()] * 6
+    fired = [evaluate_activation(runtime["activation"]["ATO_X"], [], [{"ATO_A"}] + [set()] * i) for i in range(9)]
+    assert fired == [False, False] + [True] * 7
+
+def test_restore_keeps_lifted_hits_out_of_lower_windows():
+    runtime = {"activation": {"SEM_P": "ANY 1 IN 1 message", "SEM_E": "ANY 1 IN 2 messages",
+                              "CLU_Q": "ANY 1 IN 1 message"},
+               "composed_of": {"SEM_P": ["ATO_A"], "SEM_E": [], "CLU_Q": ["SEM_P"]}}
+    msgs = [{"ATO_A"}, set(), set(), {"ATO_B"}, set()]
+    a = StreamingActivationEngine(runtime)
+    expected = a.run(msgs)
+    b = StreamingActivationEngine(runtime)
+    b.run(msgs[:1])
+    c = StreamingActivationEngine(runtime)
+    c.restore(b.snapshot())
+    assert c.run(msgs[1:]) == expected[1:]
+    assert expected[1] == {"SEM_E"} and expected[2] == set()
+
+def random_runtime(seed: int):
+    """Zufällige Regeln über ATO/SEM/CLU/MEMA, inkl. ANY ohne IDs und Verweisen in die eigene Schicht."""
+    rnd = random.Random(seed)
+    layers = [["ATO_A", "ATO_B", "ATO_C"], ["SEM_1", "SEM_2", "SEM_3"], ["CLU_1", "CLU_2"], ["MEMA_1"]]
+    runtime = {"activation": {}, "composed_of": {}}
+    for rank in (1, 2, 3):
+        pool = [mid for layer in layers[: rank + 1] for mid in layer]
+        for mid in layers[rank]:
+            y = rnd.randint(1, 4)
+            comp = rnd.sample([c for c in pool if c != mid], rnd.randint(1, 3))
+            rule = rnd.choice([f"BOTH IN {y} messages", f"AT_LEAST {rnd.randint(1, 3)} IN {y} messages",
+                               f"ANY {rnd.randint(1, 3)} IN {y} messages", f"ANY 1 IN {y} messages"])
+            if rule.startswith("ANY 1"):
+                comp = []
+            runtime["activation"][mid] = rule
+            runtime["composed_of"][mid] = comp
+    return runtime
+
+def layered_reference(runtime, msgs):
+    """Treffer je Nachricht per ``evaluate_activation``: jede Schicht sieht die Nachricht und tiefere Treffer."""
+    hits = [set() for _ in msgs]
+    for rank in sorted({layer_rank(mid) for mid in runtime["activation"]}):
+        view = [set(m) | {h for h in hits[i] if layer_rank(h) < rank} for i, m in enumerate(msgs)]
+        for mid, rule in runtime["activation"].items():
+            if layer_rank(mid) != rank:
+                continue
+            comp = runtime["composed_of"][mid]
+            y = compile_rule(rule, comp).y
+            for i in range(y - 1, len(msgs)):
+                if evaluate_activation(rule, comp, view[i - y + 1: i + 1]):
+                    hits[i].add(mid)
+    return hits
+
+@pytest.mark.parametrize("seed", range(30))
+def test_streaming_matches_layered_reference_on_random_rules(seed):
+    runtime = random_runtime(seed)
+    msgs = [{mid for mid in ("ATO_A", "ATO_B", "ATO_C") if random.Random(seed * 100 + i).random() < 0.3}
+            for i in range(30)] + [set()] * 6
+    assert StreamingActivationEngine(runtime).run(msgs) == layered_reference(runtime, msgs)
+
+def test_registry_dependents_index():
+    from markers_loader import Registry
+    spec = {
+        "atomic_markers": [{"id": "ATO_A"}, {"id": "ATO_B"}],
+        "semantic_markers": [{"id": "SEM_P", "composed_of": ["ATO_A", "ATO_B"]}],
+        "cluster_markers": [{"id": "CLU_P", "composed_of": ["SEM_P"]}],
+        "meta_markers": [{"id": "MEMA_P", "composed_of": ["CLU_P"]}],
+    }
+    reg = Registry.build(spec)
+    assert reg.dependents["ATO_A"] == {"SEM_P"}
+    assert reg.affected(["ATO_B"]) == ["SEM_P", "CLU_P", "MEMA_P"]
+    assert reg.affected(["ATO_X"]) == []
+
+@pytest.mark.parametrize("seed", range(10))
+def test_bitset_evaluation_matches_sets(seed):
+    index = {mid: i for i, mid in enumerate(IDS)}
+    msgs = _random_chat(seed, 30)
+    masks = [sum(1 << index[mid] for mid in msg) for msg in msgs]
+    for mid, rule in RUNTIME["activation"].items():
+        prog = compile_rule(rule, RUNTIME["composed_of"][mid])
+        assert prog.bit_steps(masks, index) == prog.steps(msgs), mid
+    weighted = compile_rule("WEIGHTED_OR", ["ATO_A", "ATO_B"], {}, {"ATO_A": 0.5, "ATO_B": 0.4, "__threshold__": 0.6})
+    assert weighted.bit_steps(masks, index) == weighted.steps(msgs)
+
+def test_registry_encode_decode_roundtrip():
+    from markers_loader import Registry
+    reg = Registry.build({"atomic_markers": [{"id": mid} for mid in IDS]})
+    bits = reg.encode({"ATO_B", "SEM_Z", "ATO_UNKNOWN"})
+    assert reg.decode(bits) == {"ATO_B", "SEM_Z"}
+    assert evaluate_activation("BOTH IN 2 messages", ["ATO_A", "ATO_B"],
+                               [reg.encode({"ATO_A"}), reg.encode({"ATO_B"})], index=reg.index)
+    np = pytest.importorskip("numpy")
+    rows = reg.to_rows([bits, 0])
+    assert rows.shape == (2, len(IDS))
+    assert [reg.names[i] for i in np.flatnonzero(rows[0])] == ["ATO_B", "SEM_Z"]
+
+@pytest.mark.parametrize("seed", range(10))
+def test_intuition_step_matches_tick(seed):
+    msgs = _random_chat(seed, 40)
+    rule = "AT_LEAST 2 of [SEM_X, SEM_Y] IN confirm_window"
+    a = IntuitionState(confirm_window=4, decay_window=3, confirm_rule=rule)
+    b = IntuitionState(confirm_window=4, decay_window=3, confirm_rule=rule)
+    for i, msg in enumerate(msgs):
+        activated = "ATO_A" in msg
+        a.tick(activated, msgs[: i + 1], confirm_ids=["SEM_X", "SEM_Y"])
+        b.step(activated, msg, confirm_ids=["SEM_X", "SEM_Y"])
+        assert (a.state, round(a.score, 9)) == (b.state, round(b.score, 9)), i
+    assert not hasattr(b, "__dict__")
+
+def test_intuition_bank_matches_states():
+    from markers_loader import IntuitionBank
+    rules = {"CLU_INTUITION_A": "AT_LEAST 1 of [SEM_X] IN confirm_window",
+             "CLU_INTUITION_B": "ANY 2 IN confirm_window"}
+    confirm = {"CLU_INTUITION_A": ["SEM_X"], "CLU_INTUITION_B": ["SEM_Y", "SEM_Z"]}
+    singles = {cid: IntuitionState(confirm_window=3, decay_window=2, confirm_rule=r) for cid, r in rules.items()}
+    bank = IntuitionBank({cid: IntuitionState(confirm_window=3, decay_window=2, confirm_rule=r)
+                          for cid, r in rules.items()}, confirm)
+    for msg in _random_chat(3, 40):
+        active = {cid for cid in rules if "ATO_B" in msg}
+        bank.step(active, msg)
+        for cid, st in singles.items():
+            st.step(cid in active, msg, confirm[cid])
+            assert bank.state_of(cid) == st.state
+            assert bank.score[bank.slot[cid]] == pytest.approx(st.score)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_idle_fast_path_matches_reference_on_sparse_chats(seed):
+    rnd = random.Random(seed)
+    # überwiegend Smalltalk ohne Treffer, vereinzelte Ausschläge
+    msgs = [{mid for mid in IDS if rnd.random() < 0.3} if rnd.random() < 0.15 else set() for _ in range(60)]
+    steps = StreamingActivationEngine(RUNTIME).run(msgs)
+    for mid, rule in RUNTIME["activation"].items():
+        prog = compile_rule(rule, RUNTIME["composed_of"][mid])
+        for i, active in enumerate(steps):
+            assert (mid in active) == _reference(prog, msgs[: i + 1]), (mid, i)
+
+def test_rules_true_on_empty_windows_disable_fast_path():
+    runtime = {"activation": {"SEM_E": "BOTH IN 2 messages"}, "composed_of": {"SEM_E": []}}
+    engine = StreamingActivationEngine(runtime)
+    assert engine.run([set(), set(), set()]) == [set(), {"SEM_E"}, {"SEM_E"}]
+
+def test_family_window_summary():
+    families = {"joy": ["ATO_A", "SEM_X"], "anger": ["ATO_C"]}
+    engine = StreamingActivationEngine(RUNTIME, families=families)
+    engine.push({"ATO_A"})
+    assert engine.active_families() == {"joy"}
+    engine.push({"ATO_C"})
+    assert engine.active_families() == {"joy", "anger"}
+    for _ in range(5):  # größtes Fenster: 5 Nachrichten
+        engine.push(set())
+    assert engine.active_families() == set()
+    assert not engine.idle()  # SEM_AND (ATO_A … ATO_C) steht noch im Fenster
+    engine.push(set())
+    assert engine.idle()
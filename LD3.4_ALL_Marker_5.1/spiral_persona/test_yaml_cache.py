@@ -0,0 +1,47 @@
+import os
+from yaml_cache import YamlCache
+
+def test_cache_reuses_and_invalidates(tmp_path):
+    src = tmp_path / "ATO_X.yaml"
+    src.write_text("id: ATO_X\npattern: [a]\n", encoding="utf-8")
+    calls = []
+
+    def parse(raw):
+        calls.append(raw)
+        import yaml
+        return yaml.safe_load(raw)
+
+    cache = YamlCache(tmp_path / "c.pickle")
+    assert cache.load(src, parse)["id"] == "ATO_X"
+    cache.save()
+
+    warm = YamlCache(tmp_path / "c.pickle")
+    assert warm.load(src, parse)["pattern"] == ["a"]
+    assert len(calls) == 1
+
+    # gleicher Inhalt, neue mtime: Hash trifft, kein erneutes Parsen
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert warm.load(src, parse)["id"] == "ATO_X"
+    assert len(calls) == 1
+
+    src.write_text("id: ATO_Y\n", encoding="utf-8")
+    assert warm.load(src, parse)["id"] == "ATO_Y"
+    assert len(calls) == 2
+
+def test_parallel_parse_keeps_order_and_reports_errors(tmp_path):
+    from yaml_cache import parse_files
+    paths = []
+    for i in range(6):
+        p = tmp_path / f"m{i}.yaml"
+        p.write_text(f"id: ATO_{i}\n" if i != 3 else "id: [unclosed\n", encoding="utf-8")
+        paths.append(p)
+    serial = parse_files(paths, workers=1)
+    pooled = parse_files(paths, workers=2)
+    assert [r[1] for r in serial] == [r[1] for r in pooled]
+    assert [r[1]["id"] for i, r in enumerate(pooled) if i != 3] == [f"ATO_{i}" for i in range(6) if i != 3]
+    assert pooled[3][1] is None and pooled[3][2]
+
+    cache = YamlCache(tmp_path / "c.pickle")
+    loaded = cache.load_many(paths, workers=1)
+    assert loaded[0][0]["id"] == "ATO_0" and loaded[3][1]
@@ -0,0 +1,130 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import pickle
+
+import yaml
+
+# -------- YAML-Backend --------
+# libyaml (CSafeLoader) ist um ein Vielfaches schneller als der reine
+# Python-Parser; ohne C-Erweiterung fällt alles auf SafeLoader zurück.
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+PARALLEL_MIN_FILES = 64  # ohne explizite workers lohnt der Pool darunter nicht
+
+def safe_load(stream: Any) -> Any:
+    return yaml.load(stream, Loader=SafeLoader)
+
+def _read_and_parse(path: str) -> Tuple[str | None, Any, str | None]:
+    """(sha1, Daten, Fehler) für eine Datei; läuft auch im Worker-Prozess."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError as exc:
+        return None, None, str(exc)
+    digest = hashlib.sha1(raw).hexdigest()
+    try:
+        return digest, safe_load(raw), None
+    except yaml.YAMLError as exc:
+        return digest, None, str(exc)
+
+def parse_files(paths: Sequence[str | Path], workers: int | None = None) -> List[Tuple[str | None, Any, str | None]]:
+    """Parst Dateien parallel; das Ergebnis folgt der Reihenfolge von ``paths``."""
+    names = [os.fspath(p) for p in paths]
+    if not names or workers == 1 or (workers is None and (len(names) < PARALLEL_MIN_FILES or (os.cpu_count() or 1) == 1)):
+        return [_read_and_parse(n) for n in names]
+    workers = workers or os.cpu_count()
+    chunk = max(1, len(names) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_read_and_parse, names, chunksize=chunk))
+
+# -------- Persistenter YAML-Cache --------
+# Geparste Marker-Dateien werden binär (pickle) zwischengespeichert:
+#   Pfad   -> (mtime_ns, Größe, sha1 des Inhalts)
+#   sha1   -> geparste Daten
+# Stimmen mtime und Größe, wird die Datei gar nicht gelesen; sonst entscheidet der
+# Inhalts-Hash, ob neu geparst werden muss. Gleiche Dateien in mehreren Kopien
+# des Baums teilen sich einen Eintrag. Der Cache ist ein lokales Artefakt und wird
+# nur aus vertrauenswürdigen Verzeichnissen geladen.
+
+CACHE_ENV = "LEANDEEP_CACHE_DIR"
+CACHE_VERSION = 1
+
+class YamlCache:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.files: Dict[str, Tuple[int, int, str]] = {}
+        self.blobs: Dict[str, Any] = {}
+        self.dirty = False
+        try:
+            with open(self.path, "rb") as f:
+                version, files, blobs = pickle.load(f)
+            if version == CACHE_VERSION:
+                self.files, self.blobs = files, blobs
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+            pass
+
+    def load(self, path: str | Path, parse: Callable[[bytes], Any] = safe_load) -> Any:
+        """Geparster Inhalt von ``path``; Parserfehler werden nicht gecacht."""
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        hit = self.files.get(key)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size and hit[2] in self.blobs:
+            return self.blobs[hit[2]]
+        with open(key, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest not in self.blobs:
+            self.blobs[digest] = parse(raw)
+        self.files[key] = (st.st_mtime_ns, st.st_size, digest)
+        self.dirty = True
+        return self.blobs[digest]
+
+    def load_many(self, paths: Sequence[str | Path], workers: int | None = None) -> List[Tuple[Any, str | None]]:
+        """(Daten, Fehler) je Pfad in Eingabereihenfolge; nur Cache-Fehltreffer werden (parallel) geparst."""
+        out: List[Tuple[Any, str | None]] = [(None, None)] * len(paths)
+        misses: List[Tuple[int, str, os.stat_result]] = []
+        for i, path in enumerate(paths):
+            key = os.path.abspath(path)
+            try:
+                st = os.stat(key)
+            except OSError as exc:
+                out[i] = (None, str(exc))
+                continue
+            hit = self.files.get(key)
+            if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size and hit[2] in self.blobs:
+                out[i] = (self.blobs[hit[2]], None)
+            else:
+                misses.append((i, key, st))
+        for (i, key, st), (digest, data, err) in zip(misses, parse_files([m[1] for m in misses], workers)):
+            if err is not None:
+                out[i] = (None, err)
+                continue
+            self.blobs.setdefault(digest, data)
+            self.files[key] = (st.st_mtime_ns, st.st_size, digest)
+            self.dirty = True
+            out[i] = (self.blobs[digest], None)
+        return out
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        # nicht mehr referenzierte Inhalte verwerfen
+        live = {entry[2] for entry in self.files.values()}
+        self.blobs = {d: v for d, v in self.blobs.items() if d in live}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((CACHE_VERSION, self.files, self.blobs), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+def default_cache(name: str) -> YamlCache | None:
+    """Cache unter ``$LEANDEEP_CACHE_DIR`` (ein File je ``name``), sonst None."""
+    base = os.environ.get(CACHE_ENV)
+    if not base:
+        return None
+    tag = hashlib.sha1(os.path.abspath(name).encode("utf-8")).hexdigest()[:16]
+    return YamlCache(Path(base) / f"yaml-{tag}.pickle")
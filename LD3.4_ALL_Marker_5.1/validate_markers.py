@@ -6,6 +6,8 @@ import yaml
 from typing import Any, Dict, List, Tuple
 
 REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'spiral_persona'))
+from yaml_cache import default_cache  # noqa: E402
 MARKERS_ROOT = os.path.join(REPO_ROOT, 'ALL_Marker_5.1')
 CLU_DIR = os.path.join(MARKERS_ROOT, 'CLU_cluster')
 
@@ -145,11 +147,15 @@ def validate_flat_clu(file_path: str, data: Dict[str, Any]) -> List[str]:
 def main() -> int:
     clu_files = sorted(glob.glob(os.path.join(CLU_DIR, '*.y*ml')))
     all_errors: List[str] = []
+    cache = default_cache(CLU_DIR)
 
     for path in clu_files:
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
+            if cache is not None:
+                data = cache.load(path)
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = yaml.safe_load(f)
         except Exception as e:
             all_errors.append(f"{path}: YAML-Fehler: {e}")
             continue
@@ -161,6 +167,8 @@ def main() -> int:
             all_errors.extend(validate_container(path, data))
         else:
             all_errors.extend(validate_flat_clu(path, data))
+    if cache is not None:
+        cache.save()
 
     if all_errors:
         print("VALIDATION FAILED:")
@@ -0,0 +1,53 @@
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.regex_profile import (
+    PatternProfile,
+    SUPERLINEAR_EXPONENT,
+    _Prober,
+    growth_exponent,
+    probe_growth,
+)
+
+
+def test_growth_exponent_fits_all_sizes():
+    sizes = (250, 500, 1000, 2000, 4000)
+    assert abs(growth_exponent([(n, n * 1e-6) for n in sizes]) - 1.0) < 1e-9
+    assert abs(growth_exponent([(n, n * n * 1e-9) for n in sizes]) - 2.0) < 1e-9
+
+
+def test_linear_pattern_is_not_flagged():
+    for _ in range(3):  # stable across runs, not just once
+        growth, _name = probe_growth(r"\bniemals\b", re.IGNORECASE, "Das mache ich niemals.")
+        assert growth < SUPERLINEAR_EXPONENT
+
+
+def test_quadratic_pattern_is_flagged():
+    growth, name = probe_growth(r".*x", re.IGNORECASE, "")
+    assert growth > SUPERLINEAR_EXPONENT
+    assert name
+
+
+def test_catastrophic_pattern_times_out():
+    prober = _Prober(timeout=0.2)
+    try:
+        assert prober.probe(r"(a+)+$", re.IGNORECASE, "") is None
+        # the worker is restarted and keeps serving after a kill
+        assert prober.probe(r"\bja\b", re.IGNORECASE, "ja") is not None
+    finally:
+        prober.close()
+    assert PatternProfile("ATO_X", r"(a+)+$", "x.yaml", timed_out=True).superlinear
+
+
+def test_prober_timeout_applies_per_input():
+    prober = _Prober(timeout=1.0)
+    try:
+        growth, name = prober.probe(r".*x", re.IGNORECASE, "")
+    finally:
+        prober.close()
+    assert growth > SUPERLINEAR_EXPONENT and name
@@ -14,7 +14,12 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Set
 
-import yaml
+# Ensure repository root is on sys.path for module imports
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.yaml_cache import YamlCache, default_cache, parse_files, safe_load
 
 ID_PATTERN = re.compile(r"^[A-Z0-9]+(?:_[A-Z0-9]+)*$")
 CANONICAL_PREFIXES = {"ATO", "SEM", "CLU", "MEMA"}
@@ -36,6 +41,15 @@ def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
         action="store_true",
         help="Emit audit findings as JSON",
     )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for the parsed-YAML cache (defaults to $LEANDEEP_CACHE_DIR)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Worker processes for YAML parsing (defaults to all cores for large scans)",
+    )
     return parser.parse_args(argv)
 
 
@@ -106,12 +120,26 @@ def extract_markers(data: object) -> List[dict]:
     return []
 
 
-def read_yaml(path: Path):
+def read_yaml(path: Path, cache: Optional[YamlCache] = None):
+    if cache is not None:
+        return cache.load(path)
     with path.open("r", encoding="utf-8") as handle:
-        return yaml.safe_load(handle)
-
-
-def scan_markers(roots: Iterable[Path]):
+        return safe_load(handle)
+
+
+def scan_markers(
+    roots: Iterable[Path],
+    cache: Optional[YamlCache] = None,
+    workers: Optional[int] = None,
+):
+    """Scan marker files below ``roots``.
+
+    Parsed files are served from ``cache`` (or the ``$LEANDEEP_CACHE_DIR``
+    cache when set); only new or changed files are parsed again, across
+    ``workers`` processes. Records keep the file order of a serial scan.
+    """
+    if cache is None:
+        cache = default_cache()
     records: List[MarkerRecord] = []
     parse_errors: List[Dict[str, str]] = []
     missing_ids: List[Dict[str, str]] = []
@@ -121,61 +149,66 @@ def scan_markers(roots: Iterable[Path]):
     files_scanned = 0
     repo_root = Path.cwd().resolve()
 
+    paths: List[Path] = []
     for root in roots:
-        paths: List[Path]
         if root.is_file():
-            paths = [root]
+            paths.append(root)
         else:
-            paths = sorted(root.rglob("*.yml")) + sorted(root.rglob("*.yaml"))
-        for path in paths:
-            files_scanned += 1
-            try:
-                data = read_yaml(path)
-            except Exception as exc:  # pragma: no cover - defensive
-                parse_errors.append({
+            paths.extend(sorted(root.rglob("*.yml")) + sorted(root.rglob("*.yaml")))
+    if cache is not None:
+        loaded = cache.load_many(paths, workers)
+    else:
+        loaded = [(data, error) for _, data, error in parse_files(paths, workers)]
+
+    for path, (data, error) in zip(paths, loaded):
+        files_scanned += 1
+        if error is not None:
+            parse_errors.append({
+                "file": str(_rel_path(path, repo_root)),
+                "error": error,
+            })
+            continue
+        markers = extract_markers(data)
+        if not markers:
+            continue
+        file_marker_count = len(markers)
+        for index, marker in enumerate(markers):
+            marker_id = marker.get("id")
+            if not isinstance(marker_id, str) or not marker_id:
+                missing_ids.append({
                     "file": str(_rel_path(path, repo_root)),
-                    "error": str(exc),
+                    "index": index,
                 })
                 continue
-            markers = extract_markers(data)
-            if not markers:
-                continue
-            file_marker_count = len(markers)
-            for index, marker in enumerate(markers):
-                marker_id = marker.get("id")
-                if not isinstance(marker_id, str) or not marker_id:
-                    missing_ids.append({
-                        "file": str(_rel_path(path, repo_root)),
-                        "index": index,
-                    })
-                    continue
-                prefix = marker_id.split("_", 1)[0]
-                examples = marker.get("examples") if isinstance(marker, dict) else None
-                examples_count = len(examples) if isinstance(examples, list) else 0
-                neg_examples_count = 0
-                metadata = marker.get("metadata") if isinstance(marker, dict) else None
-                if isinstance(metadata, dict):
-                    neg_block = metadata.get("neg_examples")
-                    if isinstance(neg_block, list):
-                        neg_examples_count = len(neg_block)
-                composed_raw = marker.get("composed_of")
-                composed_refs = collect_id_refs(composed_raw)
-                record = MarkerRecord(
-                    id=marker_id,
-                    prefix=prefix,
-                    file=path.resolve(),
-                    data=marker,
-                    composed_raw=composed_raw,
-                    composed_refs=composed_refs,
-                    examples_count=examples_count,
-                    neg_examples_count=neg_examples_count,
-                    file_marker_count=file_marker_count,
-                    index_in_file=index,
-                )
-                records.append(record)
-                prefix_counts[prefix] += 1
-                duplicate_ids[marker_id].append(record)
-
+            prefix = marker_id.split("_", 1)[0]
+            examples = marker.get("examples") if isinstance(marker, dict) else None
+            examples_count = len(examples) if isinstance(examples, list) else 0
+            neg_examples_count = 0
+            metadata = marker.get("metadata") if isinstance(marker, dict) else None
+            if isinstance(metadata, dict):
+                neg_block = metadata.get("neg_examples")
+                if isinstance(neg_block, list):
+                    neg_examples_count = len(neg_block)
+            composed_raw = marker.get("composed_of")
+            composed_refs = collect_id_refs(composed_raw)
+            record = MarkerRecord(
+                id=marker_id,
+                prefix=prefix,
+                file=path.resolve(),
+                data=marker,
+                composed_raw=composed_raw,
+                composed_refs=composed_refs,
+                examples_count=examples_count,
+                neg_examples_count=neg_examples_count,
+                file_marker_count=file_marker_count,
+                index_in_file=index,
+            )
+            records.append(record)
+            prefix_counts[prefix] += 1
+            duplicate_ids[marker_id].append(record)
+
+    if cache is not None:
+        cache.save()
     return {
         "records": records,
         "parse_errors": parse_errors,
@@ -370,7 +403,7 @@ def render_json(report: dict) -> str:
 def main(argv: Optional[Sequence[str]] = None) -> int:
     args = parse_args(argv)
     roots = resolve_roots(args.roots)
-    report = scan_markers(roots)
+    report = scan_markers(roots, default_cache(cache_dir=args.cache_dir), workers=args.jobs)
     if args.json:
         print(render_json(report))
     else:
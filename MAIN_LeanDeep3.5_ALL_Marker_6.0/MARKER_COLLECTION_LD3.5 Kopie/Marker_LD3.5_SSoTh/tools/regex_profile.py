@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""Regex cost profiler for ATO marker patterns.
+
+Every ATO pattern is timed against a stress corpus of long messages built from
+the pack's own examples and ranked by nanoseconds per input character. Each
+pattern is also probed with adversarial inputs of growing length (repeated
+pattern words without a terminator, unclosed quotes, long runs of one
+character). Each probe size is timed several times and the best run counts; the
+growth exponent is a least-squares fit of log(time) against log(length) over
+all sizes. A pattern is flagged as super-linear when that exponent is high
+*and* the longest probe is slow enough to matter, or when one input exceeds the
+timeout. Probes run in a child process so a catastrophic pattern can be killed
+instead of hanging CI.
+
+Exit status is 1 when a pattern exceeds ``--budget-ns`` or is super-linear.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.audit_markers import MarkerRecord, resolve_roots, scan_markers
+
+FLAG_NAMES = {
+    "IGNORECASE": re.IGNORECASE,
+    "MULTILINE": re.MULTILINE,
+    "DOTALL": re.DOTALL,
+    "VERBOSE": re.VERBOSE,
+    "UNICODE": re.UNICODE,
+    "ASCII": re.ASCII,
+}
+DEFAULT_FLAGS = re.IGNORECASE
+STRESS_MESSAGE_CHARS = 4000
+PROBE_SIZES = (250, 500, 1000, 2000, 4000)
+# Timing runs per probe size; the fastest one counts.
+PROBE_REPEATS = 5
+# Growth exponent above which a pattern counts as super-linear (1.0 = linear).
+SUPERLINEAR_EXPONENT = 1.6
+# The longest probe must take at least this long before its growth is reported;
+# below it, timer noise dominates and the cost is irrelevant anyway.
+PROBE_MIN_SECONDS = 0.01
+WORD = re.compile(r"[^\W\d_]{2,}")
+
+FILLER = (
+    "ok passt das wetter ist schön heute wir sehen uns später ich habe die "
+    "unterlagen geschickt und melde mich morgen noch einmal bei dir "
+)
+
+
+@dataclass
+class PatternProfile:
+    marker_id: str
+    source: str
+    file: str
+    ns_per_char: float = 0.0
+    growth: Optional[float] = None
+    worst_probe: Optional[str] = None
+    timed_out: bool = False
+    error: Optional[str] = None
+
+    @property
+    def superlinear(self) -> bool:
+        return self.timed_out or (self.growth is not None and self.growth > SUPERLINEAR_EXPONENT)
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Profile ATO regex cost and detect catastrophic backtracking")
+    parser.add_argument(
+        "roots",
+        nargs="*",
+        help="Directories/files to include (defaults to Markers_canonical.json if present)",
+    )
+    parser.add_argument("--budget-ns", type=float, default=200.0, help="Maximum allowed ns per input character")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=2.0,
+        help="Seconds one adversarial input may take across all probe sizes before the probe is killed",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per pattern (best run counts)")
+    parser.add_argument("--top", type=int, default=20, help="Number of most expensive patterns to list")
+    parser.add_argument("--no-probe", action="store_true", help="Skip the adversarial super-linearity probes")
+    parser.add_argument("--json", action="store_true", help="Emit the full profile as JSON")
+    return parser.parse_args(argv)
+
+
+def extract_patterns(marker: Dict[str, object]) -> List[Tuple[str, int]]:
+    """Return ``(source, flags)`` for every regex declared under ``pattern``."""
+    pattern = marker.get("pattern")
+    flags = DEFAULT_FLAGS
+    if isinstance(pattern, dict):
+        names = pattern.get("flags")
+        if isinstance(names, list):
+            flags = 0
+            for name in names:
+                flags |= FLAG_NAMES.get(str(name).upper(), 0)
+        pattern = pattern.get("regex")
+    if isinstance(pattern, str):
+        pattern = [pattern]
+    if not isinstance(pattern, list):
+        return []
+    return [(source, flags) for source in pattern if isinstance(source, str) and source.strip()]
+
+
+def build_stress_corpus(records: Iterable[MarkerRecord], message_chars: int = STRESS_MESSAGE_CHARS) -> List[str]:
+    """Long messages made of every example in the pack, plus one of filler text."""
+    examples: List[str] = []
+    for rec in records:
+        values = rec.data.get("examples") if isinstance(rec.data, dict) else None
+        if isinstance(values, list):
+            examples.extend(value for value in values if isinstance(value, str))
+    corpus: List[str] = []
+    current: List[str] = []
+    size = 0
+    for example in examples:
+        current.append(example)
+        size += len(example) + 1
+        if size >= message_chars:
+            corpus.append(" ".join(current))
+            current, size = [], 0
+    if current:
+        corpus.append(" ".join(current))
+    corpus.append((FILLER * (message_chars // len(FILLER) + 1))[:message_chars])
+    return corpus
+
+
+def time_pattern(rx: re.Pattern, corpus: Sequence[str], repeat: int) -> float:
+    """Best-of-``repeat`` nanoseconds per character for ``finditer`` over ``corpus``."""
+    chars = sum(len(text) for text in corpus) or 1
+    best = math.inf
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter_ns()
+        for text in corpus:
+            for _ in rx.finditer(text):
+                pass
+        best = min(best, time.perf_counter_ns() - start)
+    return best / chars
+
+
+def adversarial_inputs(source: str, example: str) -> Dict[str, Callable[[int], str]]:
+    """Input generators (length -> text) aimed at backtracking hot spots."""
+    words = WORD.findall(source) or ["ja"]
+    chant = " ".join(dict.fromkeys(words)) + " "
+    stem = example.rstrip(".!?…\"' ") + " " if example else chant
+
+    def repeat(unit: str) -> Callable[[int], str]:
+        return lambda n: (unit * (n // len(unit) + 1))[:n]
+
+    return {
+        "pattern-words": repeat(chant),
+        "example-no-terminator": repeat(stem),
+        "open-quote": lambda n: '"' + repeat(chant)(n - 1),
+        "letters": repeat("a"),
+        "letters-then-stop": lambda n: "a" * (n - 1) + "!",
+        "spaces": lambda n: " " * (n - 1) + "!",
+        "punctuation": repeat(".,"),
+    }
+
+
+def _best_time(rx: re.Pattern, text: str) -> float:
+    """Fastest of up to ``PROBE_REPEATS`` ``finditer`` runs; slow runs stop repeating early."""
+    best, spent = math.inf, 0.0
+    for _ in range(PROBE_REPEATS):
+        start = time.perf_counter()
+        for _ in rx.finditer(text):
+            pass
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent >= PROBE_MIN_SECONDS * PROBE_REPEATS:
+            break
+    return best
+
+
+def growth_exponent(timings: Sequence[Tuple[int, float]]) -> float:
+    """Least-squares slope of log(seconds) over log(length)."""
+    xs = [math.log(n) for n, _ in timings]
+    ys = [math.log(max(t, 1e-9)) for _, t in timings]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else 0.0
+
+
+def input_growth(rx: re.Pattern, make: Callable[[int], str]) -> Optional[float]:
+    """Growth exponent on one adversarial input; None when its longest probe stays under ``PROBE_MIN_SECONDS``."""
+    timings = [(n, _best_time(rx, make(n))) for n in PROBE_SIZES]
+    if timings[-1][1] < PROBE_MIN_SECONDS:
+        return None
+    return growth_exponent(timings)
+
+
+def probe_growth(source: str, flags: int, example: str) -> Tuple[float, str]:
+    """Largest runtime growth exponent across the adversarial inputs (in-process, no timeout).
+
+    Inputs whose longest probe stays under ``PROBE_MIN_SECONDS`` are skipped, so a
+    fast pattern reports 0.0 however noisy its timings are.
+    """
+    rx = re.compile(source, flags)
+    worst, worst_name = 0.0, ""
+    for name, make in adversarial_inputs(source, example).items():
+        exponent = input_growth(rx, make)
+        if exponent is not None and exponent > worst:
+            worst, worst_name = exponent, name
+    return worst, worst_name
+
+
+def _probe_worker(conn) -> None:
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        source, flags, example, name = job
+        conn.send(input_growth(re.compile(source, flags), adversarial_inputs(source, example)[name]))
+
+
+class _Prober:
+    """Runs probes in a child process that is restarted after a timeout.
+
+    ``timeout`` bounds each adversarial input separately (all of its probe sizes).
+    """
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self.proc = None
+        self.conn = None
+
+    def _start(self) -> None:
+        self.conn, child = mp.Pipe()
+        self.proc = mp.Process(target=_probe_worker, args=(child,), daemon=True)
+        self.proc.start()
+
+    def probe(self, source: str, flags: int, example: str) -> Optional[Tuple[float, str]]:
+        """Growth result as ``probe_growth``, or None when an input did not finish in time."""
+        worst, worst_name = 0.0, ""
+        for name in adversarial_inputs(source, example):
+            if self.proc is None:
+                self._start()
+            self.conn.send((source, flags, example, name))
+            if not self.conn.poll(self.timeout):
+                self.proc.kill()
+                self.proc.join()
+                self.proc = None
+                return None
+            exponent = self.conn.recv()
+            if exponent is not None and exponent > worst:
+                worst, worst_name = exponent, name
+        return worst, worst_name
+
+    def close(self) -> None:
+        if self.proc is not None:
+            self.conn.send(None)
+            self.proc.join(1)
+            if self.proc.is_alive():
+                self.proc.kill()
+
+
+def profile(records: Sequence[MarkerRecord], repeat: int = 3, timeout: float = 2.0,
+            probe: bool = True) -> List[PatternProfile]:
+    """Profile every ATO pattern; the result is sorted by ns/char, slowest first."""
+    corpus = build_stress_corpus(records)
+    prober = _Prober(timeout) if probe else None
+    results: List[PatternProfile] = []
+    try:
+        for rec in records:
+            if rec.prefix != "ATO":
+                continue
+            examples = rec.data.get("examples") if isinstance(rec.data, dict) else None
+            example = next((e for e in examples or [] if isinstance(e, str)), "")
+            for source, flags in extract_patterns(rec.data):
+                entry = PatternProfile(rec.id, source, _rel(rec.file))
+                results.append(entry)
+                try:
+                    rx = re.compile(source, flags)
+                except re.error as exc:
+                    entry.error = str(exc)
+                    continue
+                entry.ns_per_char = time_pattern(rx, corpus, repeat)
+                if prober is None:
+                    continue
+                outcome = prober.probe(source, flags, example)
+                if outcome is None:
+                    entry.timed_out = True
+                else:
+                    growth, name = outcome
+                    entry.growth = round(growth, 2)
+                    entry.worst_probe = name or None
+    finally:
+        if prober is not None:
+            prober.close()
+    results.sort(key=lambda p: (not p.timed_out, -p.ns_per_char))
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv)
+    roots = resolve_roots(args.roots)
+    report = scan_markers(roots)
+    results = profile(report["records"], args.repeat, args.timeout, not args.no_probe)
+
+    over_budget = [p for p in results if p.ns_per_char > args.budget_ns]
+    superlinear = [p for p in results if p.superlinear]
+
+    if args.json:
+        payload = [dict(asdict(p), superlinear=p.superlinear) for p in results]
+        print(json.dumps({"budget_ns": args.budget_ns, "patterns": payload}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Profiled {len(results)} ATO patterns (budget {args.budget_ns:.0f} ns/char)")
+        for p in results[: args.top]:
+            growth = "timeout" if p.timed_out else (f"n^{p.growth:.2f}" if p.growth else "-")
+            print(f"{p.ns_per_char:10.1f} ns/char  {growth:>9}  {p.marker_id}  {p.source}")
+        for p in results:
+            if p.error:
+                print(f"REGEX ERR: {p.marker_id}: {p.error} ({p.file})")
+        for p in over_budget:
+            print(f"BUDGET ERR: {p.marker_id}: {p.ns_per_char:.1f} ns/char > {args.budget_ns:.0f} ({p.file})")
+        for p in superlinear:
+            detail = "probe timed out" if p.timed_out else f"grows as n^{p.growth:.2f} on {p.worst_probe} input"
+            print(f"BACKTRACK ERR: {p.marker_id}: {detail}: {p.source} ({p.file})")
+
+    return 1 if over_budget or superlinear else 0
+
+
+def _rel(path: Path) -> str:
+    try:
+        return str(path.resolve().relative_to(Path.cwd().resolve()))
+    except ValueError:
+        return str(path)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Fast YAML ingestion for marker packs.
+
+Parsing uses libyaml's ``CSafeLoader`` when PyYAML was built with it and can
+fan out across a process pool; results always follow the input order.
+
+Entries of the persistent cache are keyed by absolute path and validated by mtime and size; when
+those change the file is re-read and its SHA-1 decides whether a re-parse is
+needed. Parsed documents are stored once per content hash, so identical files
+in duplicated packs share an entry. The cache is a local pickle artifact and
+must only be loaded from trusted directories.
+
+Each marker tree in this repository is self-contained (compare the per-tree
+``markers_loader.py``); the LD3.4 tree carries the same cache as
+``spiral_persona/yaml_cache.py``. Keep the cache format and ``CACHE_VERSION`` of
+both in sync so a shared ``$LEANDEEP_CACHE_DIR`` stays readable by either.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+CACHE_ENV = "LEANDEEP_CACHE_DIR"
+CACHE_VERSION = 1
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# Without an explicit worker count, smaller batches are parsed in-process.
+PARALLEL_MIN_FILES = 64
+
+ParseResult = Tuple[Optional[str], Any, Optional[str]]
+
+
+def safe_load(stream: Any) -> Any:
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def _read_and_parse(path: str) -> ParseResult:
+    """Return ``(sha1, data, error)`` for one file; runs in worker processes."""
+    try:
+        with open(path, "rb") as handle:
+            raw = handle.read()
+    except OSError as exc:
+        return None, None, str(exc)
+    digest = hashlib.sha1(raw).hexdigest()
+    try:
+        return digest, safe_load(raw), None
+    except yaml.YAMLError as exc:
+        return digest, None, str(exc)
+
+
+def parse_files(paths: Sequence[Path], workers: Optional[int] = None) -> List[ParseResult]:
+    """Parse ``paths``, in parallel when worthwhile, preserving input order."""
+    names = [os.fspath(p) for p in paths]
+    serial = workers == 1 or (
+        workers is None and (len(names) < PARALLEL_MIN_FILES or (os.cpu_count() or 1) == 1)
+    )
+    if not names or serial:
+        return [_read_and_parse(name) for name in names]
+    workers = workers or os.cpu_count()
+    chunk = max(1, len(names) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_read_and_parse, names, chunksize=chunk))
+
+
+class YamlCache:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.files: Dict[str, Tuple[int, int, str]] = {}
+        self.blobs: Dict[str, Any] = {}
+        self.dirty = False
+        try:
+            with self.path.open("rb") as handle:
+                version, files, blobs = pickle.load(handle)
+            if version == CACHE_VERSION:
+                self.files, self.blobs = files, blobs
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+            pass
+
+    def load(self, path: Path, parse: Callable[[bytes], Any] = safe_load) -> Any:
+        """Return the parsed content of ``path``; parse errors propagate and are not cached."""
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        hit = self.files.get(key)
+        if hit is not None and hit[:2] == (st.st_mtime_ns, st.st_size) and hit[2] in self.blobs:
+            return self.blobs[hit[2]]
+        with open(key, "rb") as handle:
+            raw = handle.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest not in self.blobs:
+            self.blobs[digest] = parse(raw)
+        self.files[key] = (st.st_mtime_ns, st.st_size, digest)
+        self.dirty = True
+        return self.blobs[digest]
+
+    def load_many(
+        self, paths: Sequence[Path], workers: Optional[int] = None
+    ) -> List[Tuple[Any, Optional[str]]]:
+        """Return ``(data, error)`` per path in input order; only misses are parsed."""
+        out: List[Tuple[Any, Optional[str]]] = [(None, None)] * len(paths)
+        misses: List[Tuple[int, str, os.stat_result]] = []
+        for i, path in enumerate(paths):
+            key = os.path.abspath(path)
+            try:
+                st = os.stat(key)
+            except OSError as exc:
+                out[i] = (None, str(exc))
+                continue
+            hit = self.files.get(key)
+            if hit is not None and hit[:2] == (st.st_mtime_ns, st.st_size) and hit[2] in self.blobs:
+                out[i] = (self.blobs[hit[2]], None)
+            else:
+                misses.append((i, key, st))
+        parsed = parse_files([key for _, key, _ in misses], workers)
+        for (i, key, st), (digest, data, error) in zip(misses, parsed):
+            if error is not None:
+                out[i] = (None, error)
+                continue
+            self.blobs.setdefault(digest, data)
+            self.files[key] = (st.st_mtime_ns, st.st_size, digest)
+            self.dirty = True
+            out[i] = (self.blobs[digest], None)
+        return out
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        live = {entry[2] for entry in self.files.values()}
+        self.blobs = {digest: data for digest, data in self.blobs.items() if digest in live}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as handle:
+            pickle.dump((CACHE_VERSION, self.files, self.blobs), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def default_cache(name: str = "scan", cache_dir: Optional[str] = None) -> Optional[YamlCache]:
+    """Cache file ``<cache_dir or $LEANDEEP_CACHE_DIR>/yaml-<name>.pickle``, or None if unset."""
+    base = cache_dir or os.environ.get(CACHE_ENV)
+    if not base:
+        return None
+    return YamlCache(Path(base) / f"yaml-{name}.pickle")